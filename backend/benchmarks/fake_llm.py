@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+from typing import List
+import asyncio
+import hashlib
+import json
+import time
+
+@dataclass
+class FakeResponse:
+    content: str
+
+class FakeLLM:
+    """
+    Deterministic local stand-in for the Gemini re-ranker.
+
+    Answers the single-item and batched re-rank prompts of `llm_utils` by picking the first
+    candidate as the match and the next ones as equivalent items, after a fixed simulated latency.
+    A fraction of calls can fail to exercise the retry path; which calls fail depends only on the
+    prompt, so runs are reproducible.
+    """
+
+    model = "fake-llm"
+
+    def __init__(self, latency: float = 0.05, per_item_latency: float = 0.005, failure_rate: float = 0.0, equivalents: int = 2):
+        """
+        Args:
+            latency (float): Seconds every call takes.
+            per_item_latency (float): Extra seconds per BOM item in a batched prompt.
+            failure_rate (float): Fraction of prompts (0-1) that raise instead of answering.
+            equivalents (int): Number of equivalent items returned per BOM item.
+        """
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.failure_rate = failure_rate
+        self.equivalents = equivalents
+        self.calls = 0
+        self.failures = 0
+
+    def _should_fail(self, prompt: str) -> bool:
+        if self.failure_rate <= 0:
+            return False
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") / 2 ** 32 < self.failure_rate
+
+    def _answer(self, candidates: List[str]) -> dict:
+        if not candidates:
+            return {"matched_item": None, "equivalent_items": []}
+        return {"matched_item": candidates[0], "equivalent_items": candidates[1:1 + self.equivalents]}
+
+    def _respond(self, prompt: str) -> str:
+        if "BOM items:" in prompt:
+            payload = json.loads(prompt[prompt.index("BOM items:") + len("BOM items:"):])
+            return json.dumps([{"id": entry["id"], **self._answer(entry["candidates"])} for entry in payload])
+        candidates = json.loads(prompt[prompt.index("Candidates:") + len("Candidates:"):])
+        return json.dumps(self._answer(candidates))
+
+    def _latency(self, prompt: str) -> float:
+        return self.latency + self.per_item_latency * prompt.count('"bom_item"')
+
+    def _call(self, prompt: str) -> FakeResponse:
+        self.calls += 1
+        if self._should_fail(prompt):
+            self.failures += 1
+            raise RuntimeError("Simulated LLM failure")
+        return FakeResponse(self._respond(prompt))
+
+    def invoke(self, prompt: str) -> FakeResponse:
+        time.sleep(self._latency(prompt))
+        return self._call(prompt)
+
+    async def ainvoke(self, prompt: str) -> FakeResponse:
+        await asyncio.sleep(self._latency(prompt))
+        return self._call(prompt)
@@ -0,0 +1,97 @@
+from typing import Awaitable, Callable, Dict, List
+import asyncio
+import logging
+import numpy as np
+import resource
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process so far, in MB. The peak only grows, so each benchmark
+    reports the highest memory use of the run up to its end.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int = 0) -> Dict:
+    """
+    Latency percentiles (ms), throughput (calls/s) and peak RSS of a series of timed calls.
+    """
+    values = np.asarray(latencies, dtype=float) * 1000
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "mean_ms": float(values.mean()) if len(values) else 0.0,
+        "p50_ms": float(np.percentile(values, 50)) if len(values) else 0.0,
+        "p95_ms": float(np.percentile(values, 95)) if len(values) else 0.0,
+        "p99_ms": float(np.percentile(values, 99)) if len(values) else 0.0,
+        "throughput_per_s": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def time_calls(fn: Callable[[int], object], iterations: int, warmup: int = 1) -> Dict:
+    """
+    Call `fn(i)` sequentially and summarize the latencies; warm-up calls are not measured.
+    """
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+async def run_load(send: Callable[[int], Awaitable[bool]], requests: int, concurrency: int) -> Dict:
+    """
+    Issue `requests` calls of `send(i)` with at most `concurrency` in flight and summarize them.
+    `send` returns False (or raises) for a failed request; failed requests are counted, not timed.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    latencies, errors = [], 0
+
+    async def _one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = await send(i)
+            except Exception as e:
+                logger.warning(f"Request {i} failed: {str(e)}")
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(i) for i in range(requests)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    List the benchmarks whose latency grew, or whose throughput dropped, by more than `tolerance`
+    (a fraction) relative to a baseline produced by the same suite.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not isinstance(current, dict) or not isinstance(previous, dict):
+            continue
+        # Startup timings are single measurements in seconds
+        metrics = list(LATENCY_METRICS) + [metric for metric in current if metric.endswith("_seconds")]
+        for metric in metrics:
+            if previous.get(metric) and current.get(metric, 0.0) > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}.{metric}: {previous[metric]:.2f} -> {current[metric]:.2f}")
+        if previous.get("throughput_per_s") and current.get("throughput_per_s", 0.0) < previous["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{name}.throughput_per_s: {previous['throughput_per_s']:.2f} -> {current['throughput_per_s']:.2f}"
+            )
+    return regressions
@@ -0,0 +1,260 @@
+from .fake_llm import FakeLLM
+from .measure import compare_to_baseline, peak_rss_mb, run_load, time_calls
+from .synthetic import make_bom, make_images
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(current_dir, "results", "latest.json")
+DEFAULT_BASELINE = os.path.join(current_dir, "results", "baseline.json")
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the supply recommender and trash classifier hot paths.")
+    parser.add_argument("--suite", choices=["all", "micro", "e2e"], default="all",
+                        help="Per-stage micro-benchmarks, end-to-end load tests against server.py, or both.")
+    parser.add_argument("--apps", nargs="+", choices=["supply", "medical"], default=["supply", "medical"],
+                        help="Apps to benchmark.")
+    parser.add_argument("--bom-size", type=int, default=50, help="Rows per synthetic BOM.")
+    parser.add_argument("--images", type=int, default=32, help="Number of distinct synthetic images.")
+    parser.add_argument("--image-size", type=int, default=640, help="Side of the synthetic images in pixels.")
+    parser.add_argument("--iterations", type=int, default=5, help="Repetitions of whole-BOM micro-benchmarks.")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per end-to-end load test.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight during load tests.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per fake LLM call.")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="Fraction of failing fake LLM prompts.")
+    parser.add_argument("--lexical-fast-path", choices=["match", "retrieval", "off"], default="off",
+                        help="Lexical fast path of the supply app (LEXICAL_FAST_PATH); off by default.")
+    parser.add_argument("--gate-min-score", type=float, default=None,
+                        help="Retrieval confidence gate threshold (RETRIEVAL_GATE_MIN_SCORE); the gate is off if unset.")
+    parser.add_argument("--gate-min-margin", type=float, default=0.05,
+                        help="Retrieval confidence gate margin (RETRIEVAL_GATE_MIN_MARGIN).")
+    parser.add_argument("--random-weights", action="store_true",
+                        help="Use randomly initialized classifier weights instead of medical_trash_classifier.pth.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic BOMs and images.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON file the results are written to.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative slowdown tolerated before a metric counts as a regression.")
+    return parser.parse_args(argv)
+
+def _configure_environment(args, work_dir: str) -> None:
+    """
+    Isolate the runtime caches so every run starts cold and runs stay comparable.
+    The supply app's LLM-avoidance settings come from the options (recorded with the results),
+    never from the calling environment, since they change which BOM items reach the LLM.
+    Must run before the apps are imported, since they read their configuration at import time.
+    """
+    os.environ["LEXICAL_FAST_PATH"] = args.lexical_fast_path
+    os.environ["RETRIEVAL_GATE_MIN_MARGIN"] = str(args.gate_min_margin)
+    if args.gate_min_score is None:
+        os.environ.pop("RETRIEVAL_GATE_MIN_SCORE", None)
+    else:
+        os.environ["RETRIEVAL_GATE_MIN_SCORE"] = str(args.gate_min_score)
+    os.environ.setdefault("RERANK_CACHE_ENABLED", "false")
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(work_dir, "embedding_cache.sqlite3"))
+    os.environ.setdefault("CLASSIFIER_CACHE_SIZE", "0")
+    # The Gemini client is created at startup but replaced by the fake LLM before any call
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=current_dir, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+async def run_startup(args, work_dir: str) -> Dict:
+    """
+    Time the server.py startup: supply resources (catalog, footprint index, vector store) and model warm-up.
+    """
+    from medical_trash_classifier import app as medical
+    from sustainable_supply_recommender import main as supply
+
+    results = {}
+    if "supply" in args.apps:
+        start = time.perf_counter()
+        await supply.initialize_supply_resources()
+        results["supply_seconds"] = time.perf_counter() - start
+    if "medical" in args.apps:
+        if args.random_weights:
+            import torch
+            from medical_trash_classifier.backends import build_model
+
+            weights_path = os.path.join(work_dir, "random_weights.pth")
+            torch.save(build_model().state_dict(), weights_path)
+            medical.model_registry.weights_path = weights_path
+        elif not os.path.exists(medical.MODEL_PATH):
+            raise FileNotFoundError(f"'{medical.MODEL_PATH}' not found; pass --random-weights to benchmark without it")
+        start = time.perf_counter()
+        await medical.warm_up_model()
+        results["medical_warm_up_seconds"] = time.perf_counter() - start
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def run_supply_micro(args, llm: FakeLLM) -> Dict:
+    """
+    Micro-benchmarks of the supply recommender stages on one synthetic BOM.
+    """
+    from sustainable_supply_recommender import main as supply
+    from sustainable_supply_recommender.recommender import process_bom_items
+    from sustainable_supply_recommender.utils.carbon_utils import get_carbon_footprint
+    from sustainable_supply_recommender.utils.vectorstore_utils import query_similar_items, query_similar_items_batch
+
+    db_df, vectorstore, footprint_index = supply.global_db_df, supply.global_vectorstore, supply.global_footprint_index
+    bom_df = make_bom(db_df, args.bom_size, args.seed)
+    bom_items = bom_df["product_name"].tolist()
+    product_names = db_df["product_name"].sample(n=min(len(db_df), 200), random_state=args.seed).tolist()
+
+    results = {
+        "query_similar_items": time_calls(
+            lambda i: query_similar_items(vectorstore, bom_items[i % len(bom_items)]), len(bom_items)
+        ),
+        "query_similar_items_batch": time_calls(
+            lambda i: query_similar_items_batch(vectorstore, bom_items), args.iterations
+        ),
+        "get_carbon_footprint": time_calls(
+            lambda i: get_carbon_footprint(db_df, product_names[i % len(product_names)]), len(product_names)
+        ),
+        "footprint_index_lookup": time_calls(
+            lambda i: footprint_index.get_carbon_footprint(product_names[i % len(product_names)]), len(product_names)
+        ),
+        "process_bom_items": time_calls(
+            lambda i: process_bom_items(
+                bom_df, db_df, vectorstore, llm, footprint_index=footprint_index, **supply._llm_options()
+            ),
+            args.iterations
+        )
+    }
+    results["process_bom_items"]["items_per_s"] = results["process_bom_items"]["throughput_per_s"] * len(bom_df)
+    return results
+
+def run_medical_micro(args, images: List[bytes]) -> Dict:
+    """
+    Micro-benchmarks of the classifier: preprocessing alone and the single-image predict path.
+    """
+    from medical_trash_classifier import app as medical
+    from medical_trash_classifier.preprocessing import load_image_tensor
+
+    def predict(i: int):
+        image = load_image_tensor(images[i % len(images)])
+        return medical._prediction(medical.model_registry(image.unsqueeze(0))[0])
+
+    return {
+        "preprocess_image": time_calls(lambda i: load_image_tensor(images[i % len(images)]), len(images)),
+        "predict_image": time_calls(predict, len(images))
+    }
+
+async def run_e2e(args, images: List[bytes]) -> Dict:
+    """
+    Concurrent load tests against the combined server.py app, in process over ASGI.
+    """
+    import httpx
+    from server import app
+    from sustainable_supply_recommender import main as supply
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        if "supply" in args.apps:
+            boms = [
+                make_bom(supply.global_db_df, args.bom_size, args.seed + i).to_csv(index=False).encode("utf-8")
+                for i in range(args.requests)
+            ]
+
+            async def send_bom(i: int) -> bool:
+                response = await client.post("/supply/process", files={"bom_file": ("bom.csv", boms[i], "text/csv")})
+                return response.status_code == 200
+
+            results["e2e_supply_process"] = await run_load(send_bom, args.requests, args.concurrency)
+            results["e2e_supply_process"]["items_per_s"] = results["e2e_supply_process"]["throughput_per_s"] * args.bom_size
+
+        if "medical" in args.apps:
+            async def send_image(i: int) -> bool:
+                files = {"file": (f"image_{i}.jpg", images[i % len(images)], "image/jpeg")}
+                response = await client.post("/medical/predict/", files=files)
+                return response.status_code == 200
+
+            results["e2e_medical_predict"] = await run_load(send_image, args.requests, args.concurrency)
+    return results
+
+async def run(args, work_dir: str) -> Dict:
+    _configure_environment(args, work_dir)
+    # server.py imports the apps as top-level packages from the backend directory
+    sys.path.insert(0, os.path.dirname(current_dir))
+
+    results = {"startup": await run_startup(args, work_dir)}
+    llm = FakeLLM(latency=args.llm_latency, failure_rate=args.llm_failure_rate)
+    images = make_images(args.images, args.seed, args.image_size) if "medical" in args.apps else []
+    if "supply" in args.apps:
+        from sustainable_supply_recommender import main as supply
+
+        supply.llm = llm
+
+    if args.suite in ("all", "micro"):
+        if "supply" in args.apps:
+            # process_bom_items runs its own event loop
+            results.update(await asyncio.to_thread(run_supply_micro, args, llm))
+        if "medical" in args.apps:
+            results.update(await asyncio.to_thread(run_medical_micro, args, images))
+    if args.suite in ("all", "e2e"):
+        results.update(await run_e2e(args, images))
+    results["llm"] = {"calls": llm.calls, "failures": llm.failures}
+    return results
+
+def main(args) -> int:
+    with tempfile.TemporaryDirectory(prefix="ecomedai-benchmark-") as work_dir:
+        results = asyncio.run(run(args, work_dir))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "save_baseline")}
+        },
+        "results": results
+    }
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Benchmark results saved to '{path}'")
+
+    for name, metrics in results.items():
+        if "p50_ms" in metrics:
+            logger.info(
+                f"{name}: p50 {metrics['p50_ms']:.1f} ms, p95 {metrics['p95_ms']:.1f} ms, "
+                f"p99 {metrics['p99_ms']:.1f} ms, {metrics['throughput_per_s']:.1f}/s"
+            )
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["meta"]["args"] != report["meta"]["args"]:
+        logger.warning("Baseline was recorded with different benchmark options; the comparison may be meaningless")
+    regressions = compare_to_baseline(results, baseline["results"], args.tolerance)
+    if regressions:
+        logger.error(f"Regressions against baseline {baseline['meta']['commit']}:\n" + "\n".join(regressions))
+        return 1
+    logger.info(f"No regressions against baseline {baseline['meta']['commit']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -0,0 +1,74 @@
+from PIL import Image, ImageDraw
+from typing import List
+import io
+import numpy as np
+import pandas as pd
+
+# Extra words mixed into product names so BOM items are near, not exact, catalog matches
+_NOISE_WORDS = ["sterile", "disposable", "pack of 10", "large", "medical grade", "single use", "box", "latex-free"]
+
+def make_bom(db_df: pd.DataFrame, size: int, seed: int = 0, repeat_fraction: float = 0.2) -> pd.DataFrame:
+    """
+    Generate a BOM whose items are perturbed catalog product names.
+
+    Args:
+        db_df (pd.DataFrame): Database DataFrame to draw product names from.
+        size (int): Number of BOM rows.
+        seed (int): Random seed.
+        repeat_fraction (float): Fraction of rows repeating an earlier row's product name,
+            as in consolidated hospital orders.
+
+    Returns:
+        pd.DataFrame: BOM with product_name, quantity and unit_price columns.
+    """
+    rng = np.random.default_rng(seed)
+    product_names = db_df["product_name"].astype(str).tolist()
+    names = []
+    for _ in range(size):
+        if names and rng.random() < repeat_fraction:
+            names.append(names[rng.integers(len(names))])
+            continue
+        words = product_names[rng.integers(len(product_names))].split()
+        if len(words) > 2 and rng.random() < 0.5:
+            del words[rng.integers(len(words))]
+        if rng.random() < 0.5:
+            words.insert(rng.integers(len(words) + 1), _NOISE_WORDS[rng.integers(len(_NOISE_WORDS))])
+        names.append(" ".join(words))
+    return pd.DataFrame({
+        "product_name": names,
+        "quantity": rng.integers(1, 500, size=size).astype(float),
+        "unit_price": np.round(rng.uniform(0.1, 200.0, size=size), 2)
+    })
+
+def make_images(count: int, seed: int = 0, size: int = 640, quality: int = 85) -> List[bytes]:
+    """
+    Generate distinct photo-like JPEG images (noisy background with random shapes).
+
+    Args:
+        count (int): Number of images.
+        seed (int): Random seed.
+        size (int): Image side in pixels.
+        quality (int): JPEG quality.
+
+    Returns:
+        List[bytes]: Encoded JPEG files.
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        background = rng.integers(0, 256, size=3)
+        pixels = np.clip(background + rng.normal(0, 25, size=(size, size, 3)), 0, 255).astype(np.uint8)
+        image = Image.fromarray(pixels)
+        draw = ImageDraw.Draw(image)
+        for _ in range(int(rng.integers(3, 8))):
+            x0, y0 = rng.integers(0, size, size=2)
+            x1, y1 = x0 + rng.integers(20, size // 2), y0 + rng.integers(20, size // 2)
+            fill = tuple(int(c) for c in rng.integers(0, 256, size=3))
+            if rng.random() < 0.5:
+                draw.ellipse((x0, y0, x1, y1), fill=fill)
+            else:
+                draw.rectangle((x0, y0, x1, y1), fill=fill)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality)
+        images.append(buffer.getvalue())
+    return images
@@ -0,0 +1,24 @@
+from fastapi import HTTPException
+from typing import Dict, Optional
+import secrets
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """
+    Format stage durations as a `Server-Timing` header value (milliseconds).
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+def require_admin_token(authorization: Optional[str], admin_token: Optional[str]) -> None:
+    """
+    Check the `Authorization: Bearer <token>` header of an admin request against the configured token.
+
+    Admin endpoints are disabled (403) when no token is configured, so they are never left open.
+
+    Raises:
+        HTTPException: 403 if no token is configured, 401 if the header is missing or wrong.
+    """
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them.")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing admin token.", headers={"WWW-Authenticate": "Bearer"})
@@ -1,11 +1,22 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from common.http_utils import format_server_timing, require_admin_token
+from fastapi import FastAPI, File, Header, UploadFile, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from PIL import Image, UnidentifiedImageError
-from torchvision import models
+from PIL import UnidentifiedImageError
+from typing import List, Optional, Tuple
+from .batching import DynamicBatcher
+from .labels import classes, biomedical_mapping
+from .metrics import PREDICTIONS, STAGE_SECONDS
+from .prediction_cache import PredictionCache, content_hash, perceptual_hash
+from .preprocessing import IMAGE_SIZE, decode_image, image_to_tensor, load_image_tensor
+from .registry import ModelRegistry
+import asyncio
 import io
 import os
+import time
 import torch
-import torchvision.transforms as transforms
+import zipfile
 
 app = FastAPI(
     title="EcoMedAI - Medical Trash Classifier API",
@@ -25,55 +36,121 @@ app.add_middleware(
 current_dir = os.path.dirname(os.path.abspath(__file__))
 # Load the trained model
 MODEL_PATH = os.path.join(current_dir, "models", "medical_trash_classifier.pth")
+# Inference backend: fp32, dynamic_int8, static_int8, torchscript, compile or onnx
+MODEL_BACKEND = os.getenv("CLASSIFIER_BACKEND", "fp32")
+# Directory `/model/reload` may load checkpoints from
+MODEL_DIR = os.path.realpath(os.getenv("CLASSIFIER_MODEL_DIR", os.path.dirname(MODEL_PATH)))
+# Bearer token of the admin endpoints (model reload); they are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
 
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = models.resnet50()
-num_features = model.fc.in_features
-model.fc = torch.nn.Linear(num_features, 7)
-
-try:
-    model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
-    model.eval()
-    model.to(device)
-except Exception as e:
-    raise RuntimeError(f"Error loading model: {str(e)}")
-
-# Define class labels (7-Class Model)
-classes = [
-    "General Waste - Metal & Glass",
-    "General Waste - Organic",
-    "General Waste - Paper",
-    "General Waste - Plastic",
-    "Infectious Waste",
-    "Pathological Waste",
-    "Sharps Waste"
-]
-
-# Define 4-Class Biomedical Waste Mapping
-biomedical_mapping = {
-    "Pathological Waste": "Red",
-    "Infectious Waste": "Red",
-    "General Waste - Organic": "Grey",
-    "General Waste - Paper": "Grey",
-    "General Waste - Plastic": "Blue",
-    "General Waste - Metal & Glass": "Blue",
-    "Sharps Waste": "White"
-}
-
-# Define image transformations (same as during training)
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.CenterCrop(224),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
-])
+
+# The model is loaded on first use or during warm-up, not at import time
+model_registry = ModelRegistry(
+    MODEL_BACKEND,
+    MODEL_PATH,
+    device,
+    mmap_weights=os.getenv("CLASSIFIER_MMAP_WEIGHTS", "true").lower() == "true"
+)
+
+# Load while importing, e.g. in the master process of `gunicorn --preload` so workers share the weights copy-on-write
+if os.getenv("CLASSIFIER_PRELOAD", "false").lower() == "true":
+    try:
+        model_registry.load()
+    except Exception as e:
+        raise RuntimeError(f"Error loading model: {str(e)}")
+
+
+def _prediction(output: torch.Tensor) -> dict:
+    """
+    Map a model output row to the predicted class and its biomedical bin color.
+    """
+    predicted_class = classes[torch.argmax(output).item()]
+    return {
+        "prediction": predicted_class,
+        "mapped_biomedical_category": biomedical_mapping.get(predicted_class, "Unknown Category")
+    }
+
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg", "bmp", "tiff")
+MAX_BATCH_SIZE = int(os.getenv("CLASSIFIER_MAX_BATCH_SIZE", "16"))
+MAX_BATCH_FILES = int(os.getenv("CLASSIFIER_MAX_BATCH_FILES", "500"))
+# Uncompressed size limits of /predict/batch images, checked from zip headers before anything is extracted
+MAX_IMAGE_BYTES = int(float(os.getenv("CLASSIFIER_MAX_IMAGE_MB", "20")) * 1024 * 1024)
+MAX_BATCH_BYTES = int(float(os.getenv("CLASSIFIER_MAX_BATCH_MB", "200")) * 1024 * 1024)
+
+# Concurrent /predict/ requests are grouped into batched forward passes
+batcher = DynamicBatcher(
+    model_registry,
+    max_batch_size=MAX_BATCH_SIZE,
+    max_wait_ms=float(os.getenv("CLASSIFIER_MAX_WAIT_MS", "5"))
+)
+
+# Thread pool decoding and preprocessing the images of /predict/batch in parallel
+decode_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CLASSIFIER_DECODE_WORKERS", str(os.cpu_count() or 4))),
+    thread_name_prefix="image-decode"
+)
+
+# Predictions of repeated (and optionally near-duplicate) uploads to /predict/ are served from memory
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("CLASSIFIER_CACHE_SIZE", "1024")),
+    perceptual=os.getenv("CLASSIFIER_CACHE_PERCEPTUAL", "false").lower() == "true",
+    max_distance=int(os.getenv("CLASSIFIER_CACHE_MAX_DISTANCE", "4"))
+)
+
+
+async def warm_up_model():
+    """
+    Load the model and run a dummy forward pass off the event loop.
+    """
+    try:
+        await asyncio.to_thread(model_registry.warm_up)
+    except Exception as e:
+        raise RuntimeError(f"Error loading model: {str(e)}")
+
+
+@app.on_event("startup")
+async def startup_event():
+    # Only runs when this app is served on its own; server.py warms up the mounted app
+    await warm_up_model()
+
+
+def _lookup_or_load_image(contents: bytes) -> Tuple[Optional[str], Optional[int], Optional[dict], Optional[torch.Tensor]]:
+    """
+    Serve an upload from the prediction cache, or decode it for inference.
+
+    Returns:
+        Tuple: (content hash, perceptual hash, cached prediction, image tensor); the hashes are
+        None when the cache is disabled, and the image tensor is None on a cache hit.
+    """
+    if not prediction_cache.enabled:
+        return None, None, None, load_image_tensor(contents)
+
+    key = content_hash(contents)
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return key, None, {**cached, "cache_status": "hit"}, None
+
+    image = decode_image(contents)
+    phash = None
+    if prediction_cache.perceptual:
+        phash = perceptual_hash(image)
+        cached = prediction_cache.get_similar(phash)
+        if cached is not None:
+            # Later exact repeats of this upload hit by content hash
+            prediction_cache.set(key, cached, phash)
+            return key, phash, {**cached, "cache_status": "near_duplicate"}, None
+    else:
+        prediction_cache.record_miss()
+    return key, phash, None, image_to_tensor(image)
 
 
 @app.post("/predict/")
-async def predict_image(file: UploadFile = File(...)):
+async def predict_image(response: Response, file: UploadFile = File(...)):
     """
     API endpoint for predicting the waste category from an image.
+    The `Server-Timing` response header breaks the request down into preprocessing and inference time.
 
     Args:
         file (UploadFile): The uploaded image file.
@@ -83,28 +160,228 @@ async def predict_image(file: UploadFile = File(...)):
     """
     try:
         # Ensure the file is an image
-        if not file.filename.lower().endswith(("png", "jpg", "jpeg", "bmp", "tiff")):
+        if not file.filename.lower().endswith(IMAGE_EXTENSIONS):
             raise HTTPException(status_code=400, detail="Invalid file format. Please upload an image.")
 
-        # Read and preprocess the image
-        image = Image.open(io.BytesIO(await file.read())).convert("RGB")
-        image = transform(image).unsqueeze(0).to(device)
-
-        # Make prediction
-        with torch.no_grad():
-            output = model(image)
-            _, predicted = torch.max(output, 1)
-
-        predicted_class = classes[predicted.item()]
-        mapped_category = biomedical_mapping.get(predicted_class, "Unknown Category")
+        # Look up the cache, then read and preprocess the image off the event loop
+        contents = await file.read()
+        start = time.perf_counter()
+        key, phash, cached, image = await asyncio.to_thread(_lookup_or_load_image, contents)
+        timings = {"preprocess": time.perf_counter() - start}
+        STAGE_SECONDS.labels("preprocess").observe(timings["preprocess"])
+        if cached is not None:
+            PREDICTIONS.labels(cached["cache_status"]).inc()
+            response.headers["Server-Timing"] = format_server_timing(timings)
+            return cached
 
-        return {
-            "prediction": predicted_class,
-            "mapped_biomedical_category": mapped_category
-        }
+        # Make prediction as part of a dynamically formed batch
+        start = time.perf_counter()
+        output = await batcher.submit(image)
+        timings["inference"] = time.perf_counter() - start
+        STAGE_SECONDS.labels("inference").observe(timings["inference"])
+        result = _prediction(output)
+        if key is not None:
+            prediction_cache.set(key, result, phash)
+            result["cache_status"] = "miss"
+        PREDICTIONS.labels(result.get("cache_status", "uncached")).inc()
+        response.headers["Server-Timing"] = format_server_timing(timings)
+        return result
 
     except UnidentifiedImageError:
         raise HTTPException(status_code=400, detail="Uploaded file is not a valid image.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+
+def _expand_uploads(uploads: List[Tuple[str, bytes]]) -> List[Tuple[str, object]]:
+    """
+    Expand zip archives into their image members.
+
+    The number of entries and the uncompressed image sizes declared in the zip headers are checked
+    against `MAX_BATCH_FILES`, `MAX_IMAGE_BYTES` and `MAX_BATCH_BYTES` before any member is
+    extracted, so oversized archives (e.g. zip bombs) are rejected without decompressing them.
+
+    Returns:
+        List[Tuple[str, object]]: (filename, image bytes or an error message) pairs.
+
+    Raises:
+        HTTPException: 400 if there are too many entries, 413 if an image or the batch is too large.
+    """
+    # (filename, image bytes, error message or a zip member to extract)
+    entries = []
+    with ExitStack() as stack:
+        for filename, contents in uploads:
+            if filename.lower().endswith(".zip"):
+                try:
+                    archive = stack.enter_context(zipfile.ZipFile(io.BytesIO(contents)))
+                except zipfile.BadZipFile:
+                    entries.append((filename, "Uploaded file is not a valid zip archive.", 0))
+                    continue
+                for member in archive.infolist():
+                    name = member.filename
+                    if member.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                        continue
+                    if not name.lower().endswith(IMAGE_EXTENSIONS):
+                        entries.append((f"{filename}/{name}", "Invalid file format. Please upload an image.", 0))
+                        continue
+                    entries.append((f"{filename}/{name}", (archive, member), member.file_size))
+            elif filename.lower().endswith(IMAGE_EXTENSIONS):
+                entries.append((filename, contents, len(contents)))
+            else:
+                entries.append((filename, "Invalid file format. Please upload an image.", 0))
+
+        if len(entries) > MAX_BATCH_FILES:
+            raise HTTPException(status_code=400, detail=f"Too many images; at most {MAX_BATCH_FILES} per request.")
+        oversized = next((name for name, _, size in entries if size > MAX_IMAGE_BYTES), None)
+        if oversized is not None:
+            raise HTTPException(
+                status_code=413, detail=f"Image '{oversized}' is larger than {MAX_IMAGE_BYTES // (1024 * 1024)} MB."
+            )
+        if sum(size for _, _, size in entries) > MAX_BATCH_BYTES:
+            raise HTTPException(
+                status_code=413, detail=f"Images are larger than {MAX_BATCH_BYTES // (1024 * 1024)} MB in total."
+            )
+
+        expanded = []
+        for name, payload, _ in entries:
+            if isinstance(payload, tuple):
+                archive, member = payload
+                try:
+                    payload = archive.read(member)
+                except (zipfile.BadZipFile, NotImplementedError, RuntimeError):
+                    payload = "Archive member could not be extracted."
+            expanded.append((name, payload))
+    return expanded
+
+
+@app.post("/predict/batch")
+async def predict_images_batch(files: List[UploadFile] = File(...)):
+    """
+    API endpoint for predicting the waste category of many images at once.
+
+    Accepts image files and/or zip archives of images. Images are decoded and preprocessed in
+    parallel and classified in batched forward passes of up to `CLASSIFIER_MAX_BATCH_SIZE` images.
+    A file that cannot be processed gets an "error" entry instead of failing the whole request.
+
+    Args:
+        files (List[UploadFile]): The uploaded image files or zip archives.
+
+    Returns:
+        dict: Per-file results in upload order plus the number of files and errors.
+    """
+    uploads = [(file.filename or "", await file.read()) for file in files]
+    entries = _expand_uploads(uploads)
+
+    # Images are decoded straight into the rows of one preallocated batch tensor
+    payloads = [payload for _, payload in entries if isinstance(payload, bytes)]
+    batch = torch.empty((len(payloads), 3, IMAGE_SIZE, IMAGE_SIZE), dtype=torch.float32)
+    loop = asyncio.get_running_loop()
+    decoded = await asyncio.gather(*(
+        loop.run_in_executor(decode_executor, load_image_tensor, payload, batch[row])
+        for row, payload in enumerate(payloads)
+    ), return_exceptions=True)
+
+    results = []
+    rows = []
+    decoded_iter = enumerate(decoded)
+    for filename, payload in entries:
+        if not isinstance(payload, bytes):
+            results.append({"filename": filename, "error": payload})
+            continue
+        row, image = next(decoded_iter)
+        if isinstance(image, UnidentifiedImageError):
+            results.append({"filename": filename, "error": "Uploaded file is not a valid image."})
+        elif isinstance(image, Exception):
+            results.append({"filename": filename, "error": f"Could not process image: {str(image)}"})
+        else:
+            results.append({"filename": filename})
+            rows.append((len(results) - 1, row))
+
+    try:
+        for start in range(0, len(rows), MAX_BATCH_SIZE):
+            chunk = rows[start:start + MAX_BATCH_SIZE]
+            outputs = await asyncio.to_thread(model_registry, batch[[row for _, row in chunk]])
+            for (position, _), output in zip(chunk, outputs):
+                results[position].update(_prediction(output))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    return {
+        "results": results,
+        "count": len(results),
+        "errors": sum(1 for result in results if "error" in result)
+    }
+
+
+@app.get("/batcher/stats")
+async def get_batcher_stats():
+    """
+    API endpoint returning queue depth and batch-size histogram of the dynamic batcher.
+    """
+    return batcher.stats()
+
+
+@app.get("/model/stats")
+async def get_model_stats():
+    """
+    API endpoint returning the loaded backend, its load time and the worker's resident memory.
+    """
+    return model_registry.stats()
+
+
+def _resolve_weights_path(weights_path: str) -> str:
+    """
+    Resolve a checkpoint path (relative paths are relative to MODEL_DIR) and make sure it lies inside MODEL_DIR.
+    """
+    resolved = os.path.realpath(os.path.join(MODEL_DIR, weights_path))
+    if os.path.commonpath([resolved, MODEL_DIR]) != MODEL_DIR:
+        raise HTTPException(status_code=400, detail="Checkpoints can only be loaded from the model directory.")
+    if not os.path.isfile(resolved):
+        raise HTTPException(status_code=404, detail=f"Checkpoint '{weights_path}' not found.")
+    return resolved
+
+
+@app.post("/model/reload")
+async def reload_model(weights_path: Optional[str] = None, backend: Optional[str] = None, authorization: str = Header(None)):
+    """
+    API endpoint hot-swapping the classifier without a restart.
+
+    The new model is loaded next to the serving one, which keeps answering requests until the swap.
+    Requires `Authorization: Bearer <ADMIN_TOKEN>`.
+
+    Args:
+        weights_path (Optional[str]): Checkpoint inside the model directory (CLASSIFIER_MODEL_DIR) to load,
+            with its exported artifacts next to it; the configured one (re-read from disk) if omitted.
+        backend (Optional[str]): Backend to switch to; the current one if omitted.
+
+    Returns:
+        dict: The model stats after the swap.
+    """
+    require_admin_token(authorization, ADMIN_TOKEN)
+    if weights_path is not None:
+        weights_path = _resolve_weights_path(weights_path)
+    try:
+        stats = await asyncio.to_thread(model_registry.load, weights_path, backend)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not load model: {str(e)}")
+    # Cached predictions belong to the previous model
+    prediction_cache.clear()
+    return stats
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    API endpoint returning prediction cache size and exact/near-duplicate hit counters.
+    """
+    return prediction_cache.stats()
+
+
+@app.delete("/cache")
+async def clear_cache():
+    """
+    API endpoint dropping every cached prediction.
+    """
+    return {"removed": prediction_cache.clear()}
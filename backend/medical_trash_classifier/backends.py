@@ -0,0 +1,183 @@
+from torchvision import models
+from typing import Callable, Iterable, Optional
+import copy
+import logging
+import os
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+NUM_CLASSES = 7
+BACKENDS = ("fp32", "dynamic_int8", "static_int8", "torchscript", "compile", "onnx")
+
+# Artifacts written by `python -m medical_trash_classifier.export_model`, next to the .pth checkpoint
+STATIC_INT8_FILE = "medical_trash_classifier_int8.pt"
+TORCHSCRIPT_FILE = "medical_trash_classifier_ts.pt"
+ONNX_FILE = "medical_trash_classifier.onnx"
+
+Runner = Callable[[torch.Tensor], torch.Tensor]
+
+def build_model(
+    weights_path: Optional[str] = None,
+    device: torch.device = torch.device("cpu"),
+    mmap_weights: bool = False
+) -> nn.Module:
+    """
+    Build the 7-class ResNet-50 and load the trained weights.
+
+    Args:
+        weights_path (Optional[str]): Path to `medical_trash_classifier.pth`; random weights if None.
+        device (torch.device): Device to load the model on.
+        mmap_weights (bool): On the CPU, use the memory-mapped checkpoint tensors as the model
+            parameters instead of copying them, so processes share the weight pages.
+
+    Returns:
+        nn.Module: The model in eval mode.
+    """
+    model = models.resnet50()
+    model.fc = nn.Linear(model.fc.in_features, NUM_CLASSES)
+    if weights_path is not None:
+        if mmap_weights and device.type == "cpu":
+            model.load_state_dict(torch.load(weights_path, map_location=device, mmap=True), assign=True)
+        else:
+            model.load_state_dict(torch.load(weights_path, map_location=device))
+    model.eval()
+    return model.to(device)
+
+def example_input(batch_size: int = 1) -> torch.Tensor:
+    """
+    Dummy input with the shape expected by the model, used for tracing and export.
+    """
+    return torch.randn(batch_size, 3, 224, 224)
+
+def quantize_dynamic_int8(model: nn.Module) -> nn.Module:
+    """
+    Dynamically quantize the model's Linear layers to int8 (weights int8, activations quantized at runtime).
+    In ResNet-50 this only covers the classifier head; use `quantize_static_int8` to quantize the convolutions.
+    """
+    return torch.ao.quantization.quantize_dynamic(copy.deepcopy(model).cpu(), {nn.Linear}, dtype=torch.qint8)
+
+def quantize_static_int8(model: nn.Module, calibration_batches: Iterable[torch.Tensor], engine: str = "x86") -> nn.Module:
+    """
+    Statically quantize the whole model to int8 with FX graph mode quantization.
+
+    Args:
+        model (nn.Module): fp32 model in eval mode.
+        calibration_batches (Iterable[torch.Tensor]): Preprocessed (N, 3, 224, 224) batches used to
+            observe activation ranges.
+        engine (str): Quantized engine ("x86", "fbgemm" or "qnnpack").
+
+    Returns:
+        nn.Module: The quantized model.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    torch.backends.quantized.engine = engine
+    prepared = prepare_fx(
+        copy.deepcopy(model).cpu().eval(),
+        get_default_qconfig_mapping(engine),
+        example_inputs=(example_input(),)
+    )
+    batches = 0
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+            batches += 1
+    logger.info(f"Calibrated static int8 quantization on {batches} batches")
+    return convert_fx(prepared)
+
+def to_torchscript(model: nn.Module, device: torch.device = torch.device("cpu")) -> torch.jit.ScriptModule:
+    """
+    Trace and freeze the model (already on `device`) into a TorchScript module.
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input().to(device))
+    return torch.jit.freeze(traced)
+
+def export_onnx(model: nn.Module, path: str, opset_version: int = 17) -> None:
+    """
+    Export the model to ONNX with a dynamic batch dimension.
+    """
+    torch.onnx.export(
+        copy.deepcopy(model).cpu().eval(),
+        example_input(),
+        path,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset_version
+    )
+    logger.info(f"ONNX model exported to {path}")
+
+def _torch_runner(model, device: torch.device) -> Runner:
+    def run(batch: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return model(batch.to(device)).cpu()
+    return run
+
+def _onnx_runner(path: str, num_threads: Optional[int] = None) -> Runner:
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+    session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+    def run(batch: torch.Tensor) -> torch.Tensor:
+        outputs = session.run(None, {"input": batch.cpu().numpy()})
+        return torch.from_numpy(outputs[0])
+    return run
+
+def load_backend(
+    name: str,
+    weights_path: str,
+    device: torch.device = torch.device("cpu"),
+    artifacts_dir: Optional[str] = None,
+    num_threads: Optional[int] = None,
+    mmap_weights: bool = False
+) -> Runner:
+    """
+    Load an inference backend for the trained classifier.
+
+    "fp32", "dynamic_int8" and "compile" are built from the .pth checkpoint at load time;
+    "static_int8", "torchscript" and "onnx" load the artifacts written by the export command.
+    Quantized and ONNX backends always run on the CPU.
+
+    Args:
+        name (str): One of `BACKENDS`.
+        weights_path (str): Path to `medical_trash_classifier.pth`.
+        device (torch.device): Device for the fp32, TorchScript and compiled backends.
+        artifacts_dir (Optional[str]): Directory of exported artifacts; defaults to the checkpoint's directory.
+        num_threads (Optional[int]): Intra-op thread count for onnxruntime.
+        mmap_weights (bool): Memory-map the .pth checkpoint, see `build_model`.
+
+    Returns:
+        Runner: Function mapping a (N, 3, 224, 224) batch to (N, 7) logits on the CPU.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown classifier backend '{name}', expected one of {BACKENDS}")
+    artifacts_dir = artifacts_dir or os.path.dirname(weights_path)
+    cpu = torch.device("cpu")
+
+    if name == "onnx":
+        runner = _onnx_runner(os.path.join(artifacts_dir, ONNX_FILE), num_threads)
+    elif name == "static_int8":
+        runner = _torch_runner(torch.jit.load(os.path.join(artifacts_dir, STATIC_INT8_FILE), map_location=cpu), cpu)
+    elif name == "torchscript":
+        runner = _torch_runner(torch.jit.load(os.path.join(artifacts_dir, TORCHSCRIPT_FILE), map_location=device), device)
+    else:
+        model = build_model(weights_path, device, mmap_weights)
+        if name == "dynamic_int8":
+            runner = _torch_runner(quantize_dynamic_int8(model), cpu)
+        elif name == "compile":
+            runner = _torch_runner(torch.compile(model), device)
+        else:
+            runner = _torch_runner(model, device)
+    logger.info(f"Classifier backend '{name}' loaded")
+    return runner
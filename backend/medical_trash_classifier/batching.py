@@ -0,0 +1,130 @@
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+from .metrics import BATCH_SIZE, FORWARD_SECONDS, QUEUE_DEPTH
+import asyncio
+import logging
+import time
+import torch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 5.0
+
+class DynamicBatcher:
+    """
+    Collects concurrent single-image inference requests into batches.
+
+    A batch is dispatched once it holds `max_batch_size` images or `max_wait_ms` milliseconds after
+    its first image arrived, whichever comes first. The batched forward pass runs in a worker thread
+    so the event loop stays responsive, and each caller receives its own row of the output.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[torch.Tensor], torch.Tensor],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS
+    ):
+        """
+        Args:
+            run_batch (Callable[[torch.Tensor], torch.Tensor]): Maps an (N, C, H, W) batch to (N, classes) outputs.
+            max_batch_size (int): Maximum number of images per forward pass.
+            max_wait_ms (float): Maximum time the first image of a batch waits for more images.
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.batch_size_histogram: Counter = Counter()
+        self.max_queue_depth = 0
+        self.requests = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_started(self) -> None:
+        """
+        Start the batching worker on the running event loop (mounted apps get no startup hook).
+        """
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+            logger.info(f"Dynamic batcher started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms})")
+
+    async def submit(self, image: torch.Tensor) -> torch.Tensor:
+        """
+        Queue a single preprocessed image and wait for its model output.
+
+        Args:
+            image (torch.Tensor): (C, H, W) image tensor.
+
+        Returns:
+            torch.Tensor: The model output row for this image.
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((image, future))
+        self.requests += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return await future
+
+    async def _collect(self) -> List[Tuple[torch.Tensor, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            getter = asyncio.ensure_future(self._queue.get())
+            await asyncio.wait({getter}, timeout=remaining)
+            if not getter.done():
+                getter.cancel()
+            # Checked after cancel() so an item retrieved at the deadline is never lost
+            if getter.done() and not getter.cancelled():
+                batch.append(getter.result())
+            else:
+                break
+        QUEUE_DEPTH.set(self._queue.qsize())
+        # Callers that gave up (e.g. disconnected clients) are dropped before inference
+        return [(image, future) for image, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            self.batch_size_histogram[len(batch)] += 1
+            BATCH_SIZE.observe(len(batch))
+            try:
+                start = time.perf_counter()
+                outputs = await asyncio.to_thread(self.run_batch, torch.stack([image for image, _ in batch]))
+                FORWARD_SECONDS.observe(time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Batched inference failed for {len(batch)} images: {str(e)}", exc_info=True)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+    def stats(self) -> Dict:
+        """
+        Return queue depth and batch-size histogram counters.
+        """
+        batches = sum(self.batch_size_histogram.values())
+        images = sum(size * count for size, count in self.batch_size_histogram.items())
+        return {
+            "maxBatchSize": self.max_batch_size,
+            "maxWaitMs": self.max_wait_ms,
+            "queueDepth": self._queue.qsize() if self._queue is not None else 0,
+            "maxQueueDepth": self.max_queue_depth,
+            "requests": self.requests,
+            "batches": batches,
+            "meanBatchSize": images / batches if batches else 0.0,
+            "batchSizeHistogram": {str(size): count for size, count in sorted(self.batch_size_histogram.items())}
+        }
@@ -0,0 +1,297 @@
+from .backends import (
+    BACKENDS,
+    ONNX_FILE,
+    STATIC_INT8_FILE,
+    TORCHSCRIPT_FILE,
+    build_model,
+    export_onnx,
+    load_backend,
+    quantize_static_int8,
+    to_torchscript
+)
+from .labels import classes
+from .preprocessing import PARITY_TOLERANCE, load_image_tensor, preprocessing_difference
+from PIL import UnidentifiedImageError
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import json
+import logging
+import os
+import random
+import time
+import torch
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(current_dir, "models", "medical_trash_classifier.pth")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tiff")
+
+def _label_from_path(path: str) -> Optional[int]:
+    """
+    Infer the class index from a directory component named after a class (the training dataset layout).
+    """
+    for part in os.path.normpath(path).split(os.sep):
+        if part in classes:
+            return classes.index(part)
+    return None
+
+def list_images(image_dir: str, limit: Optional[int] = None, seed: int = 0) -> List[Tuple[str, Optional[int]]]:
+    """
+    Recursively list image files under `image_dir` with their label, if the path names a class.
+
+    Args:
+        image_dir (str): Root directory.
+        limit (Optional[int]): Keep a random sample of at most this many images.
+        seed (int): Sampling seed.
+
+    Returns:
+        List[Tuple[str, Optional[int]]]: (path, class index or None) pairs.
+    """
+    images = []
+    for root, _, files in os.walk(image_dir):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, name)
+                images.append((path, _label_from_path(os.path.relpath(path, image_dir))))
+    images.sort()
+    if limit is not None and len(images) > limit:
+        images = random.Random(seed).sample(images, limit)
+    return images
+
+def iter_batches(images: List[Tuple[str, Optional[int]]], batch_size: int) -> Iterator[Tuple[torch.Tensor, List[Optional[int]]]]:
+    """
+    Yield preprocessed image batches with their labels, skipping unreadable files.
+    """
+    tensors, labels = [], []
+    for path, label in images:
+        try:
+            with open(path, "rb") as f:
+                tensors.append(load_image_tensor(f.read()))
+            labels.append(label)
+        except (OSError, UnidentifiedImageError):
+            logger.warning(f"Skipping unreadable image: {path}")
+            continue
+        if len(tensors) == batch_size:
+            yield torch.stack(tensors), labels
+            tensors, labels = [], []
+    if tensors:
+        yield torch.stack(tensors), labels
+
+def export_artifacts(
+    backends: List[str],
+    weights_path: str,
+    output_dir: str,
+    calibration_dir: Optional[str] = None,
+    calibration_size: int = 200,
+    batch_size: int = 16
+) -> None:
+    """
+    Write the artifacts loaded by the "static_int8", "torchscript" and "onnx" backends.
+
+    Args:
+        backends (List[str]): Backends to export.
+        weights_path (str): Path to `medical_trash_classifier.pth`.
+        output_dir (str): Directory the artifacts are written to.
+        calibration_dir (Optional[str]): Images observed during static int8 calibration.
+        calibration_size (int): Maximum number of calibration images.
+        batch_size (int): Calibration batch size.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    model = build_model(weights_path)
+
+    if "torchscript" in backends:
+        path = os.path.join(output_dir, TORCHSCRIPT_FILE)
+        torch.jit.save(to_torchscript(model), path)
+        logger.info(f"TorchScript model saved to {path}")
+
+    if "onnx" in backends:
+        export_onnx(model, os.path.join(output_dir, ONNX_FILE))
+
+    if "static_int8" in backends:
+        if calibration_dir is None:
+            raise ValueError("Static int8 quantization requires --calibration-dir")
+        calibration_images = list_images(calibration_dir, limit=calibration_size)
+        quantized = quantize_static_int8(model, (batch for batch, _ in iter_batches(calibration_images, batch_size)))
+        path = os.path.join(output_dir, STATIC_INT8_FILE)
+        torch.jit.save(to_torchscript(quantized), path)
+        logger.info(f"Static int8 model saved to {path}")
+
+def check_parity(
+    backends: List[str],
+    weights_path: str,
+    artifacts_dir: str,
+    image_dir: str,
+    batch_size: int = 16,
+    accuracy_budget: float = 0.01,
+    limit: Optional[int] = None
+) -> Dict:
+    """
+    Compare every backend with the fp32 model on a held-out image set.
+
+    Reports top-1 agreement with fp32, accuracy (for images whose path names their class), the
+    largest absolute logit difference and the mean latency per image, and recommends the fastest
+    backend whose agreement and accuracy stay within `accuracy_budget` of fp32.
+
+    Args:
+        backends (List[str]): Backends to evaluate against fp32.
+        weights_path (str): Path to `medical_trash_classifier.pth`.
+        artifacts_dir (str): Directory holding exported artifacts.
+        image_dir (str): Held-out images.
+        batch_size (int): Inference batch size.
+        accuracy_budget (float): Maximum allowed drop in agreement/accuracy versus fp32.
+        limit (Optional[int]): Maximum number of images evaluated.
+
+    Returns:
+        Dict: The parity report.
+    """
+    images = list_images(image_dir, limit=limit)
+    batches = list(iter_batches(images, batch_size))
+    if not batches:
+        raise ValueError(f"No readable images found in '{image_dir}'")
+    labels = [label for _, batch_labels in batches for label in batch_labels]
+    labelled = [i for i, label in enumerate(labels) if label is not None]
+
+    def _evaluate(runner) -> Tuple[torch.Tensor, float]:
+        runner(batches[0][0])  # warm-up
+        outputs, elapsed = [], 0.0
+        for batch, _ in batches:
+            start = time.perf_counter()
+            outputs.append(runner(batch).float())
+            elapsed += time.perf_counter() - start
+        return torch.cat(outputs), elapsed * 1000 / len(labels)
+
+    reference, reference_ms = _evaluate(load_backend("fp32", weights_path, artifacts_dir=artifacts_dir))
+    reference_pred = reference.argmax(dim=1)
+
+    def _accuracy(predictions: torch.Tensor) -> Optional[float]:
+        if not labelled:
+            return None
+        return sum(int(predictions[i]) == labels[i] for i in labelled) / len(labelled)
+
+    fp32_accuracy = _accuracy(reference_pred)
+    report = {
+        "images": len(labels),
+        "labelledImages": len(labelled),
+        "accuracyBudget": accuracy_budget,
+        "backends": [{
+            "backend": "fp32",
+            "agreement": 1.0,
+            "accuracy": fp32_accuracy,
+            "maxAbsLogitDiff": 0.0,
+            "msPerImage": reference_ms,
+            "withinBudget": True
+        }]
+    }
+    for name in backends:
+        if name == "fp32":
+            continue
+        try:
+            outputs, ms_per_image = _evaluate(load_backend(name, weights_path, artifacts_dir=artifacts_dir))
+        except Exception as e:
+            logger.error(f"Backend '{name}' could not be evaluated: {str(e)}", exc_info=True)
+            report["backends"].append({"backend": name, "error": str(e), "withinBudget": False})
+            continue
+        predictions = outputs.argmax(dim=1)
+        agreement = (predictions == reference_pred).float().mean().item()
+        accuracy = _accuracy(predictions)
+        within_budget = agreement >= 1.0 - accuracy_budget and (
+            accuracy is None or accuracy >= fp32_accuracy - accuracy_budget
+        )
+        report["backends"].append({
+            "backend": name,
+            "agreement": agreement,
+            "accuracy": accuracy,
+            "maxAbsLogitDiff": (outputs - reference).abs().max().item(),
+            "msPerImage": ms_per_image,
+            "withinBudget": within_budget
+        })
+
+    eligible = [entry for entry in report["backends"] if entry["withinBudget"]]
+    report["recommendedBackend"] = min(eligible, key=lambda entry: entry["msPerImage"])["backend"]
+    for entry in report["backends"]:
+        logger.info(f"{entry}")
+    logger.info(f"Recommended backend: {report['recommendedBackend']}")
+    return report
+
+def check_preprocessing(image_dir: str, limit: Optional[int] = None, tolerance: float = PARITY_TOLERANCE) -> Dict:
+    """
+    Compare the fast preprocessing path with the reference `transform` on a set of images.
+
+    Args:
+        image_dir (str): Images to compare.
+        limit (Optional[int]): Maximum number of images compared.
+        tolerance (float): Maximum mean absolute difference allowed per image.
+
+    Returns:
+        Dict: Worst and mean differences and the images exceeding the tolerance.
+    """
+    differences = []
+    for path, _ in list_images(image_dir, limit=limit):
+        try:
+            with open(path, "rb") as f:
+                differences.append((path, preprocessing_difference(f.read())))
+        except (OSError, UnidentifiedImageError):
+            logger.warning(f"Skipping unreadable image: {path}")
+    report = {
+        "images": len(differences),
+        "tolerance": tolerance,
+        "meanAbsDiff": sum(diff["meanAbsDiff"] for _, diff in differences) / len(differences) if differences else 0.0,
+        "worstMeanAbsDiff": max((diff["meanAbsDiff"] for _, diff in differences), default=0.0),
+        "maxAbsDiff": max((diff["maxAbsDiff"] for _, diff in differences), default=0.0),
+        "outOfTolerance": [path for path, diff in differences if diff["meanAbsDiff"] > tolerance]
+    }
+    logger.info(
+        f"Fast preprocessing: mean abs diff {report['meanAbsDiff']:.4f}, worst {report['worstMeanAbsDiff']:.4f}, "
+        f"{len(report['outOfTolerance'])} of {report['images']} images above tolerance {tolerance}"
+    )
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export optimized inference backends and check their accuracy parity.")
+    parser.add_argument(
+        "--backend",
+        choices=["static_int8", "torchscript", "onnx", "all"],
+        nargs="+",
+        default=["all"],
+        help="Artifacts to export."
+    )
+    parser.add_argument("--weights", default=MODEL_PATH, help="Path to the trained .pth checkpoint.")
+    parser.add_argument("--output-dir", default=os.path.dirname(MODEL_PATH), help="Directory for exported artifacts.")
+    parser.add_argument("--calibration-dir", help="Images used to calibrate static int8 quantization.")
+    parser.add_argument("--calibration-size", type=int, default=200, help="Maximum number of calibration images.")
+    parser.add_argument("--parity-dir", help="Held-out images for the accuracy-parity check against fp32.")
+    parser.add_argument("--parity-limit", type=int, help="Maximum number of held-out images evaluated.")
+    parser.add_argument("--accuracy-budget", type=float, default=0.01, help="Allowed agreement/accuracy drop versus fp32.")
+    parser.add_argument("--batch-size", type=int, default=16, help="Batch size for calibration and parity checks.")
+    parser.add_argument("--report", default="backend_parity_report.json", help="Where to save the parity report.")
+    parser.add_argument("--skip-export", action="store_true", help="Only run the parity check on existing artifacts.")
+    args = parser.parse_args()
+
+    selected = ["static_int8", "torchscript", "onnx"] if "all" in args.backend else args.backend
+    # Check the calibration data before exporting anything, so a run never stops half-way
+    if "static_int8" in selected and not args.calibration_dir:
+        if "all" in args.backend:
+            logger.warning("Skipping static_int8: its quantization requires --calibration-dir")
+            selected = [name for name in selected if name != "static_int8"]
+        else:
+            parser.error("static_int8 requires --calibration-dir")
+    if not args.skip_export:
+        export_artifacts(
+            selected, args.weights, args.output_dir, args.calibration_dir, args.calibration_size, args.batch_size
+        )
+    if args.parity_dir:
+        parity_report = check_parity(
+            [name for name in BACKENDS if name != "fp32"],
+            args.weights,
+            args.output_dir,
+            args.parity_dir,
+            args.batch_size,
+            args.accuracy_budget,
+            args.parity_limit
+        )
+        parity_report["preprocessing"] = check_preprocessing(args.parity_dir, args.parity_limit)
+        with open(args.report, "w") as f:
+            json.dump(parity_report, f, indent=2)
+        logger.info(f"Parity report saved to '{args.report}'")
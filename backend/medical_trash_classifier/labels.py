@@ -0,0 +1,21 @@
+# Define class labels (7-Class Model)
+classes = [
+    "General Waste - Metal & Glass",
+    "General Waste - Organic",
+    "General Waste - Paper",
+    "General Waste - Plastic",
+    "Infectious Waste",
+    "Pathological Waste",
+    "Sharps Waste"
+]
+
+# Define 4-Class Biomedical Waste Mapping
+biomedical_mapping = {
+    "Pathological Waste": "Red",
+    "Infectious Waste": "Red",
+    "General Waste - Organic": "Grey",
+    "General Waste - Paper": "Grey",
+    "General Waste - Plastic": "Blue",
+    "General Waste - Metal & Glass": "Blue",
+    "Sharps Waste": "White"
+}
@@ -0,0 +1,29 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    "ecomedai_classifier_stage_seconds",
+    "Time spent in each stage of /predict/ (preprocess, inference including batch wait).",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+FORWARD_SECONDS = Histogram(
+    "ecomedai_classifier_forward_seconds",
+    "Duration of batched forward passes.",
+    buckets=STAGE_BUCKETS
+)
+BATCH_SIZE = Histogram(
+    "ecomedai_classifier_batch_size",
+    "Images per batched forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+QUEUE_DEPTH = Gauge(
+    "ecomedai_classifier_batcher_queue_depth",
+    "Images waiting in the dynamic batcher queue."
+)
+PREDICTIONS = Counter(
+    "ecomedai_classifier_predictions_total",
+    "/predict/ results by cache status (hit, near_duplicate, miss, uncached).",
+    ["cache_status"]
+)
\ No newline at end of file
@@ -0,0 +1,257 @@
+from multiprocessing import Pool
+from PIL import Image, UnidentifiedImageError
+from torch.utils.data import DataLoader, Dataset, Sampler
+from typing import Dict, Iterator, List, Optional, Tuple
+import glob
+import json
+import logging
+import numpy as np
+import os
+import time
+import torch
+
+logger = logging.getLogger(__name__)
+
+CLASS_TO_IDX = {
+    "General Waste - Metal & Glass": 0,
+    "General Waste - Organic": 1,
+    "General Waste - Paper": 2,
+    "General Waste - Plastic": 3,
+    "Infectious Waste": 4,
+    "Pathological Waste": 5,
+    "Sharps Waste": 6
+}
+VALID_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".gif")
+
+IMAGES_FILE = "images.npy"
+LABELS_FILE = "labels.npy"
+MANIFEST_FILE = "manifest.json"
+
+def list_dataset_images(root_dir: str) -> List[Tuple[str, int]]:
+    """
+    List the (path, label) pairs of the WHO-standard dataset layout
+    (`<class name>/Train images` and `<class name>/Test images`).
+    """
+    samples = []
+    for class_name, class_idx in CLASS_TO_IDX.items():
+        for folder in ("Train images", "Test images"):
+            folder = os.path.join(root_dir, class_name, folder)
+            if os.path.exists(folder):
+                for img_path in sorted(glob.glob(os.path.join(folder, "*.*"))):
+                    if img_path.lower().endswith(VALID_EXTENSIONS):
+                        samples.append((img_path, class_idx))
+    return samples
+
+def _load_resized(args: Tuple[str, int]) -> Optional[np.ndarray]:
+    path, image_size = args
+    try:
+        with Image.open(path) as image:
+            return np.asarray(image.convert("RGB").resize((image_size, image_size), Image.BILINEAR), dtype=np.uint8)
+    except (OSError, UnidentifiedImageError):
+        return None
+
+def pack_shards(root_dir: str, shard_dir: str, image_size: int = 224, workers: Optional[int] = None) -> Dict:
+    """
+    Decode and resize every dataset image once and pack them into a memory-mapped uint8 array.
+
+    Writes `images.npy` (N, image_size, image_size, 3), `labels.npy` (N,) and `manifest.json`.
+    Corrupt images are skipped. Decoding runs in a process pool.
+
+    Args:
+        root_dir (str): Dataset root in the WHO-standard layout.
+        shard_dir (str): Output directory.
+        image_size (int): Side of the stored square images (the training Resize size).
+        workers (Optional[int]): Decoding processes; defaults to the number of CPUs.
+
+    Returns:
+        Dict: The manifest.
+    """
+    samples = list_dataset_images(root_dir)
+    if not samples:
+        raise ValueError(f"No images found under '{root_dir}'")
+    os.makedirs(shard_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    images_path = os.path.join(shard_dir, IMAGES_FILE)
+    images = np.lib.format.open_memmap(
+        images_path + ".tmp", mode="w+", dtype=np.uint8, shape=(len(samples), image_size, image_size, 3)
+    )
+    labels, skipped, count = [], [], 0
+    with Pool(workers) as pool:
+        decoded = pool.imap(_load_resized, ((path, image_size) for path, _ in samples), chunksize=16)
+        for (path, label), pixels in zip(samples, decoded):
+            if pixels is None:
+                logger.warning(f"Skipping corrupt file: {path}")
+                skipped.append(path)
+                continue
+            images[count] = pixels
+            labels.append(label)
+            count += 1
+    images.flush()
+    del images
+
+    # Trim the unused tail left by skipped images, then publish the files atomically
+    if skipped:
+        full = np.load(images_path + ".tmp", mmap_mode="r")
+        trimmed = np.lib.format.open_memmap(images_path + ".trim", mode="w+", dtype=np.uint8, shape=(count,) + full.shape[1:])
+        trimmed[:] = full[:count]
+        trimmed.flush()
+        del trimmed, full
+        os.replace(images_path + ".trim", images_path + ".tmp")
+    os.replace(images_path + ".tmp", images_path)
+    np.save(os.path.join(shard_dir, LABELS_FILE), np.asarray(labels, dtype=np.int64))
+
+    manifest = {
+        "sourceDir": os.path.abspath(root_dir),
+        "numImages": count,
+        "imageSize": image_size,
+        "classToIdx": CLASS_TO_IDX,
+        "skipped": skipped
+    }
+    with open(os.path.join(shard_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Packed {count} images into '{shard_dir}' in {time.perf_counter() - start:.1f}s ({len(skipped)} skipped)")
+    return manifest
+
+def shards_exist(shard_dir: str, root_dir: Optional[str] = None, image_size: Optional[int] = None) -> bool:
+    """
+    Check that `shard_dir` holds packed shards usable for the requested dataset and image size.
+
+    Args:
+        shard_dir (str): Directory written by `pack_shards`.
+        root_dir (Optional[str]): Dataset root the shards must have been packed from; not checked if None.
+        image_size (Optional[int]): Image side the shards must have been packed with; not checked if None.
+
+    Returns:
+        bool: False if a file is missing or the manifest does not match the arguments and the
+        current class mapping, in which case the shards must be packed again.
+    """
+    if not all(os.path.exists(os.path.join(shard_dir, name)) for name in (IMAGES_FILE, LABELS_FILE, MANIFEST_FILE)):
+        return False
+    try:
+        with open(os.path.join(shard_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"Unreadable shard manifest in '{shard_dir}'")
+        return False
+
+    expected = {"classToIdx": CLASS_TO_IDX}
+    if root_dir is not None:
+        expected["sourceDir"] = os.path.abspath(root_dir)
+    if image_size is not None:
+        expected["imageSize"] = image_size
+    # Setting -> (packed value, requested value)
+    mismatched = {key: (manifest.get(key), value) for key, value in expected.items() if manifest.get(key) != value}
+    if mismatched:
+        logger.warning(f"Shards in '{shard_dir}' do not match the requested dataset: {mismatched}")
+        return False
+    return True
+
+class ShardedImageDataset(Dataset):
+    """
+    Dataset over the pre-resized uint8 images written by `pack_shards`.
+
+    The image array is memory-mapped lazily in each DataLoader worker, so workers share the page
+    cache instead of decoding files. Items are (3, H, W) uint8 tensors passed through `transform`.
+
+    With a `seed`, the random transforms of each item are seeded from the seed, the epoch set with
+    `set_epoch` and the item index, so augmentation is reproducible whatever the worker or process
+    that loads the item. The epoch lives in shared memory, so persistent workers see its updates.
+    """
+
+    def __init__(self, shard_dir: str, transform=None, seed: Optional[int] = None):
+        """
+        Args:
+            shard_dir (str): Directory written by `pack_shards`.
+            transform (callable): Tensor transform applied to each uint8 (3, H, W) image.
+            seed (Optional[int]): Base seed of the per-item transform seeds; unseeded if None.
+        """
+        self.shard_dir = shard_dir
+        self.transform = transform
+        self.seed = seed
+        self._epoch = torch.zeros((), dtype=torch.int64).share_memory_()
+        self.labels = np.load(os.path.join(shard_dir, LABELS_FILE))
+        with open(os.path.join(shard_dir, MANIFEST_FILE)) as f:
+            self.class_to_idx = json.load(f)["classToIdx"]
+        self._images = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def set_epoch(self, epoch: int) -> None:
+        """
+        Set the epoch the per-item transform seeds are derived from; call before iterating the epoch.
+        """
+        self._epoch.fill_(epoch)
+
+    def __getitem__(self, idx):
+        if self._images is None:
+            self._images = np.load(os.path.join(self.shard_dir, IMAGES_FILE), mmap_mode="r")
+        image = torch.from_numpy(np.array(self._images[idx])).permute(2, 0, 1)
+        if self.transform and self.seed is not None:
+            # Fork the RNG so seeding items does not disturb the main process when loading without workers
+            with torch.random.fork_rng(devices=[]):
+                torch.manual_seed(self.seed + int(self._epoch) * len(self) + idx)
+                image = self.transform(image)
+        elif self.transform:
+            image = self.transform(image)
+        return image, int(self.labels[idx])
+
+def make_loader(
+    dataset: Dataset,
+    batch_size: int,
+    shuffle: bool = False,
+    num_workers: int = 4,
+    prefetch_factor: int = 4,
+    sampler: Optional[Sampler] = None,
+    drop_last: bool = False
+) -> DataLoader:
+    """
+    DataLoader with pinned memory (when a GPU is present), persistent workers and prefetching.
+    """
+    options = {}
+    if num_workers > 0:
+        options = {"persistent_workers": True, "prefetch_factor": prefetch_factor}
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=shuffle and sampler is None,
+        sampler=sampler,
+        num_workers=num_workers,
+        pin_memory=torch.cuda.is_available(),
+        drop_last=drop_last,
+        **options
+    )
+
+class LoaderTimer:
+    """
+    Splits an epoch's wall time into time spent waiting for batches and time spent computing.
+
+    Iterate batches through `timer.iter(loader)`; the time between yielding a batch and
+    requesting the next one counts as compute.
+    """
+
+    def __init__(self):
+        self.data_seconds = 0.0
+        self.compute_seconds = 0.0
+        self.batches = 0
+
+    def iter(self, loader) -> Iterator:
+        self.data_seconds, self.compute_seconds, self.batches = 0.0, 0.0, 0
+        iterator = iter(loader)
+        while True:
+            start = time.perf_counter()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                return
+            fetched = time.perf_counter()
+            self.data_seconds += fetched - start
+            yield batch
+            self.compute_seconds += time.perf_counter() - fetched
+            self.batches += 1
+
+    def summary(self) -> str:
+        total = self.data_seconds + self.compute_seconds
+        share = self.data_seconds / total if total else 0.0
+        return f"data {self.data_seconds:.1f}s / compute {self.compute_seconds:.1f}s ({share:.0%} waiting on data, {self.batches} batches)"
@@ -1,10 +1,16 @@
-from PIL import Image, UnidentifiedImageError
-from torch.utils.data import Dataset, DataLoader
+from contextlib import nullcontext
+from data_pipeline import LoaderTimer, ShardedImageDataset, make_loader, pack_shards, shards_exist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data.distributed import DistributedSampler
 from torchvision.models import ResNet50_Weights
-import glob
+import argparse
+import copy
+import logging
 import matplotlib.pyplot as plt
 import os
+import random
 import torch
+import torch.distributed as dist
 import torch.nn as nn
 import torch.optim as optim
 import torchvision.transforms as transforms
@@ -12,200 +18,398 @@ import torchvision.models as models
 import torch.backends.cudnn as cudnn
 import zipfile
 
-# Step 1: Unzip the dataset if not already extracted
-zip_path = "philly_code_fest.zip"
-extract_path = "Medical_waste_WHO_standard_ext"
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-if not os.path.exists(extract_path):
-    print("Extracting dataset...")
-    try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_path)
-        print("Dataset unzipped successfully.")
-    except zipfile.BadZipFile:
-        raise RuntimeError("Error: The ZIP file is corrupted or invalid.")
-else:
-    print("Dataset already extracted.")
-
-# Step 2: Define dataset path
-dataset_path = os.path.join(extract_path, "philly_code_fest/Medical_waste_WHO_standard/Dataset")
-
-# Enable memory optimizations
-cudnn.benchmark = True
-cudnn.enabled = True
-
-# Check if GPU is available
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print("Using device:", device)
+# Define transformations (images are already resized to --image-size uint8 tensors)
+transform = transforms.Compose([
+    transforms.RandomHorizontalFlip(),
+    transforms.RandomRotation(10),
+    transforms.ConvertImageDtype(torch.float32),
+    transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
+])
 
 
-class MedicalWasteDataset(Dataset):
+def parse_args(argv=None):
+    """Parses the training command line."""
+    parser = argparse.ArgumentParser(description="Train the ResNet50 medical waste classifier.")
+    parser.add_argument("--zip-path", default="philly_code_fest.zip", help="Dataset archive.")
+    parser.add_argument("--extract-path", default="Medical_waste_WHO_standard_ext", help="Where the archive is extracted.")
+    parser.add_argument("--shard-dir", default=os.getenv("TRAIN_SHARD_DIR", "Medical_waste_shards"), help="Packed dataset directory.")
+    parser.add_argument("--image-size", type=int, default=224, help="Side of the packed training images (the served model expects 224).")
+    parser.add_argument("--output", default="models/medical_trash_classifier.pth", help="Where the trained weights are saved.")
+    parser.add_argument("--epochs", type=int, default=15, help="Number of epochs.")
+    parser.add_argument("--lr", type=float, default=0.001, help="Adam learning rate.")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("TRAIN_BATCH_SIZE", "8")), help="Per-step batch size.")
+    parser.add_argument("--accumulation-steps", type=int, default=1, help="Batches accumulated per optimizer step (effective batch = batch size x steps).")
+    parser.add_argument("--num-workers", type=int, default=int(os.getenv("TRAIN_NUM_WORKERS", str(min(8, os.cpu_count() or 2)))), help="DataLoader workers.")
+    parser.add_argument("--prefetch-factor", type=int, default=int(os.getenv("TRAIN_PREFETCH_FACTOR", "4")), help="Batches prefetched per worker.")
+    parser.add_argument("--threads", type=int, help="Intra-op CPU threads used by PyTorch.")
+    parser.add_argument("--bf16", action="store_true", help="Run forward passes under bfloat16 autocast.")
+    parser.add_argument("--channels-last", action="store_true", help="Use the channels-last memory format for the model and inputs.")
+    parser.add_argument("--compile", action="store_true", help="Compile the model with torch.compile.")
+    parser.add_argument("--checkpoint", default="models/train_checkpoint.pt", help="Checkpoint written after every epoch.")
+    parser.add_argument("--resume", action="store_true", help="Resume from --checkpoint if it exists.")
+    parser.add_argument("--patience", type=int, default=0, help="Stop after this many epochs without test loss improvement (0 disables).")
+    parser.add_argument("--min-delta", type=float, default=0.0, help="Minimum test loss decrease counted as an improvement.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the train/test split and initialization.")
+    parser.add_argument("--dist-backend", default="gloo", help="torch.distributed backend when launched with torchrun.")
+    parser.add_argument("--no-plot", action="store_true", help="Do not show the loss plot.")
+    return parser.parse_args(argv)
+
+
+def is_main_process():
+    """True on rank 0, or when training in a single process."""
+    return not dist.is_initialized() or dist.get_rank() == 0
+
+
+def log(*values):
+    """Prints on rank 0 only."""
+    if is_main_process():
+        print(*values)
+
+
+def setup_distributed(backend):
     """
-    Custom PyTorch Dataset to load medical waste images while filtering out non-image files.
+    Joins the process group when launched by torchrun (WORLD_SIZE > 1).
+
+    Returns:
+        tuple: (rank, world size, local rank)
     """
+    world_size = int(os.getenv("WORLD_SIZE", "1"))
+    if world_size > 1 and not dist.is_initialized():
+        dist.init_process_group(backend=backend)
+    rank = dist.get_rank() if dist.is_initialized() else 0
+    return rank, world_size, int(os.getenv("LOCAL_RANK", "0"))
 
-    def __init__(self, root_dir, transform=None):
-        """
-        Initializes the dataset by scanning directories and mapping labels.
-        
-        Args:
-            root_dir (str): Path to the dataset directory.
-            transform (torchvision.transforms): Transformations to apply to images.
-        """
-        self.root_dir = root_dir
-        self.transform = transform
-        self.image_paths = []
-        self.labels = []
-        self.class_to_idx = {
-            "General Waste - Metal & Glass": 0,
-            "General Waste - Organic": 1,
-            "General Waste - Paper": 2,
-            "General Waste - Plastic": 3,
-            "Infectious Waste": 4,
-            "Pathological Waste": 5,
-            "Sharps Waste": 6
-        }
 
-        valid_extensions = (".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".gif")
+def _barrier():
+    if dist.is_initialized():
+        dist.barrier()
 
-        for class_name, class_idx in self.class_to_idx.items():
-            train_folder = os.path.join(root_dir, class_name, "Train images")
-            test_folder = os.path.join(root_dir, class_name, "Test images")
 
-            for folder in [train_folder, test_folder]:
-                if os.path.exists(folder):
-                    for img_path in glob.glob(os.path.join(folder, "*.*")):
-                        if img_path.lower().endswith(valid_extensions):
-                            self.image_paths.append(img_path)
-                            self.labels.append(class_idx)
+def prepare_dataset(zip_path, extract_path, shard_dir, image_size=224):
+    """
+    Unzips the dataset if needed and packs it into pre-resized shards. Existing shards are
+    packed again if they come from another dataset directory or image size.
 
-    def __len__(self):
-        """Returns the total number of images in the dataset."""
-        return len(self.image_paths)
+    Returns:
+        str: The packed dataset directory.
+    """
+    # Step 1: Unzip the dataset if not already extracted
+    if not os.path.exists(extract_path):
+        log("Extracting dataset...")
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                zip_ref.extractall(extract_path)
+            log("Dataset unzipped successfully.")
+        except zipfile.BadZipFile:
+            raise RuntimeError("Error: The ZIP file is corrupted or invalid.")
+    else:
+        log("Dataset already extracted.")
 
-    def __getitem__(self, idx):
-        """Retrieves an image and its label, applying transformations."""
-        img_path = self.image_paths[idx]
-        label = self.labels[idx]
+    # Step 2: Define dataset path
+    dataset_path = os.path.join(extract_path, "philly_code_fest/Medical_waste_WHO_standard/Dataset")
 
-        try:
-            image = Image.open(img_path).convert("RGB")
-            if self.transform:
-                image = self.transform(image)
-        except UnidentifiedImageError:
-            print(f"Skipping corrupt file: {img_path}")
-            return self.__getitem__((idx + 1) % len(self.image_paths))
+    # Step 3: Decode and resize every image once into a memory-mapped uint8 array
+    if not shards_exist(shard_dir, dataset_path, image_size):
+        log("Packing dataset into pre-resized shards...")
+        pack_shards(dataset_path, shard_dir, image_size=image_size)
+    else:
+        log(f"Using packed dataset in '{shard_dir}'.")
+    return shard_dir
 
-        return image, label
 
+def build_model(device, channels_last=False):
+    """Loads an ImageNet-pretrained ResNet50 with a 7-class head."""
+    model = models.resnet50(weights=ResNet50_Weights.DEFAULT)
+
+    # Modify final layer for 7-class classification
+    num_features = model.fc.in_features
+    model.fc = nn.Linear(num_features, 7)
+    model = model.to(device)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    return model
 
-# Define transformations
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.CenterCrop(224),
-    transforms.RandomHorizontalFlip(),
-    transforms.RandomRotation(10),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
-])
 
-# Load dataset using custom loader
-dataset = MedicalWasteDataset(dataset_path, transform=transform)
+def _autocast(device, enabled):
+    if not enabled:
+        return nullcontext()
+    return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
 
-# Split dataset into 80% Train, 20% Test
-train_size = int(0.8 * len(dataset))
-test_size = len(dataset) - train_size
-train_dataset, test_dataset = torch.utils.data.random_split(dataset, [train_size, test_size])
 
-# Create DataLoaders
-train_loader = DataLoader(train_dataset, batch_size=8, shuffle=True, num_workers=2)
-test_loader = DataLoader(test_dataset, batch_size=8, shuffle=False, num_workers=2)
+def _to_device(images, labels, device, channels_last):
+    images = images.to(device, non_blocking=True)
+    if channels_last:
+        images = images.contiguous(memory_format=torch.channels_last)
+    return images, labels.to(device, non_blocking=True)
 
-print(f"Total training samples: {len(train_dataset)}")
-print(f"Total testing samples: {len(test_dataset)}")
-print("Classes:", dataset.class_to_idx)
 
+def _aggregate(loss_sum, batches, correct, total, device):
+    """
+    Sums epoch metrics over all processes.
 
-# Load ResNet50 model
-model = models.resnet50(weights=ResNet50_Weights.DEFAULT)
+    Returns:
+        tuple: (mean loss, accuracy)
+    """
+    if dist.is_initialized():
+        metrics = torch.tensor([loss_sum, batches, correct, total], dtype=torch.float64, device=device)
+        dist.all_reduce(metrics)
+        loss_sum, batches, correct, total = metrics.tolist()
+    return loss_sum / max(1, batches), correct / max(1, total)
 
-# Modify final layer for 7-class classification
-num_features = model.fc.in_features
-model.fc = nn.Linear(num_features, 7)
-model = model.to(device)
 
-# Define loss and optimizer
-criterion = nn.CrossEntropyLoss()
-optimizer = optim.Adam(model.parameters(), lr=0.001)
+def train_one_epoch(model, loader, criterion, optimizer, device, args, timer):
+    """
+    Runs one training epoch with optional bfloat16 autocast and gradient accumulation.
 
-# Training Loop
-num_epochs = 15
-train_losses, test_losses = [], []
-train_accuracies, test_accuracies = [], []
+    Under DistributedDataParallel, gradients are only all-reduced on the micro-batch that
+    completes an accumulation step.
 
-for epoch in range(num_epochs):
+    Returns:
+        tuple: (mean loss, accuracy) over all processes
+    """
     model.train()
     running_loss = 0.0
     correct_train, total_train = 0, 0
-
-    for images, labels in train_loader:
-        images, labels = images.to(device), labels.to(device)
-
-        optimizer.zero_grad()
-        outputs = model(images)
-        loss = criterion(outputs, labels)
-        loss.backward()
-        optimizer.step()
+    num_batches = len(loader)
+
+    optimizer.zero_grad()
+    no_sync = getattr(model, "no_sync", None)
+    for step, (images, labels) in enumerate(timer.iter(loader), start=1):
+        images, labels = _to_device(images, labels, device, args.channels_last)
+        sync_step = step % args.accumulation_steps == 0 or step == num_batches
+
+        with (no_sync() if no_sync is not None and not sync_step else nullcontext()):
+            with _autocast(device, args.bf16):
+                outputs = model(images)
+                loss = criterion(outputs, labels)
+            # Scale so the accumulated gradient is the mean over the effective batch
+            (loss / args.accumulation_steps).backward()
+        if sync_step:
+            optimizer.step()
+            optimizer.zero_grad()
 
         running_loss += loss.item()
         _, predicted = torch.max(outputs, 1)
         correct_train += (predicted == labels).sum().item()
         total_train += labels.size(0)
 
-    train_accuracy = correct_train / total_train
-    train_losses.append(running_loss / len(train_loader))
-    train_accuracies.append(train_accuracy)
+    return _aggregate(running_loss, num_batches, correct_train, total_train, device)
 
-    # Evaluate on test set
+
+def evaluate(model, loader, criterion, device, args, timer):
+    """
+    Evaluates the model on the test set (each process on its shard).
+
+    Returns:
+        tuple: (mean loss, accuracy) over all processes
+    """
     model.eval()
     test_loss = 0.0
     correct_test, total_test = 0, 0
 
     with torch.no_grad():
-        for images, labels in test_loader:
-            images, labels = images.to(device), labels.to(device)
+        for images, labels in timer.iter(loader):
+            images, labels = _to_device(images, labels, device, args.channels_last)
 
-            outputs = model(images)
-            loss = criterion(outputs, labels)
+            with _autocast(device, args.bf16):
+                outputs = model(images)
+                loss = criterion(outputs, labels)
             test_loss += loss.item()
 
             _, predicted = torch.max(outputs, 1)
             correct_test += (predicted == labels).sum().item()
             total_test += labels.size(0)
 
-    test_accuracy = correct_test / total_test
-    test_losses.append(test_loss / len(test_loader))
-    test_accuracies.append(test_accuracy)
-
-    print(f"Epoch {epoch+1}/{num_epochs} | Train Loss: {train_losses[-1]:.4f} | Train Acc: {train_accuracy:.4f} | Test Acc: {test_accuracy:.4f}")
-
-# Save the trained model
-os.makedirs("models", exist_ok=True)
-model_save_path = "models/medical_trash_classifier.pth"
-torch.save(model.state_dict(), model_save_path)
-print(f"Model training completed and saved at {model_save_path}")
-
-# Plot Loss vs. Epochs
-plt.figure(figsize=(10, 5))
-plt.plot(range(1, num_epochs + 1), train_losses, label="Train Loss")
-plt.plot(range(1, num_epochs + 1), test_losses, label="Test Loss")
-plt.xlabel("Epoch")
-plt.ylabel("Loss")
-plt.title("Epoch vs. Loss")
-plt.legend()
-plt.grid()
-plt.show()
-
-# Print Final Accuracy
-print(f"Final Training Accuracy: {train_accuracies[-1]:.4f}")
-print(f"Final Testing Accuracy: {test_accuracies[-1]:.4f}")
+    return _aggregate(test_loss, len(loader), correct_test, total_test, device)
+
+
+def save_checkpoint(path, state):
+    """Writes the training state atomically, so an interrupted save never corrupts the last checkpoint."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def main(args):
+    rank, world_size, local_rank = setup_distributed(args.dist_backend)
+    distributed = dist.is_initialized()
+    torch.manual_seed(args.seed + rank)
+    random.seed(args.seed + rank)
+    threads = args.threads
+    if threads is None and distributed:
+        # Split the cores between the processes of this machine
+        threads = max(1, (os.cpu_count() or 1) // int(os.getenv("LOCAL_WORLD_SIZE", "1")))
+    if threads:
+        torch.set_num_threads(threads)
+
+    # Enable memory optimizations
+    cudnn.benchmark = True
+    cudnn.enabled = True
+
+    # Check if GPU is available
+    if torch.cuda.is_available():
+        device = torch.device("cuda", local_rank if distributed else 0)
+        torch.cuda.set_device(device)
+    else:
+        device = torch.device("cpu")
+    log("Using device:", device, "| threads:", torch.get_num_threads(), "| world size:", world_size)
+
+    # One process per machine unpacks and packs the dataset while the others wait
+    if local_rank == 0:
+        prepare_dataset(args.zip_path, args.extract_path, args.shard_dir, args.image_size)
+    _barrier()
+    shard_dir = args.shard_dir
+
+    # Load dataset from the packed shards
+    dataset = ShardedImageDataset(shard_dir, transform=transform, seed=args.seed)
+
+    # Split dataset into 80% Train, 20% Test (seeded, so a resumed run sees the same split)
+    train_size = int(0.8 * len(dataset))
+    test_size = len(dataset) - train_size
+    train_dataset, test_dataset = torch.utils.data.random_split(
+        dataset, [train_size, test_size], generator=torch.Generator().manual_seed(args.seed)
+    )
+
+    # Each process reads its own shard of the data; the sampler reshuffles every epoch from the seed
+    train_sampler = DistributedSampler(train_dataset, shuffle=True, seed=args.seed) if distributed else None
+    test_sampler = DistributedSampler(test_dataset, shuffle=False) if distributed else None
+
+    # Create DataLoaders
+    train_loader = make_loader(train_dataset, args.batch_size, shuffle=True, num_workers=args.num_workers, prefetch_factor=args.prefetch_factor, sampler=train_sampler)
+    test_loader = make_loader(test_dataset, args.batch_size, shuffle=False, num_workers=args.num_workers, prefetch_factor=args.prefetch_factor, sampler=test_sampler)
+
+    log(f"Total training samples: {len(train_dataset)}")
+    log(f"Total testing samples: {len(test_dataset)}")
+    log("Classes:", dataset.class_to_idx)
+    log(f"Batch size: {args.batch_size} x {args.accumulation_steps} accumulation steps x {world_size} processes | bf16: {args.bf16} | channels-last: {args.channels_last} | compile: {args.compile}")
+
+    # Load ResNet50 model
+    model = build_model(device, args.channels_last)
+
+    # Define loss and optimizer
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=args.lr)
+
+    history = {"train_losses": [], "test_losses": [], "train_accuracies": [], "test_accuracies": []}
+    start_epoch = 0
+    best_loss, best_state, epochs_without_improvement = float("inf"), None, 0
+
+    # Only rank 0 writes the checkpoint, so on other machines it may not exist: rank 0 loads it and
+    # shares the training state, so every rank starts at the same epoch with the same stopping state
+    resume_state = None
+    if args.resume and is_main_process() and os.path.exists(args.checkpoint):
+        checkpoint = torch.load(args.checkpoint, map_location="cpu")
+        model.load_state_dict(checkpoint["model"])
+        best_state = checkpoint["best_model"]
+        resume_state = {
+            key: checkpoint[key]
+            for key in ("optimizer", "history", "epoch", "best_loss", "epochs_without_improvement")
+        }
+    if distributed and args.resume:
+        shared = [resume_state]
+        dist.broadcast_object_list(shared, src=0)
+        resume_state = shared[0]
+
+    if resume_state is not None:
+        # The optimizer state is shared too: DDP only broadcasts the parameters
+        optimizer.load_state_dict(resume_state["optimizer"])
+        history = resume_state["history"]
+        start_epoch = resume_state["epoch"] + 1
+        best_loss = resume_state["best_loss"]
+        epochs_without_improvement = resume_state["epochs_without_improvement"]
+        log(f"Resumed from '{args.checkpoint}' at epoch {start_epoch + 1}")
+        if args.patience and epochs_without_improvement >= args.patience:
+            log("The checkpointed run already stopped early.")
+            start_epoch = args.epochs
+
+    # Wrap and compile after loading state, so checkpoints keep the plain parameter names.
+    # DistributedDataParallel broadcasts rank 0's parameters, so every process starts identical.
+    train_model = DistributedDataParallel(model, device_ids=[device.index] if device.type == "cuda" else None) if distributed else model
+    if args.compile:
+        train_model = torch.compile(train_model)
+
+    # Training Loop
+    train_timer, test_timer = LoaderTimer(), LoaderTimer()
+
+    for epoch in range(start_epoch, args.epochs):
+        # Augmentation runs in the (persistent) loader workers, whose RNGs are seeded only once; the
+        # dataset seeds every item from the epoch instead, so augmentation is reproducible across resumes
+        dataset.set_epoch(epoch)
+        torch.manual_seed(args.seed + epoch * world_size + rank)
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)
+
+        train_loss, train_accuracy = train_one_epoch(train_model, train_loader, criterion, optimizer, device, args, train_timer)
+        test_loss, test_accuracy = evaluate(train_model, test_loader, criterion, device, args, test_timer)
+
+        history["train_losses"].append(train_loss)
+        history["train_accuracies"].append(train_accuracy)
+        history["test_losses"].append(test_loss)
+        history["test_accuracies"].append(test_accuracy)
+
+        log(f"Epoch {epoch+1}/{args.epochs} | Train Loss: {train_loss:.4f} | Train Acc: {train_accuracy:.4f} | Test Loss: {test_loss:.4f} | Test Acc: {test_accuracy:.4f}")
+        log(f"  Train loading: {train_timer.summary()} | Test loading: {test_timer.summary()}")
+
+        if test_loss < best_loss - args.min_delta:
+            best_loss, epochs_without_improvement = test_loss, 0
+            best_state = copy.deepcopy(model.state_dict())
+        else:
+            epochs_without_improvement += 1
+
+        if is_main_process():
+            save_checkpoint(args.checkpoint, {
+                "epoch": epoch,
+                "model": model.state_dict(),
+                "optimizer": optimizer.state_dict(),
+                "history": history,
+                "best_loss": best_loss,
+                "best_model": best_state,
+                "epochs_without_improvement": epochs_without_improvement,
+                "args": vars(args)
+            })
+
+        if args.patience and epochs_without_improvement >= args.patience:
+            log(f"Early stopping: no test loss improvement for {args.patience} epochs")
+            break
+
+    # With early stopping, keep the weights of the best epoch
+    if args.patience and best_state is not None:
+        model.load_state_dict(best_state)
+
+    if distributed:
+        dist.destroy_process_group()
+    if rank != 0:
+        return history
+
+    # Save the trained model
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    torch.save(model.state_dict(), args.output)
+    print(f"Model training completed and saved at {args.output}")
+
+    if not history["train_losses"]:
+        return history
+    epochs_run = len(history["train_losses"])
+
+    # Plot Loss vs. Epochs
+    if not args.no_plot:
+        plt.figure(figsize=(10, 5))
+        plt.plot(range(1, epochs_run + 1), history["train_losses"], label="Train Loss")
+        plt.plot(range(1, epochs_run + 1), history["test_losses"], label="Test Loss")
+        plt.xlabel("Epoch")
+        plt.ylabel("Loss")
+        plt.title("Epoch vs. Loss")
+        plt.legend()
+        plt.grid()
+        plt.show()
+
+    # Print Final Accuracy
+    print(f"Final Training Accuracy: {history['train_accuracies'][-1]:.4f}")
+    print(f"Final Testing Accuracy: {history['test_accuracies'][-1]:.4f}")
+    return history
+
+
+if __name__ == "__main__":
+    main(parse_args())
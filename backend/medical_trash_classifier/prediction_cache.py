@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from PIL import Image
+from typing import Dict, Optional, Tuple
+import hashlib
+import threading
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_DISTANCE = 4
+HASH_SIZE = 8
+
+def content_hash(contents: bytes) -> str:
+    """
+    SHA-256 of the uploaded bytes, the key for exact repeats.
+    """
+    return hashlib.sha256(contents).hexdigest()
+
+def perceptual_hash(image: Image.Image) -> int:
+    """
+    64-bit difference hash (dHash) of an image.
+
+    The image is reduced to a 9x8 grayscale thumbnail and each bit records whether a pixel is
+    brighter than its right neighbour, so re-encoded, rescaled or slightly re-exposed copies of a
+    photo land within a few bits of each other.
+    """
+    pixels = list(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            offset = row * (HASH_SIZE + 1) + col
+            value = (value << 1) | int(pixels[offset] > pixels[offset + 1])
+    return value
+
+def _hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions keyed on the uploaded image.
+
+    Exact repeats are found by content hash. With `perceptual` enabled, a miss is retried against the
+    perceptual hashes of the cached images, and any image within `max_distance` differing bits
+    counts as a near-duplicate hit.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        perceptual: bool = False,
+        max_distance: int = DEFAULT_MAX_DISTANCE
+    ):
+        """
+        Args:
+            max_entries (int): Maximum number of cached predictions; 0 disables the cache.
+            perceptual (bool): Also match near-duplicate images by perceptual hash.
+            max_distance (int): Maximum Hamming distance (of 64 bits) for a near-duplicate hit.
+        """
+        self.max_entries = max_entries
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[int], Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Return the cached prediction for an exact content hash, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return dict(entry[1])
+
+    def get_similar(self, phash: int) -> Optional[Dict]:
+        """
+        Return the prediction of the closest cached image within `max_distance` bits, or None.
+        Counts a miss if nothing is close enough.
+        """
+        with self._lock:
+            best_key, best_distance = None, self.max_distance + 1
+            for key, (cached_phash, _) in self._entries.items():
+                if cached_phash is None:
+                    continue
+                distance = _hamming_distance(phash, cached_phash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.near_hits += 1
+            return dict(self._entries[best_key][1])
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def set(self, key: str, result: Dict, phash: Optional[int] = None) -> None:
+        """
+        Cache a prediction, evicting the least recently used entries beyond `max_entries`.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (phash, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> int:
+        """
+        Drop every cached prediction, e.g. after the model changed.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+    def stats(self) -> Dict:
+        """
+        Return the cache size and hit/miss counters.
+        """
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "perceptual": self.perceptual,
+                "maxDistance": self.max_distance,
+                "exactHits": self.exact_hits,
+                "nearDuplicateHits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0
+            }
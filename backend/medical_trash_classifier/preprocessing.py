@@ -0,0 +1,122 @@
+from PIL import Image
+from typing import Dict, Optional
+import io
+import numpy as np
+import os
+import torch
+import torchvision.transforms as transforms
+
+try:
+    # Optional libjpeg-turbo (SIMD) decoder with DCT-domain downscaling
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+IMAGE_SIZE = 224
+
+# Define image transformations (same as during training)
+transform = transforms.Compose([
+    transforms.Resize((IMAGE_SIZE, IMAGE_SIZE)),
+    transforms.CenterCrop(IMAGE_SIZE),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
+])
+
+# Set CLASSIFIER_FAST_PREPROCESS=false to fall back to the reference `transform`
+FAST_PREPROCESS = os.getenv("CLASSIFIER_FAST_PREPROCESS", "true").lower() == "true"
+# JPEGs are decoded at no less than this multiple of the target size, so the final
+# antialiased resize still sees enough pixels to match the full-resolution path
+DRAFT_SCALE = 2
+# Mean absolute difference allowed between the fast and the reference tensors (about 2.5 gray levels)
+PARITY_TOLERANCE = 0.02
+
+def _is_jpeg(contents: bytes) -> bool:
+    return contents[:3] == b"\xff\xd8\xff"
+
+def _fast_decode(contents: bytes) -> Image.Image:
+    """
+    Decode image bytes to an RGB image, reducing JPEGs to about `DRAFT_SCALE` times the target size
+    during decoding instead of materializing every pixel of a multi-megapixel photo.
+    """
+    min_size = IMAGE_SIZE * DRAFT_SCALE
+    if simplejpeg is not None and _is_jpeg(contents):
+        try:
+            return Image.fromarray(simplejpeg.decode_jpeg(
+                contents, colorspace="RGB", min_height=min_size, min_width=min_size
+            ))
+        except ValueError:
+            # Unsupported JPEG variants (e.g. CMYK) go through PIL below
+            pass
+    image = Image.open(io.BytesIO(contents))
+    # No-op for formats other than JPEG
+    image.draft("RGB", (min_size, min_size))
+    return image.convert("RGB")
+
+def fast_transform(image: Image.Image, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    Resize and normalize an RGB image in one pass, equivalent to `transform`.
+
+    The CenterCrop of `transform` is a no-op after resizing to the crop size and is skipped, and
+    ToTensor + Normalize(0.5, 0.5) collapse into a single in-place `x * 2/255 - 1`.
+
+    Args:
+        image (Image.Image): RGB image.
+        out (Optional[torch.Tensor]): Preallocated (3, 224, 224) float tensor written in place,
+            e.g. a row of a batch tensor.
+
+    Returns:
+        torch.Tensor: The (3, 224, 224) normalized image tensor (`out` if given).
+    """
+    resized = image.resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR)
+    pixels = torch.from_numpy(np.array(resized, dtype=np.uint8)).permute(2, 0, 1)
+    if out is None:
+        out = torch.empty((3, IMAGE_SIZE, IMAGE_SIZE), dtype=torch.float32)
+    out.copy_(pixels)
+    return out.mul_(2 / 255).sub_(1)
+
+def load_image_tensor(contents: bytes, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    Decode image bytes and apply the inference transform.
+
+    Args:
+        contents (bytes): Encoded image file contents.
+        out (Optional[torch.Tensor]): Preallocated (3, 224, 224) float tensor to write into.
+
+    Returns:
+        torch.Tensor: (3, 224, 224) normalized image tensor.
+
+    Raises:
+        PIL.UnidentifiedImageError: If the bytes are not a decodable image.
+    """
+    return image_to_tensor(decode_image(contents), out)
+
+def decode_image(contents: bytes) -> Image.Image:
+    """
+    Decode image bytes to an RGB image for `image_to_tensor` (reduced-size for JPEGs on the fast path).
+
+    Raises:
+        PIL.UnidentifiedImageError: If the bytes are not a decodable image.
+    """
+    if FAST_PREPROCESS:
+        return _fast_decode(contents)
+    return Image.open(io.BytesIO(contents)).convert("RGB")
+
+def image_to_tensor(image: Image.Image, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    Apply the inference transform to an image returned by `decode_image`.
+    """
+    if FAST_PREPROCESS:
+        return fast_transform(image, out)
+    tensor = transform(image)
+    return out.copy_(tensor) if out is not None else tensor
+
+def preprocessing_difference(contents: bytes) -> Dict[str, float]:
+    """
+    Compare the fast path with the reference `transform` for one image.
+
+    Returns:
+        Dict[str, float]: Mean and maximum absolute difference of the normalized tensors.
+    """
+    reference = transform(Image.open(io.BytesIO(contents)).convert("RGB"))
+    difference = (fast_transform(_fast_decode(contents)) - reference).abs()
+    return {"meanAbsDiff": difference.mean().item(), "maxAbsDiff": difference.max().item()}
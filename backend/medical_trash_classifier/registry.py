@@ -0,0 +1,157 @@
+from .backends import Runner, example_input, load_backend
+from typing import Dict, Optional
+import logging
+import os
+import resource
+import threading
+import time
+import torch
+
+logger = logging.getLogger(__name__)
+
+def resident_memory_mb() -> float:
+    """
+    Current resident set size of this process in MB (peak RSS where /proc is unavailable).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if maxrss > 1 << 32 else maxrss / 1024
+
+class ModelRegistry:
+    """
+    Owns the classifier backend and loads it on first use instead of at import time.
+
+    The registry is itself the batch runner passed to the dynamic batcher. `load` builds a new
+    backend next to the serving one and swaps it in atomically, so a new checkpoint can be
+    hot-swapped while requests keep being served by the old model until the swap.
+
+    To share weights across server workers, either load before forking (`CLASSIFIER_PRELOAD=true`
+    with `gunicorn --preload`), so workers share the tensors copy-on-write, or memory-map the
+    checkpoint (`mmap_weights`), so workers share its pages through the page cache.
+    """
+
+    def __init__(
+        self,
+        backend: str,
+        weights_path: str,
+        device: torch.device = torch.device("cpu"),
+        artifacts_dir: Optional[str] = None,
+        num_threads: Optional[int] = None,
+        mmap_weights: bool = True
+    ):
+        """
+        Args:
+            backend (str): Inference backend, see `backends.BACKENDS`.
+            weights_path (str): Path to `medical_trash_classifier.pth`.
+            device (torch.device): Device for the fp32, TorchScript and compiled backends.
+            artifacts_dir (Optional[str]): Directory of exported artifacts; defaults to the checkpoint's directory.
+            num_threads (Optional[int]): Intra-op thread count for onnxruntime.
+            mmap_weights (bool): Memory-map the checkpoint instead of copying it into process memory.
+        """
+        self.backend = backend
+        self.weights_path = weights_path
+        self.device = device
+        self.artifacts_dir = artifacts_dir
+        self.num_threads = num_threads
+        self.mmap_weights = mmap_weights
+        self.version = 0
+        self.load_seconds: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.rss_delta_mb: Optional[float] = None
+        self._runner: Optional[Runner] = None
+        self._lock = threading.RLock()
+
+    def _build(self, backend: str, weights_path: str, artifacts_dir: Optional[str]) -> Runner:
+        return load_backend(
+            backend,
+            weights_path,
+            self.device,
+            artifacts_dir=artifacts_dir,
+            num_threads=self.num_threads,
+            mmap_weights=self.mmap_weights
+        )
+
+    def load(self, weights_path: Optional[str] = None, backend: Optional[str] = None) -> Dict:
+        """
+        Load a backend and swap it in for the one currently serving.
+
+        Exported artifacts (static_int8, torchscript, onnx) of a new checkpoint are read from its
+        own directory, so the served artifacts always belong to the reported checkpoint.
+
+        Args:
+            weights_path (Optional[str]): New checkpoint; the current one (re-read from disk) if None.
+            backend (Optional[str]): New backend name; the current one if None.
+
+        Returns:
+            Dict: The registry stats after the swap.
+        """
+        weights_path = weights_path or self.weights_path
+        backend = backend or self.backend
+        # A configured artifacts directory belongs to the configured checkpoint only
+        artifacts_dir = self.artifacts_dir if weights_path == self.weights_path else None
+        # Only one load at a time; requests keep using the current runner meanwhile
+        with self._lock:
+            rss_before = resident_memory_mb()
+            start = time.perf_counter()
+            runner = self._build(backend, weights_path, artifacts_dir)
+            self.load_seconds = time.perf_counter() - start
+            self.rss_delta_mb = resident_memory_mb() - rss_before
+            self._runner, self.backend, self.weights_path, self.artifacts_dir = runner, backend, weights_path, artifacts_dir
+            self.version += 1
+            self.loaded_at = time.time()
+        logger.info(
+            f"Classifier model v{self.version} ({backend}, {weights_path}) loaded in {self.load_seconds:.2f}s, "
+            f"RSS +{self.rss_delta_mb:.1f} MB"
+        )
+        return self.stats()
+
+    def get(self) -> Runner:
+        """
+        Return the serving runner, loading it on first use.
+        """
+        if self._runner is None:
+            with self._lock:
+                # Concurrent first requests wait for a single load
+                if self._runner is None:
+                    self.load()
+        return self._runner
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        return self.get()(batch)
+
+    def warm_up(self) -> None:
+        """
+        Load the model if needed and run one dummy forward pass (allocators, kernels, compilation).
+        """
+        start = time.perf_counter()
+        self(example_input())
+        logger.info(f"Classifier warm-up finished in {time.perf_counter() - start:.2f}s")
+
+    @property
+    def loaded(self) -> bool:
+        return self._runner is not None
+
+    def stats(self) -> Dict:
+        """
+        Return the loaded backend, its load time and the process resident memory.
+        """
+        return {
+            "backend": self.backend,
+            "weightsPath": self.weights_path,
+            "artifactsDir": self.artifacts_dir or os.path.dirname(self.weights_path),
+            "loaded": self.loaded,
+            "version": self.version,
+            "loadSeconds": self.load_seconds,
+            "loadedAt": self.loaded_at,
+            "loadRssDeltaMb": self.rss_delta_mb,
+            "residentMemoryMb": resident_memory_mb(),
+            "mmapWeights": self.mmap_weights,
+            "pid": os.getpid()
+        }
@@ -1,7 +1,10 @@
-from fastapi import FastAPI
-from medical_trash_classifier.app import app as medical_trash_app
+from fastapi import FastAPI, Request, Response
+from medical_trash_classifier.app import app as medical_trash_app, warm_up_model
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest
 from sustainable_supply_recommender.main import app as supply_app, initialize_supply_resources
 import logging
+import os
+import time
 import uvicorn
 
 logger = logging.getLogger(__name__)
@@ -14,10 +17,57 @@ app = FastAPI(
     version="1.0"
 )
 
+# Request metrics of both mounted apps; the route label is the mount ("medical", "supply") to bound cardinality
+REQUESTS_IN_PROGRESS = Gauge(
+    "ecomedai_http_requests_in_progress",
+    "HTTP requests currently being served.",
+    ["app", "method"],
+    multiprocess_mode="livesum"
+)
+REQUEST_SECONDS = Histogram(
+    "ecomedai_http_request_seconds",
+    "HTTP request latency until the response starts.",
+    ["app", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    mount = request.url.path.strip("/").split("/", 1)[0]
+    app_label = mount if mount in ("medical", "supply") else "other"
+    in_progress = REQUESTS_IN_PROGRESS.labels(app_label, request.method)
+    in_progress.inc()
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        in_progress.dec()
+        REQUEST_SECONDS.labels(app_label, request.method, status).observe(time.perf_counter() - start)
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics of both apps. With several worker processes, set PROMETHEUS_MULTIPROC_DIR
+    to aggregate the metrics of all workers.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
 
 @app.on_event("startup")
 async def startup_event():
     await initialize_supply_resources()
+    await warm_up_model()
     logger.info("Combined startup initialization complete.")
 
 app.mount("/medical", medical_trash_app)
@@ -1,4 +1,4 @@
-from typing import Tuple, Union, IO
+from typing import List, Tuple, Union, IO
 import os
 import pandas as pd
 import logging
@@ -6,6 +6,9 @@ import logging
 logger = logging.getLogger(__name__)
 
 CARBON_FOOTPRINT_COLUMN = "Global warming potential per functional unit"
+# BOM columns used by processing; other columns of an upload are not loaded
+BOM_COLUMNS = ("product_name", "quantity", "unit_price")
+DEFAULT_BOM_CHUNK_SIZE = 10_000
 
 def _read_csv(source: Union[str, IO]) -> pd.DataFrame:
     """
@@ -64,6 +67,31 @@ def load_data(bom_source: Union[str, IO], db_source: Union[str, IO]) -> Tuple[pd
         logger.error(f"Error loading CSV files: {str(e)}", exc_info=True)
         raise
 
+def read_bom_csv(bom_source: Union[str, IO], chunksize: int = DEFAULT_BOM_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Read a BOM CSV file in chunks of `chunksize` rows, keeping only the BOM columns used for
+    processing, so large uploads are parsed straight from their spooled file and only those columns
+    of every row are held in memory.
+
+    Every row is kept with its own quantity and unit price; rows repeating a product name are
+    deduplicated later, when they are matched (see `recommender.aiter_bom_items`).
+
+    Args:
+        bom_source (Union[str, IO]): BOM CSV file path or file-like object.
+        chunksize (int): Rows parsed at a time.
+
+    Returns:
+        pd.DataFrame: One row per BOM line with the BOM columns present in the file (columns are not validated).
+    """
+    chunks: List[pd.DataFrame] = []
+    for chunk in pd.read_csv(bom_source, chunksize=chunksize, usecols=lambda column: column in BOM_COLUMNS):
+        chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame()
+    bom_df = pd.concat(chunks, ignore_index=True)
+    logger.info(f"Read {len(bom_df)} BOM rows")
+    return bom_df
+
 def load_db_data(db_source: Union[str, IO]) -> pd.DataFrame:
     """
     Load only the Database CSV file into a pandas DataFrame.
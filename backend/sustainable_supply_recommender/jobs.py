@@ -0,0 +1,208 @@
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import copy
+import heapq
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+DEFAULT_MAX_CONCURRENT_JOBS = 2
+DEFAULT_RESULT_TTL = 60 * 60
+
+class JobStore(ABC):
+    """
+    Storage backend for job records.
+
+    Records are plain JSON-serializable dicts, so a Redis-compatible store can implement the same
+    methods with HSET/HGETALL/DEL/SCAN, keeping the result in its own field.
+    """
+
+    @abstractmethod
+    def save(self, job: Dict) -> None:
+        """Store a new job record."""
+
+    @abstractmethod
+    def update(self, job_id: str, fields: Dict) -> None:
+        """Update fields of an existing job record; unknown jobs are ignored."""
+
+    @abstractmethod
+    def load(self, job_id: str, include_result: bool = True) -> Optional[Dict]:
+        """Return a copy of the job record, without its result unless `include_result`, or None."""
+
+    @abstractmethod
+    def delete(self, job_id: str) -> None:
+        """Remove a job record."""
+
+    @abstractmethod
+    def job_ids(self) -> List[str]:
+        """Return the ids of all stored jobs."""
+
+class InMemoryJobStore(JobStore):
+    """
+    Process-local job store.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+
+    def save(self, job: Dict) -> None:
+        self._jobs[job["jobId"]] = copy.deepcopy(job)
+
+    def update(self, job_id: str, fields: Dict) -> None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(copy.deepcopy(fields))
+
+    def load(self, job_id: str, include_result: bool = True) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        # Status polls skip the result, so they never copy it
+        return {
+            key: copy.deepcopy(value) if key == "result" else value
+            for key, value in job.items()
+            if include_result or key != "result"
+        }
+
+    def delete(self, job_id: str) -> None:
+        self._jobs.pop(job_id, None)
+
+    def job_ids(self) -> List[str]:
+        return list(self._jobs)
+
+ProgressCallback = Callable[[int], None]
+JobFunction = Callable[[ProgressCallback], Awaitable[Dict]]
+
+class JobManager:
+    """
+    Runs background BOM processing jobs on the event loop with bounded concurrency.
+
+    At most `max_concurrent_jobs` jobs run at once; the rest wait in the queued state. Finished
+    jobs keep their result for `result_ttl` seconds and are then purged.
+    """
+
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS,
+        result_ttl: float = DEFAULT_RESULT_TTL
+    ):
+        """
+        Args:
+            store (Optional[JobStore]): Job record backend; in-memory by default.
+            max_concurrent_jobs (int): Maximum number of jobs running at once.
+            result_ttl (float): Seconds a finished job and its result are kept.
+        """
+        self.store = store or InMemoryJobStore()
+        self.result_ttl = result_ttl
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent_jobs))
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # (expiry time, job id) of finished jobs, earliest first
+        self._expiry: List[Tuple[float, str]] = []
+
+    def submit(self, job_fn: JobFunction, total: int) -> Dict:
+        """
+        Queue a job.
+
+        Args:
+            job_fn (JobFunction): Coroutine function receiving a progress callback and returning the result.
+            total (int): Number of work items, used to report progress.
+
+        Returns:
+            Dict: The job record (without result).
+        """
+        self.purge_expired()
+        job = {
+            "jobId": uuid.uuid4().hex,
+            "status": JOB_QUEUED,
+            "total": total,
+            "processed": 0,
+            "createdAt": time.time(),
+            "startedAt": None,
+            "finishedAt": None,
+            "error": None,
+            "result": None
+        }
+        self.store.save(job)
+        self._tasks[job["jobId"]] = asyncio.create_task(self._run(job["jobId"], job_fn))
+        logger.info(f"Job {job['jobId']} queued with {total} items")
+        return {key: value for key, value in job.items() if key != "result"}
+
+    def _update(self, job_id: str, **fields) -> None:
+        self.store.update(job_id, fields)
+
+    def _finish(self, job_id: str, status: str, **fields) -> None:
+        """
+        Record the final status of a job. Only the first call counts: a running job cancelled by
+        `cancel` is finished there and again by its own cancellation handler.
+        """
+        job = self.store.load(job_id, include_result=False)
+        if job is None or job["status"] in FINISHED_STATUSES:
+            return
+        finished_at = time.time()
+        self._update(job_id, status=status, finishedAt=finished_at, **fields)
+        heapq.heappush(self._expiry, (finished_at + self.result_ttl, job_id))
+
+    async def _run(self, job_id: str, job_fn: JobFunction) -> None:
+        try:
+            async with self._semaphore:
+                self._update(job_id, status=JOB_RUNNING, startedAt=time.time())
+                result = await job_fn(lambda processed: self._update(job_id, processed=processed))
+            self._finish(job_id, JOB_COMPLETED, result=result)
+            logger.info(f"Job {job_id} completed")
+        except asyncio.CancelledError:
+            self._finish(job_id, JOB_CANCELLED)
+            logger.info(f"Job {job_id} cancelled")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+            self._finish(job_id, JOB_FAILED, error=str(e))
+        finally:
+            self._tasks.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Return the job status and progress (without result), or None if unknown or expired.
+        """
+        self.purge_expired()
+        return self.store.load(job_id, include_result=False)
+
+    def get_result(self, job_id: str) -> Optional[Dict]:
+        """
+        Return the full job record including its result, or None if unknown or expired.
+        """
+        self.purge_expired()
+        return self.store.load(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            bool: True if the job was still active and has been cancelled.
+        """
+        task = self._tasks.pop(job_id, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        # A job cancelled before it started never reaches its own cancellation handler
+        self._finish(job_id, JOB_CANCELLED)
+        return True
+
+    def purge_expired(self) -> None:
+        """
+        Drop finished jobs older than `result_ttl`. Only jobs that have expired are visited.
+        """
+        now = time.time()
+        while self._expiry and self._expiry[0][0] < now:
+            _, job_id = heapq.heappop(self._expiry)
+            self.store.delete(job_id)
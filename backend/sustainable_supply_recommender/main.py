@@ -1,13 +1,25 @@
-from .data_loader import load_db_data
-from .utils.vectorstore_utils import create_vectorstore
-from .recommender import process_bom_items
+from .data_loader import load_db_data, read_bom_csv
+from .utils.vectorstore_utils import query_similar_items_batch
+from .utils.artifact_utils import artifact_version, load_or_build_vectorstore, load_embeddings_artifact, sync_vectorstore_artifact
+from .utils.ann_utils import evaluate_index_configs
+from .recommender import process_bom_items, aprocess_bom_items, aiter_bom_items
+from .utils.cache_utils import RerankCache
+from .utils.embedding_utils import configure_torch_threads
+from .jobs import JobManager
+from .utils.carbon_utils import build_footprint_index
+from .utils.lexical_utils import build_lexical_index
+from .utils.gating_utils import ConfidenceGate, calibrate_gate, DEFAULT_MIN_MARGIN, DEFAULT_TARGET_ACCURACY
+from .utils.metrics_utils import collect_timings, stage_timer
+from common.http_utils import format_server_timing, require_admin_token
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from io import BytesIO
 import os
 import json
+import asyncio
 import logging
 import argparse
 import uvicorn
@@ -23,7 +35,127 @@ load_dotenv()
 # Globals to hold heavy initializations
 global_db_df = None
 global_vectorstore = None
+global_footprint_index = None
+global_lexical_index = None
 llm = None
+rerank_cache = None
+job_manager = None
+# Serializes catalog updates; requests keep reading the catalog globals while an update runs
+catalog_update_lock = asyncio.Lock()
+# Version (`artifact_version`) of the vector store artifact the catalog globals were loaded from
+catalog_version = None
+
+# LLM re-ranking options (overridable via environment variables)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "1.0"))
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "10"))
+
+def _llm_options() -> dict:
+    """
+    Keyword arguments controlling concurrency, timeouts, retries and batching of the LLM re-ranking stage.
+    """
+    return {
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "timeout": LLM_TIMEOUT,
+        "max_retries": LLM_MAX_RETRIES,
+        "backoff": LLM_BACKOFF,
+        "batch_size": LLM_BATCH_SIZE
+    }
+
+# Location of the prebuilt vector store artifact and its source catalog
+DB_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "healthcare_lca_master_data.csv")
+VECTORSTORE_ARTIFACT_DIR = os.getenv(
+    "VECTORSTORE_ARTIFACT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts", "vectorstore")
+)
+
+# FAISS index type and search parameters (overridable via environment variables)
+def _optional_int_env(name: str):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+VECTORSTORE_INDEX_PARAMS = {
+    "index_type": os.getenv("VECTORSTORE_INDEX_TYPE", "flat"),
+    "nlist": _optional_int_env("VECTORSTORE_NLIST"),
+    "pq_m": _optional_int_env("VECTORSTORE_PQ_M"),
+    "hnsw_m": _optional_int_env("VECTORSTORE_HNSW_M")
+}
+VECTORSTORE_NPROBE = _optional_int_env("VECTORSTORE_NPROBE")
+VECTORSTORE_EF_SEARCH = _optional_int_env("VECTORSTORE_EF_SEARCH")
+
+# Embedding encoder and embedding cache options (overridable via environment variables)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE") or None
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_THREADS = _optional_int_env("EMBEDDING_THREADS")
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "embedding_cache.sqlite3")
+)
+
+def _configure_encoder_threads() -> None:
+    """
+    Apply `EMBEDDING_THREADS` to the torch encoder once at startup; it sets the thread count of
+    the whole process. The ONNX encoder gets it as a session option instead.
+    """
+    if EMBEDDING_BACKEND == "torch":
+        configure_torch_threads(EMBEDDING_THREADS)
+
+def _vectorstore_options() -> dict:
+    """
+    Keyword arguments selecting the FAISS index type, its query-time parameters and the embedding encoder.
+    """
+    return {
+        "index_params": VECTORSTORE_INDEX_PARAMS,
+        "nprobe": VECTORSTORE_NPROBE,
+        "ef_search": VECTORSTORE_EF_SEARCH,
+        "embedding_options": {
+            "backend": EMBEDDING_BACKEND,
+            "onnx_file": EMBEDDING_ONNX_FILE,
+            "batch_size": EMBEDDING_BATCH_SIZE,
+            "threads": EMBEDDING_THREADS,
+            "cache_path": EMBEDDING_CACHE_PATH if EMBEDDING_CACHE_ENABLED else None
+        }
+    }
+
+# Lexical matching options (overridable via environment variables)
+LEXICAL_ENABLED = os.getenv("LEXICAL_ENABLED", "true").lower() in ("1", "true", "yes")
+# "retrieval": exact and fuzzy hits skip embedding and vector search, the LLM still re-ranks them;
+# "match": exact hits also skip the LLM (no alternatives); "off": no fast path (lexical candidates are still fused)
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "retrieval")
+LEXICAL_FUZZY_THRESHOLD = float(os.getenv("LEXICAL_FUZZY_THRESHOLD", "0.9"))
+if LEXICAL_FAST_PATH not in ("match", "retrieval", "off"):
+    raise ValueError(f"LEXICAL_FAST_PATH must be 'match', 'retrieval' or 'off', got '{LEXICAL_FAST_PATH}'")
+
+def _build_lexical_index(db_df: pd.DataFrame):
+    return build_lexical_index(db_df, LEXICAL_FUZZY_THRESHOLD) if LEXICAL_ENABLED else None
+
+# Retrieval confidence gate (overridable via environment variables); disabled unless a minimum
+# score is set. Items whose top vector candidate clears both thresholds skip LLM re-ranking.
+RETRIEVAL_GATE_MIN_SCORE = os.getenv("RETRIEVAL_GATE_MIN_SCORE")
+RETRIEVAL_GATE_MIN_MARGIN = float(os.getenv("RETRIEVAL_GATE_MIN_MARGIN", str(DEFAULT_MIN_MARGIN)))
+retrieval_gate = (
+    ConfidenceGate(float(RETRIEVAL_GATE_MIN_SCORE), RETRIEVAL_GATE_MIN_MARGIN) if RETRIEVAL_GATE_MIN_SCORE else None
+)
+
+# Background job options (overridable via environment variables)
+JOB_MAX_CONCURRENCY = int(os.getenv("JOB_MAX_CONCURRENCY", "2"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+
+# Persistent re-rank cache options (overridable via environment variables)
+RERANK_CACHE_ENABLED = os.getenv("RERANK_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RERANK_CACHE_PATH = os.getenv(
+    "RERANK_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "rerank_cache.sqlite3")
+)
+RERANK_CACHE_TTL = float(os.getenv("RERANK_CACHE_TTL", str(30 * 24 * 60 * 60)))
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "100000"))
+
+# Bearer token of the admin endpoints (catalog updates); they are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
 
 app = FastAPI(
     title="EcoMedAI - BOM Processing API",
@@ -43,35 +175,40 @@ async def initialize_supply_resources():
     """
     Initialize heavy resources for the supply app (run during startup).
     """
-    global global_db_df, global_vectorstore, llm
+    global global_db_df, global_vectorstore, global_footprint_index, global_lexical_index, llm, rerank_cache, job_manager
+    global catalog_version
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        DB_CSV_PATH = os.path.join(current_dir, "data", "healthcare_lca_master_data.csv")
+        _configure_encoder_threads()
         global_db_df = load_db_data(DB_CSV_PATH)
-        global_vectorstore, _ = create_vectorstore(global_db_df)
+        global_footprint_index = build_footprint_index(global_db_df)
+        global_lexical_index = _build_lexical_index(global_db_df)
+        global_vectorstore, _ = load_or_build_vectorstore(
+            global_db_df, DB_CSV_PATH, VECTORSTORE_ARTIFACT_DIR, **_vectorstore_options()
+        )
+        catalog_version = artifact_version(VECTORSTORE_ARTIFACT_DIR)
         llm = ChatGoogleGenerativeAI(model='gemini-2.0-flash')
+        if RERANK_CACHE_ENABLED:
+            rerank_cache = RerankCache(RERANK_CACHE_PATH, RERANK_CACHE_TTL, RERANK_CACHE_MAX_ENTRIES)
+        job_manager = JobManager(max_concurrent_jobs=JOB_MAX_CONCURRENCY, result_ttl=JOB_RESULT_TTL)
         logger.info("Supply resources initialized successfully.")
     except Exception as e:
         logger.error("Error during supply resources initialization", exc_info=True)
         raise e
 
-@app.post("/process")
-async def process_bom(bom_file: UploadFile = File(...)):
+async def _read_bom_upload(bom_file: UploadFile) -> pd.DataFrame:
     """
-    API endpoint to process a BOM CSV file uploaded by the user.
-    The Database CSV is loaded from a fixed path.
+    Read and validate an uploaded BOM CSV file.
+
+    Raises:
+        HTTPException: If the server is not initialized or the file is not a valid BOM CSV.
     """
     if global_db_df is None or global_vectorstore is None:
         raise HTTPException(status_code=500, detail="Server initialization incomplete.")
-    
-    try:
-        bom_contents = await bom_file.read()
-    except Exception as e:
-        logger.error(f"Error reading BOM file: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=400, detail="Invalid BOM CSV file provided.")
 
+    # Parsed in chunks straight from the spooled upload instead of reading it into memory first
     try:
-        bom_df = pd.read_csv(BytesIO(bom_contents))
+        with stage_timer("parse"):
+            bom_df = await asyncio.to_thread(read_bom_csv, bom_file.file)
     except Exception as e:
         logger.error(f"Error loading data: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail="Error processing CSV files.")
@@ -81,13 +218,340 @@ async def process_bom(bom_file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="BOM CSV must contain 'product_name' column.")
     if 'quantity' not in bom_df.columns:
         bom_df['quantity'] = 1.0
+    return bom_df
 
-    try:
-        result_data = process_bom_items(bom_df, global_db_df, global_vectorstore, llm)
-        return result_data
-    except Exception as e:
-        logger.error(f"Error processing data: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error during processing.")
+def _processing_options(bypass_cache: bool) -> dict:
+    """
+    Keyword arguments shared by every BOM processing entry point.
+    """
+    return {
+        "cache": rerank_cache,
+        "bypass_cache": bypass_cache,
+        "footprint_index": global_footprint_index,
+        "lexical_index": global_lexical_index,
+        "lexical_fast_path": LEXICAL_FAST_PATH,
+        "gate": retrieval_gate,
+        **_llm_options()
+    }
+
+@app.post("/process")
+async def process_bom(response: Response, bom_file: UploadFile = File(...), bypass_cache: bool = False):
+    """
+    API endpoint to process a BOM CSV file uploaded by the user.
+    The Database CSV is loaded from a fixed path.
+    Set `bypass_cache=true` to ignore cached re-rank results (fresh results are still cached).
+    The `Server-Timing` response header breaks the request down by processing stage.
+    """
+    with collect_timings() as timings:
+        bom_df = await _read_bom_upload(bom_file)
+
+        try:
+            result_data = await aprocess_bom_items(
+                bom_df, global_db_df, global_vectorstore, llm, **_processing_options(bypass_cache)
+            )
+        except Exception as e:
+            logger.error(f"Error processing data: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Internal server error during processing.")
+
+    response.headers["Server-Timing"] = format_server_timing(timings)
+    return result_data
+
+def _json_default(value):
+    """
+    JSON fallback for numpy scalars coming from pandas rows.
+    """
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+def _format_event(event: dict, stream_format: str) -> str:
+    """
+    Serialize a streaming event as an NDJSON line or a server-sent event.
+    """
+    data = json.dumps(event, default=_json_default)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+@app.post("/process/stream")
+async def process_bom_stream(
+    request: Request,
+    bom_file: UploadFile = File(...),
+    stream_format: str = "ndjson",
+    bypass_cache: bool = False
+):
+    """
+    Streaming variant of `/process`.
+
+    Each processed BOM item is emitted as soon as it is ready as an `item` event carrying its BOM
+    row `index`, followed by a final `summary` event with `totalCarbonFootprint`. Use
+    `stream_format=ndjson` (default) for newline-delimited JSON or `stream_format=sse` for
+    server-sent events. Disconnecting stops the remaining work.
+    """
+    if stream_format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="stream_format must be 'ndjson' or 'sse'.")
+    bom_df = await _read_bom_upload(bom_file)
+
+    async def _events():
+        total_cf = 0.0
+        item_count = 0
+        items = aiter_bom_items(bom_df, global_db_df, global_vectorstore, llm, **_processing_options(bypass_cache))
+        try:
+            async for position, item in items:
+                if await request.is_disconnected():
+                    logger.info(f"Client disconnected after {item_count} of {len(bom_df)} BOM items, stopping")
+                    return
+                total_cf += item["totalMatchedItemCarbonFootprint"]
+                item_count += 1
+                yield _format_event({"type": "item", "index": position, "item": item}, stream_format)
+            yield _format_event(
+                {"type": "summary", "itemCount": item_count, "totalCarbonFootprint": total_cf},
+                stream_format
+            )
+        except Exception as e:
+            logger.error(f"Error processing data: {str(e)}", exc_info=True)
+            yield _format_event(
+                {"type": "error", "detail": "Internal server error during processing."},
+                stream_format
+            )
+        finally:
+            await items.aclose()
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(_events(), media_type=media_type)
+
+@app.post("/jobs")
+async def submit_bom_job(bom_file: UploadFile = File(...), bypass_cache: bool = False):
+    """
+    API endpoint to process a BOM CSV file in the background.
+    Returns a job id to poll with `GET /jobs/{job_id}` and fetch results from `GET /jobs/{job_id}/result`.
+    """
+    bom_df = await _read_bom_upload(bom_file)
+    if job_manager is None:
+        raise HTTPException(status_code=500, detail="Server initialization incomplete.")
+
+    async def _job(report_progress):
+        # The catalog data, vector store and indexes are read together when the job starts, so a
+        # catalog reload while it runs cannot mix two catalog versions
+        results = aiter_bom_items(bom_df, global_db_df, global_vectorstore, llm, **_processing_options(bypass_cache))
+        items = [None] * len(bom_df)
+        processed = 0
+        async for position, item in results:
+            items[position] = item
+            processed += 1
+            report_progress(processed)
+        return {
+            "items": items,
+            "totalCarbonFootprint": sum((item["totalMatchedItemCarbonFootprint"] for item in items), 0.0)
+        }
+
+    return job_manager.submit(_job, total=len(bom_df))
+
+def _get_job_or_404(job_id: str) -> dict:
+    job = job_manager.get(job_id) if job_manager is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found or expired.")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_bom_job(job_id: str):
+    """
+    API endpoint returning the status and progress (`processed` of `total` items) of a job.
+    """
+    return _get_job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/result")
+async def get_bom_job_result(job_id: str):
+    """
+    API endpoint returning the result of a completed job.
+    """
+    job = _get_job_or_404(job_id)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is {job['status']}.")
+    return job_manager.get_result(job_id)["result"]
+
+@app.delete("/jobs/{job_id}")
+async def cancel_bom_job(job_id: str):
+    """
+    API endpoint cancelling a queued or running job.
+    """
+    _get_job_or_404(job_id)
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' has already finished.")
+    return _get_job_or_404(job_id)
+
+@app.get("/impacts")
+async def get_product_impacts(product_name: str):
+    """
+    API endpoint returning every impact value recorded in the LCA master data for a product.
+    """
+    if global_footprint_index is None:
+        raise HTTPException(status_code=500, detail="Server initialization incomplete.")
+    impacts = global_footprint_index.get_impacts(product_name)
+    if impacts is None:
+        raise HTTPException(status_code=404, detail=f"Product '{product_name}' not found.")
+    return {"product_name": product_name, "impacts": impacts}
+
+@app.get("/lexical/stats")
+async def get_lexical_stats():
+    """
+    API endpoint returning how many BOM items the lexical fast path matched, i.e. how much
+    embedding and LLM work it avoided.
+    """
+    if global_lexical_index is None:
+        raise HTTPException(status_code=404, detail="Lexical matching is disabled.")
+    stats = global_lexical_index.stats()
+    llm_items_avoided = stats["exactHits"] if LEXICAL_FAST_PATH == "match" else 0
+    return {"fastPath": LEXICAL_FAST_PATH, **stats, "llmItemsAvoided": llm_items_avoided}
+
+@app.get("/gate/stats")
+async def get_gate_stats():
+    """
+    API endpoint returning how many BOM items the retrieval confidence gate accepted without
+    LLM re-ranking and how many it escalated to the LLM.
+    """
+    if retrieval_gate is None:
+        raise HTTPException(status_code=404, detail="Retrieval confidence gate is disabled.")
+    return retrieval_gate.stats()
+
+@app.get("/cache/rerank")
+async def get_rerank_cache_stats():
+    """
+    API endpoint returning hit/miss counters and size of the re-rank cache.
+    """
+    if rerank_cache is None:
+        raise HTTPException(status_code=404, detail="Re-rank cache is disabled.")
+    return await asyncio.to_thread(rerank_cache.stats)
+
+@app.delete("/cache/rerank")
+async def clear_rerank_cache():
+    """
+    API endpoint invalidating every cached re-rank result.
+    """
+    if rerank_cache is None:
+        raise HTTPException(status_code=404, detail="Re-rank cache is disabled.")
+    await asyncio.to_thread(rerank_cache.clear)
+    return {"status": "cleared"}
+
+def _embedding_cache():
+    embeddings = getattr(global_vectorstore, "embedding_function", None)
+    cache = getattr(embeddings, "cache", None)
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Embedding cache is disabled.")
+    return cache
+
+@app.get("/cache/embeddings")
+async def get_embedding_cache_stats():
+    """
+    API endpoint returning hit/miss counters and size of the embedding cache.
+    """
+    return _embedding_cache().stats()
+
+@app.delete("/cache/embeddings")
+async def clear_embedding_cache():
+    """
+    API endpoint removing every cached embedding.
+    """
+    _embedding_cache().clear()
+    return {"status": "cleared"}
+
+def _write_catalog(contents: bytes) -> None:
+    """
+    Atomically replace the Database CSV file.
+    """
+    tmp_path = DB_CSV_PATH + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(contents)
+    os.replace(tmp_path, DB_CSV_PATH)
+
+def _load_catalog(embeddings, read_only: bool = False):
+    """
+    Load the Database CSV and bring the footprint lookup, the lexical index and the vector store
+    artifact up to date with it. Only product names that are not indexed yet are embedded.
+    With `read_only`, the artifact is only loaded, and None is returned if it is stale.
+    """
+    db_df = load_db_data(DB_CSV_PATH)
+    vectorstore, summary = sync_vectorstore_artifact(
+        db_df,
+        DB_CSV_PATH,
+        VECTORSTORE_ARTIFACT_DIR,
+        embeddings,
+        index_params=VECTORSTORE_INDEX_PARAMS,
+        nprobe=VECTORSTORE_NPROBE,
+        ef_search=VECTORSTORE_EF_SEARCH,
+        read_only=read_only
+    )
+    if vectorstore is None:
+        return None
+    footprint_index = build_footprint_index(db_df)
+    lexical_index = _build_lexical_index(db_df)
+    return db_df, vectorstore, footprint_index, lexical_index, summary
+
+def _swap_catalog(db_df, vectorstore, footprint_index, lexical_index) -> None:
+    global global_db_df, global_vectorstore, global_footprint_index, global_lexical_index, catalog_version
+    # No await between these assignments, so every request sees either the old or the new catalog
+    global_db_df, global_vectorstore, global_footprint_index, global_lexical_index = (
+        db_df, vectorstore, footprint_index, lexical_index
+    )
+    catalog_version = artifact_version(VECTORSTORE_ARTIFACT_DIR)
+
+@app.middleware("http")
+async def refresh_catalog(request: Request, call_next):
+    """
+    Reload the catalog when another worker process updated the shared vector store artifact, so
+    every worker serves an update from its next request on.
+    """
+    global catalog_version
+    if global_vectorstore is not None and artifact_version(VECTORSTORE_ARTIFACT_DIR) != catalog_version:
+        async with catalog_update_lock:
+            # Another request of this worker may have reloaded it while we waited
+            version = artifact_version(VECTORSTORE_ARTIFACT_DIR)
+            if version != catalog_version:
+                try:
+                    loaded = await asyncio.to_thread(_load_catalog, global_vectorstore.embedding_function, True)
+                except Exception as e:
+                    logger.error(f"Error reloading catalog: {str(e)}", exc_info=True)
+                    loaded = None
+                if loaded is not None:
+                    _swap_catalog(*loaded[:4])
+                    logger.info("Catalog reloaded after an update by another process")
+                else:
+                    # Keep serving the current catalog; the next artifact write triggers a new attempt
+                    logger.warning("Updated vector store artifact does not match the Database CSV, not reloading")
+                    catalog_version = version
+    return await call_next(request)
+
+@app.post("/admin/catalog/update")
+async def update_catalog(catalog_file: UploadFile = File(None), authorization: str = Header(None)):
+    """
+    API endpoint applying a new version of the Database CSV without restarting the server.
+    Upload `catalog_file` to replace the CSV, or omit it after editing the file in place.
+    Requests already in flight finish against the previous catalog; other worker processes
+    reload the updated artifact on their next request. Requires `Authorization: Bearer <ADMIN_TOKEN>`.
+    """
+    require_admin_token(authorization, ADMIN_TOKEN)
+    if global_vectorstore is None:
+        raise HTTPException(status_code=500, detail="Server initialization incomplete.")
+
+    async with catalog_update_lock:
+        if catalog_file is not None:
+            contents = await catalog_file.read()
+            try:
+                await asyncio.to_thread(load_db_data, BytesIO(contents))
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Invalid Database CSV file: {str(e)}")
+            await asyncio.to_thread(_write_catalog, contents)
+
+        try:
+            db_df, vectorstore, footprint_index, lexical_index, summary = await asyncio.to_thread(
+                _load_catalog, global_vectorstore.embedding_function
+            )
+        except Exception as e:
+            logger.error(f"Error updating catalog: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Error updating catalog.")
+        _swap_catalog(db_df, vectorstore, footprint_index, lexical_index)
+    logger.info(f"Catalog updated: {summary}")
+    return {"status": "updated", **summary}
 
 def run_cli():
     """
@@ -103,7 +567,7 @@ def run_cli():
         return
 
     try:
-        bom_df = pd.read_csv(BytesIO(bom_bytes))
+        bom_df = read_bom_csv(BytesIO(bom_bytes))
     except Exception as e:
         logger.error(f"Error loading CSV data: {str(e)}", exc_info=True)
         return
@@ -113,7 +577,18 @@ def run_cli():
         bom_df['quantity'] = 1.0
 
     try:
-        result_data = process_bom_items(bom_df, global_db_df, global_vectorstore, llm)
+        result_data = process_bom_items(
+            bom_df,
+            global_db_df,
+            global_vectorstore,
+            llm,
+            cache=rerank_cache,
+            footprint_index=global_footprint_index,
+            lexical_index=global_lexical_index,
+            lexical_fast_path=LEXICAL_FAST_PATH,
+            gate=retrieval_gate,
+            **_llm_options()
+        )
     except Exception as e:
         logger.error(f"Error processing BOM items: {str(e)}", exc_info=True)
         return
@@ -124,18 +599,131 @@ def run_cli():
         json.dump(result_data, f, indent=2)
     logger.info(f"Processing completed. Results saved to '{output_path}'")
 
+def run_build_index(force_rebuild: bool = False):
+    """
+    Build mode: Embed the Database CSV and write the vector store artifact loaded at startup.
+    """
+    db_df = load_db_data(DB_CSV_PATH)
+    load_or_build_vectorstore(
+        db_df, DB_CSV_PATH, VECTORSTORE_ARTIFACT_DIR, force_rebuild=force_rebuild, **_vectorstore_options()
+    )
+    logger.info(f"Vector store artifact ready in '{VECTORSTORE_ARTIFACT_DIR}'")
+
+def run_update_catalog(catalog_path: str = None):
+    """
+    Update mode: Optionally replace the Database CSV, then update the vector store artifact,
+    embedding only the product names that are not indexed yet.
+    """
+    if catalog_path:
+        with open(catalog_path, "rb") as f:
+            contents = f.read()
+        load_db_data(BytesIO(contents))
+        _write_catalog(contents)
+    db_df = load_db_data(DB_CSV_PATH)
+    load_or_build_vectorstore(db_df, DB_CSV_PATH, VECTORSTORE_ARTIFACT_DIR, **_vectorstore_options())
+    logger.info(f"Vector store artifact in '{VECTORSTORE_ARTIFACT_DIR}' matches '{DB_CSV_PATH}'")
+
+# Index configurations compared against the exact flat index in 'index-report' mode
+INDEX_REPORT_CONFIGS = [
+    {"index_type": "ivf_flat", "nprobe": 1},
+    {"index_type": "ivf_flat", "nprobe": 4},
+    {"index_type": "ivf_flat", "nprobe": 16},
+    {"index_type": "ivf_pq", "nprobe": 16},
+    {"index_type": "hnsw", "ef_search": 16},
+    {"index_type": "hnsw", "ef_search": 64}
+]
+
+def run_index_report(bom_file_path: str, output_path: str = "index_report.json"):
+    """
+    Report mode: Compare recall and latency of the ANN index types against the exact flat index,
+    using the product names of a BOM CSV file as queries.
+    """
+    db_df = load_db_data(DB_CSV_PATH)
+    _, embeddings = load_or_build_vectorstore(db_df, DB_CSV_PATH, VECTORSTORE_ARTIFACT_DIR, **_vectorstore_options())
+    vectors = load_embeddings_artifact(VECTORSTORE_ARTIFACT_DIR)
+    bom_df = pd.read_csv(bom_file_path)
+    queries = embeddings.embed_documents(bom_df["product_name"].astype(str).tolist())
+
+    report = evaluate_index_configs(vectors, queries, INDEX_REPORT_CONFIGS)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Index report for {len(queries)} queries saved to '{output_path}'")
+
+def run_calibrate_gate(labels_path: str, output_path: str = "gate_calibration.json", target_accuracy: float = DEFAULT_TARGET_ACCURACY):
+    """
+    Calibration mode: Pick the retrieval confidence gate thresholds from a labeled CSV with
+    'bom_item' and 'catalog_item' columns, reporting LLM call savings against the accuracy of the
+    matches accepted without the LLM.
+    """
+    db_df = load_db_data(DB_CSV_PATH)
+    vectorstore, _ = load_or_build_vectorstore(db_df, DB_CSV_PATH, VECTORSTORE_ARTIFACT_DIR, **_vectorstore_options())
+    labels_df = pd.read_csv(labels_path)
+    missing = {"bom_item", "catalog_item"} - set(labels_df.columns)
+    if missing:
+        raise ValueError(f"Labels CSV is missing columns {sorted(missing)}")
+    bom_items = labels_df["bom_item"].astype(str).tolist()
+    scored_candidates = query_similar_items_batch(vectorstore, bom_items)
+
+    report = calibrate_gate(scored_candidates, labels_df["catalog_item"].astype(str).tolist(), target_accuracy=target_accuracy)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Gate calibration for {len(bom_items)} labeled items saved to '{output_path}'")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run BOM processing in API or CLI mode.")
     parser.add_argument(
         "--mode",
-        choices=["api", "cli"],
+        choices=["api", "cli", "build-index", "update-catalog", "index-report", "calibrate-gate"],
         default="api",
-        help="Run mode: 'api' to launch the FastAPI server, 'cli' to execute CLI processing."
+        help="Run mode: 'api' to launch the FastAPI server, 'cli' to execute CLI processing, "
+             "'build-index' to prebuild the vector store artifact, "
+             "'update-catalog' to apply a new Database CSV to the artifact incrementally, "
+             "'index-report' to compare ANN index recall and latency against the flat index, "
+             "'calibrate-gate' to pick the retrieval confidence gate thresholds from labeled matches."
+    )
+    parser.add_argument(
+        "--force-rebuild",
+        action="store_true",
+        help="With 'build-index', rebuild the artifact even if it matches the current Database CSV."
+    )
+    parser.add_argument(
+        "--catalog",
+        default=None,
+        help="With 'update-catalog', new Database CSV file replacing healthcare_lca_master_data.csv."
+    )
+    parser.add_argument(
+        "--bom",
+        default=os.path.join("data", "hospital_purchase_order.csv"),
+        help="With 'index-report', BOM CSV file whose product names are used as queries."
+    )
+    parser.add_argument(
+        "--labels",
+        default=None,
+        help="With 'calibrate-gate', CSV of labeled matches with 'bom_item' and 'catalog_item' columns."
+    )
+    parser.add_argument(
+        "--target-accuracy",
+        type=float,
+        default=DEFAULT_TARGET_ACCURACY,
+        help="With 'calibrate-gate', minimum accuracy of the matches accepted without the LLM."
     )
     args = parser.parse_args()
+    # The API and CLI modes configure it in initialize_supply_resources
+    if args.mode not in ("api", "cli"):
+        _configure_encoder_threads()
 
-    if args.mode == "cli":
-        initialize_supply_resources()
+    if args.mode == "build-index":
+        run_build_index(args.force_rebuild)
+    elif args.mode == "update-catalog":
+        run_update_catalog(args.catalog)
+    elif args.mode == "index-report":
+        run_index_report(args.bom)
+    elif args.mode == "calibrate-gate":
+        if not args.labels:
+            parser.error("'calibrate-gate' requires --labels")
+        run_calibrate_gate(args.labels, target_accuracy=args.target_accuracy)
+    elif args.mode == "cli":
+        asyncio.run(initialize_supply_resources())
         run_cli()
     else:
         uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,89 +1,441 @@
-from .utils.vectorstore_utils import query_similar_items
-from .utils.llm_utils import rerank_with_llm
-from .utils.carbon_utils import get_carbon_footprint
-from typing import Dict
+from .utils.vectorstore_utils import query_similar_items, query_similar_items_batch
+from .utils.lexical_utils import LexicalIndex, hybrid_candidates, lexical_candidates
+from .utils.gating_utils import ConfidenceGate
+from .utils.llm_utils import (
+    iter_reranked_items,
+    get_llm_model_name,
+    PROMPT_VERSION,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_TIMEOUT,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_BACKOFF,
+    DEFAULT_BATCH_SIZE
+)
+from .utils.carbon_utils import FootprintIndex, build_footprint_index
+from .utils.cache_utils import RerankCache
+from .utils.metrics_utils import BOM_ITEMS, RERANK_CACHE_LOOKUPS, record_stage, stage_timer
+from .utils.text_utils import normalize_text
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import asyncio
 import logging
+import time
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
-def process_bom_items(bom_df: pd.DataFrame, db_df: pd.DataFrame, vectorstore, llm) -> Dict:
+# Fresh re-rank results written to the cache per transaction
+CACHE_WRITE_BATCH = 50
+
+def _empty_item(bomItem: str, quantity, unit_price, total_price) -> Dict:
     """
-    Process BOM items by matching them against the vectorstore and suggesting sustainable alternatives.
+    Build the result entry for a BOM item that could not be matched.
+    """
+    return {
+        "bomItem": bomItem,
+        "matchedItem": None,
+        "matchedItemCarbonFootprint": 0.0,
+        "totalMatchedItemCarbonFootprint": 0.0,
+        "quantity": quantity,
+        "unitPrice": unit_price,
+        "totalPrice": total_price,
+        "alternativeItems": []
+    }
+
+def _build_item(bomItem: str, quantity, unit_price, total_price, llm_result: Dict, footprint_index: FootprintIndex) -> Dict:
+    """
+    Build the result entry for a BOM item from its LLM re-rank result.
+    """
+    matched_item = llm_result.get("matched_item")
+    equivalent_items = llm_result.get("equivalent_items", [])
+    matched_cf = footprint_index.get_carbon_footprint(matched_item) if matched_item else 0.0
+
+    # Compute alternative items based on carbon footprint criteria
+    alternate_items = []
+    if matched_item and equivalent_items:
+        alternatives = [alt for alt in set(equivalent_items) if alt != matched_item]
+        for alt, alt_cf in zip(alternatives, footprint_index.get_carbon_footprints(alternatives)):
+            if 0 < alt_cf < matched_cf:
+                total_alt_cf = alt_cf * quantity
+                alternate_items.append({
+                    "name": alt,
+                    "carbonFootprint": alt_cf,
+                    "totalAlternateCarbonFootprint": total_alt_cf
+                })
+        alternate_items.sort(key=lambda x: x["carbonFootprint"])
+
+    total_matched_cf_units = matched_cf * quantity if matched_item else 0.0
+
+    return {
+        "bomItem": bomItem,
+        "matchedItem": matched_item,
+        "matchedItemCarbonFootprint": matched_cf,
+        "totalMatchedItemCarbonFootprint": total_matched_cf_units,
+        "quantity": quantity,
+        "unitPrice": unit_price,
+        "totalPrice": total_price,
+        "alternativeItems": alternate_items
+    }
+
+def _retrieve_candidates(
+    vectorstore,
+    bom_items: List[str],
+    lexical_index: Optional[LexicalIndex] = None,
+    gate: Optional[ConfidenceGate] = None
+) -> Tuple[List[Optional[List[str]]], Dict[int, str]]:
+    """
+    Retrieve candidates for every BOM item with one batched vector search.
+
+    With a `gate`, items whose vector scores are decisive are accepted as matched and get no
+    candidates; the candidates of the others are fused with the lexical candidates when a
+    `lexical_index` is given. Falls back to per-item queries if the batch search fails; items
+    whose retrieval fails get None.
+
+    Returns:
+        Tuple[List[Optional[List[str]]], Dict[int, str]]: The candidates of every BOM item, and the
+        matches accepted by the gate by BOM item position.
+    """
+    if not bom_items:
+        return [], {}
+    try:
+        scored_candidates = query_similar_items_batch(vectorstore, bom_items)
+    except Exception as e:
+        logger.error(f"Batch candidate retrieval failed, querying items one by one: {str(e)}", exc_info=True)
+        scored_candidates = []
+        for bomItem in bom_items:
+            try:
+                scored_candidates.append(query_similar_items(vectorstore, bomItem, with_scores=True))
+            except Exception as e:
+                logger.error(f"Error retrieving candidates for BOM item '{bomItem}': {str(e)}", exc_info=True)
+                scored_candidates.append(None)
+
+    batch_candidates: List[Optional[List[str]]] = []
+    accepted: Dict[int, str] = {}
+    for position, (bomItem, scored) in enumerate(zip(bom_items, scored_candidates)):
+        matched = gate.decide(scored) if gate is not None and scored is not None else None
+        if matched is not None:
+            accepted[position] = matched
+            batch_candidates.append([])
+            continue
+        candidates = None if scored is None else [name for name, _ in scored]
+        if candidates is not None and lexical_index is not None:
+            candidates = hybrid_candidates(lexical_index, str(bomItem), candidates, len(candidates))
+        batch_candidates.append(candidates)
+    return batch_candidates, accepted
+
+def _lexical_fast_path(
+    lexical_index: LexicalIndex,
+    bom_items: List[str],
+    lexical_fast_path: str
+) -> Tuple[Dict[int, str], Dict[int, List[str]]]:
+    """
+    Look up the lexical matches of the BOM items.
+
+    In "match" mode, exact hits are matched outright. Fuzzy hits, and every hit in "retrieval"
+    mode, get their lexical candidates instead, which the LLM still re-ranks.
+
+    Returns:
+        Tuple[Dict[int, str], Dict[int, List[str]]]: The items matched without the LLM and the
+        candidates of the items that skip the vector search, by BOM item position.
+    """
+    matched: Dict[int, str] = {}
+    candidates: Dict[int, List[str]] = {}
+    if lexical_index is None or lexical_fast_path == "off":
+        return matched, candidates
+    with stage_timer("lexical"):
+        for position, bomItem in enumerate(bom_items):
+            hit = lexical_index.match(str(bomItem))
+            if hit is None:
+                continue
+            name, kind = hit
+            if lexical_fast_path == "match" and kind == "exact":
+                matched[position] = name
+            else:
+                candidates[position] = lexical_candidates(lexical_index, str(bomItem), name)
+    return matched, candidates
+
+def _retrieve_all(
+    vectorstore,
+    bom_items: List[str],
+    lexical_index: Optional[LexicalIndex],
+    lexical_fast_path: str,
+    gate: Optional[ConfidenceGate]
+) -> Tuple[List[Optional[List[str]]], Dict[int, str]]:
+    """
+    Run the lexical fast path, then the vector search for the remaining BOM items.
+
+    Returns:
+        Tuple[List[Optional[List[str]]], Dict[int, str]]: The candidates of every BOM item (None if
+        retrieval failed), and the items matched without the LLM (exact lexical hits in "match"
+        mode and items accepted by the gate) by BOM item position.
+    """
+    matched, lexical_found = _lexical_fast_path(lexical_index, bom_items, lexical_fast_path)
+    to_search = [
+        position for position in range(len(bom_items))
+        if position not in matched and position not in lexical_found
+    ]
+    with stage_timer("retrieval"):
+        found, accepted = _retrieve_candidates(
+            vectorstore, [bom_items[position] for position in to_search], lexical_index, gate
+        )
+
+    batch_candidates: List[Optional[List[str]]] = [None] * len(bom_items)
+    for position, candidates in lexical_found.items():
+        batch_candidates[position] = candidates
+    for position, candidates in zip(to_search, found):
+        batch_candidates[position] = candidates
+    for position, name in accepted.items():
+        matched[to_search[position]] = name
+    return batch_candidates, matched
+
+def _group_bom_items(bom_items: List[str]) -> Tuple[List[str], List[List[int]]]:
+    """
+    Group BOM rows by normalized product name.
+
+    Returns:
+        Tuple[List[str], List[List[int]]]: The first spelling of every distinct item, used as its
+        query, and for each item the positions of the BOM rows sharing it.
+    """
+    groups: Dict[str, int] = {}
+    unique_items: List[str] = []
+    row_groups: List[List[int]] = []
+    for position, bomItem in enumerate(bom_items):
+        key = normalize_text(str(bomItem))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = len(unique_items)
+            unique_items.append(bomItem)
+            row_groups.append([])
+        row_groups[group].append(position)
+    return unique_items, row_groups
+
+def _fan_out(
+    rows: List[Tuple],
+    positions: List[int],
+    llm_result: Dict,
+    footprint_index: FootprintIndex
+) -> Iterator[Tuple[int, Dict]]:
+    """
+    Build the result entries of the BOM rows sharing one re-rank result.
+    """
+    for position in positions:
+        bomItem, quantity, unit_price, total_price = rows[position]
+        try:
+            with stage_timer("footprint"):
+                item = _build_item(bomItem, quantity, unit_price, total_price, llm_result, footprint_index)
+            BOM_ITEMS.labels("matched" if item["matchedItem"] else "unmatched").inc()
+        except Exception as e:
+            logger.error(f"Error processing BOM item '{bomItem}': {str(e)}", exc_info=True)
+            item = _empty_item(bomItem, quantity, unit_price, total_price)
+            BOM_ITEMS.labels("failed").inc()
+        yield position, item
+
+async def _iter_rerank_with_cache(
+    to_rerank: List[Tuple[str, List[str]]],
+    llm,
+    cache: Optional[RerankCache],
+    bypass_cache: bool,
+    **rerank_options
+) -> AsyncIterator[Tuple[int, Dict]]:
+    """
+    Re-rank items, serving cached results first and sending only cache misses to the LLM.
+    Yields (position in `to_rerank`, result) pairs as they become available.
+
+    Only results with a matched item are cached, since an empty result may stem from a failed LLM call.
+    """
+    if cache is None:
+        reranked = iter_reranked_items(to_rerank, llm, **rerank_options)
+        try:
+            async for idx, result in reranked:
+                yield idx, result
+        finally:
+            await reranked.aclose()
+        return
+
+    model_name = get_llm_model_name(llm)
+    start = time.perf_counter()
+    keys = [cache.make_key(bomItem, candidates, model_name, PROMPT_VERSION) for bomItem, candidates in to_rerank]
+    # Cache I/O blocks on SQLite, so it runs in a worker thread, one batch at a time
+    found = {} if bypass_cache else await asyncio.to_thread(cache.get_many, keys)
+    cached = {idx: found[key] for idx, key in enumerate(keys) if key in found}
+    missing = [idx for idx in range(len(keys)) if idx not in cached]
+    record_stage("rerank_cache", time.perf_counter() - start)
+    RERANK_CACHE_LOOKUPS.labels("hit").inc(len(cached))
+    RERANK_CACHE_LOOKUPS.labels("miss").inc(len(missing))
+    for idx, result in cached.items():
+        yield idx, result
+    logger.info(f"Re-rank cache served {len(to_rerank) - len(missing)} of {len(to_rerank)} items")
+
+    reranked = iter_reranked_items([to_rerank[idx] for idx in missing], llm, **rerank_options)
+    to_store: Dict[str, Dict] = {}
+    try:
+        async for position, result in reranked:
+            idx = missing[position]
+            if result.get("matched_item"):
+                to_store[keys[idx]] = result
+                if len(to_store) >= CACHE_WRITE_BATCH:
+                    await asyncio.to_thread(cache.set_many, to_store)
+                    to_store = {}
+            yield idx, result
+    finally:
+        await reranked.aclose()
+        if to_store:
+            await asyncio.to_thread(cache.set_many, to_store)
+
+async def aiter_bom_items(
+    bom_df: pd.DataFrame,
+    db_df: pd.DataFrame,
+    vectorstore,
+    llm,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    cache: Optional[RerankCache] = None,
+    bypass_cache: bool = False,
+    footprint_index: Optional[FootprintIndex] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    lexical_fast_path: str = "retrieval",
+    gate: Optional[ConfidenceGate] = None
+) -> AsyncIterator[Tuple[int, Dict]]:
+    """
+    Match BOM items against the vectorstore and suggest sustainable alternatives, yielding each
+    processed item as soon as it is ready.
+
+    BOM rows whose product names match after normalization (case, whitespace) are processed once:
+    candidates are retrieved for every distinct item first with one batched vector search, then all
+    distinct items are re-ranked by the LLM concurrently (bounded by `max_concurrency`) in prompts of
+    `batch_size` items. Every row gets its own result, with totals from its own quantity and
+    unit price. When a `cache` is given, items whose re-rank result is cached skip the
+    LLM entirely; fresh matches are written back to the cache. Closing the iterator early cancels
+    the remaining LLM calls.
+
+    With a `lexical_index`, distinct items with a normalized exact or high-similarity fuzzy match
+    in the catalog take a fast path first. In "retrieval" mode they skip embedding and vector
+    search: the LLM re-ranks their lexical candidates and still picks alternatives. "match" mode
+    also skips the LLM for exact hits, which are reported as matched without alternatives; fuzzy
+    hits are treated as in "retrieval" mode, since near-identical names often differ in exactly
+    the detail that sets their footprints apart. "off" disables the fast path. The other items'
+    vector candidates are fused with BM25 and trigram candidates.
+
+    With a confidence `gate`, distinct items whose top vector candidate scores high enough, and far
+    enough above the runner-up, are reported as matched to it without LLM re-ranking, and so without
+    alternatives; only ambiguous items are escalated to the LLM.
 
     Args:
         bom_df (pd.DataFrame): BOM DataFrame with product names, quantities, and unit prices.
         db_df (pd.DataFrame): Database DataFrame with product names and carbon footprint values.
         vectorstore: Pre-built FAISS vector store.
         llm: Initialized LLM instance.
+        max_concurrency (int): Maximum number of concurrent LLM calls.
+        timeout (float): Seconds to wait for a single LLM call.
+        max_retries (int): Number of retries per LLM call.
+        backoff (float): Base delay in seconds for the retry backoff.
+        batch_size (int): Number of BOM items per LLM prompt.
+        cache (Optional[RerankCache]): Persistent re-rank result cache.
+        bypass_cache (bool): Skip cache reads (results are still written back).
+        footprint_index (Optional[FootprintIndex]): Prebuilt footprint lookup; built from `db_df` if omitted.
+        lexical_index (Optional[LexicalIndex]): Lexical index of the catalog product names.
+        lexical_fast_path (str): "match", "retrieval" or "off" (see above).
+        gate (Optional[ConfidenceGate]): Decides which items skip LLM re-ranking from their retrieval scores.
 
-    Returns:
-        Dict: A dictionary with:
-            - "items": List of processed item dictionaries.
-            - "totalCarbonFootprint": Sum of carbon footprints for matched items.
+    Yields:
+        Tuple[int, Dict]: (BOM row position, processed item dictionary) in completion order.
     """
-    items = []
-    total_cf = 0.0
+    # Index building and retrieval are CPU-bound; keep them off the event loop
+    if footprint_index is None:
+        footprint_index = await asyncio.to_thread(build_footprint_index, db_df)
 
+    rows = []
     for _, row in bom_df.iterrows():
-        bomItem = row["product_name"]
         quantity = row.get("quantity", 1)
         unit_price = row.get("unit_price", 0.0)
-        total_price = quantity * unit_price
+        rows.append((row["product_name"], quantity, unit_price, quantity * unit_price))
 
-        logger.info(f"Processing BOM item: {bomItem}")
+    # Rows repeating a product name are retrieved and re-ranked once, then fanned back out
+    unique_items, row_groups = _group_bom_items([row[0] for row in rows])
+    logger.info(f"Processing {len(rows)} BOM rows with {len(unique_items)} unique items")
 
-        try:
-            candidates = query_similar_items(vectorstore, bomItem)
-            llm_result = rerank_with_llm(bomItem, candidates, llm)
-            matched_item = llm_result.get("matched_item")
-            equivalent_items = llm_result.get("equivalent_items", [])
-
-            # Compute alternative items based on carbon footprint criteria
-            alternate_items = []
-            if matched_item and equivalent_items:
-                matched_cf = get_carbon_footprint(db_df, matched_item)
-                for alt in set(equivalent_items):
-                    if alt != matched_item:
-                        alt_cf = get_carbon_footprint(db_df, alt)
-                        if 0 < alt_cf < matched_cf:
-                            total_alt_cf = alt_cf * quantity
-                            alternate_items.append({
-                                "name": alt,
-                                "carbonFootprint": alt_cf,
-                                "totalAlternateCarbonFootprint": total_alt_cf
-                            })
-                alternate_items.sort(key=lambda x: x["carbonFootprint"])
-
-            matched_cf = get_carbon_footprint(db_df, matched_item) if matched_item else 0.0
-            total_matched_cf_units = matched_cf * quantity if matched_item else 0.0
-            total_cf += total_matched_cf_units
-
-            items.append({
-                "bomItem": bomItem,
-                "matchedItem": matched_item,
-                "matchedItemCarbonFootprint": matched_cf,
-                "totalMatchedItemCarbonFootprint": total_matched_cf_units,
-                "quantity": quantity,
-                "unitPrice": unit_price,
-                "totalPrice": total_price,
-                "alternativeItems": alternate_items
-            })
+    # Items matched without the LLM, and the candidates of the others
+    batch_candidates, direct_matches = await asyncio.to_thread(
+        _retrieve_all, vectorstore, unique_items, lexical_index, lexical_fast_path, gate
+    )
 
-        except Exception as e:
-            logger.error(f"Error processing BOM item '{bomItem}': {str(e)}", exc_info=True)
-            items.append({
-                "bomItem": bomItem,
-                "matchedItem": None,
-                "matchedItemCarbonFootprint": 0.0,
-                "totalMatchedItemCarbonFootprint": 0.0,
-                "quantity": quantity,
-                "unitPrice": unit_price,
-                "totalPrice": total_price,
-                "alternativeItems": []
-            })
+    for group, matched in direct_matches.items():
+        for position, item in _fan_out(rows, row_groups[group], {"matched_item": matched, "equivalent_items": []}, footprint_index):
+            yield position, item
+
+    rerank_groups = []
+    for group, candidates in enumerate(batch_candidates):
+        if group in direct_matches:
+            continue
+        if candidates is None:
+            for position in row_groups[group]:
+                BOM_ITEMS.labels("failed").inc()
+                yield position, _empty_item(*rows[position])
+        else:
+            rerank_groups.append(group)
+
+    to_rerank = [(unique_items[group], batch_candidates[group]) for group in rerank_groups]
+    reranked = _iter_rerank_with_cache(
+        to_rerank,
+        llm,
+        cache,
+        bypass_cache,
+        max_concurrency=max_concurrency,
+        timeout=timeout,
+        max_retries=max_retries,
+        backoff=backoff,
+        batch_size=batch_size
+    )
+    rerank_start = time.perf_counter()
+    try:
+        async for idx, llm_result in reranked:
+            for position, item in _fan_out(rows, row_groups[rerank_groups[idx]], llm_result, footprint_index):
+                yield position, item
+    finally:
+        # Cancel outstanding LLM calls when the consumer stops early
+        await reranked.aclose()
+        # Wall time of the whole re-rank stage, including time the consumer spent between items
+        record_stage("rerank", time.perf_counter() - rerank_start)
+
+async def aprocess_bom_items(bom_df: pd.DataFrame, db_df: pd.DataFrame, vectorstore, llm, **kwargs) -> Dict:
+    """
+    Process BOM items by matching them against the vectorstore and suggesting sustainable alternatives.
+
+    Args:
+        bom_df (pd.DataFrame): BOM DataFrame with product names, quantities, and unit prices.
+        db_df (pd.DataFrame): Database DataFrame with product names and carbon footprint values.
+        vectorstore: Pre-built FAISS vector store.
+        llm: Initialized LLM instance.
+        **kwargs: Concurrency, timeout, retry, batching, cache, footprint index, lexical and gate options forwarded to `aiter_bom_items`.
+
+    Returns:
+        Dict: A dictionary with:
+            - "items": List of processed item dictionaries, in BOM order.
+            - "totalCarbonFootprint": Sum of carbon footprints for matched items.
+    """
+    items: List[Optional[Dict]] = [None] * len(bom_df)
+    async for position, item in aiter_bom_items(bom_df, db_df, vectorstore, llm, **kwargs):
+        items[position] = item
 
     return {
         "items": items,
-        "totalCarbonFootprint": total_cf
+        "totalCarbonFootprint": sum((item["totalMatchedItemCarbonFootprint"] for item in items), 0.0)
     }
+
+def process_bom_items(bom_df: pd.DataFrame, db_df: pd.DataFrame, vectorstore, llm, **kwargs) -> Dict:
+    """
+    Synchronous wrapper around `aprocess_bom_items` for callers without a running event loop (e.g. CLI mode).
+
+    Args:
+        bom_df (pd.DataFrame): BOM DataFrame with product names, quantities, and unit prices.
+        db_df (pd.DataFrame): Database DataFrame with product names and carbon footprint values.
+        vectorstore: Pre-built FAISS vector store.
+        llm: Initialized LLM instance.
+        **kwargs: Concurrency, timeout, retry, batching, cache, footprint index, lexical and gate options forwarded to `aiter_bom_items`.
+
+    Returns:
+        Dict: The same structure as `aprocess_bom_items`.
+    """
+    return asyncio.run(aprocess_bom_items(bom_df, db_df, vectorstore, llm, **kwargs))
@@ -0,0 +1,161 @@
+from typing import Dict, List, Optional
+import faiss
+import logging
+import math
+import numpy as np
+import time
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+DEFAULT_INDEX_PARAMS = {
+    "index_type": "flat",
+    "nlist": None,
+    "pq_m": 48,
+    "pq_nbits": 8,
+    "hnsw_m": 32,
+    "ef_construction": 200,
+    "train_sample_size": 100_000
+}
+
+def resolve_index_params(index_params: Optional[Dict] = None) -> Dict:
+    """
+    Merge user supplied index build parameters over the defaults and validate the index type.
+
+    Args:
+        index_params (Optional[Dict]): Build parameters; missing keys take their default value.
+
+    Returns:
+        Dict: The complete set of build parameters.
+
+    Raises:
+        ValueError: If the index type is unknown.
+    """
+    params = dict(DEFAULT_INDEX_PARAMS)
+    params.update({key: value for key, value in (index_params or {}).items() if value is not None})
+    if params["index_type"] not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{params['index_type']}', expected one of {INDEX_TYPES}")
+    return params
+
+def _default_nlist(num_vectors: int) -> int:
+    """
+    Rule-of-thumb number of IVF cells (about 4 * sqrt(N)).
+    """
+    return max(1, min(num_vectors, int(4 * math.sqrt(num_vectors))))
+
+def build_faiss_index(vectors: np.ndarray, index_params: Optional[Dict] = None):
+    """
+    Build a FAISS index of the configured type over `vectors`.
+
+    IVF indexes are trained on a random sample of at most `train_sample_size` vectors before all
+    vectors are added. Supported types are "flat" (exact), "ivf_flat", "ivf_pq" and "hnsw".
+
+    Args:
+        vectors (np.ndarray): (N, dim) float32 matrix.
+        index_params (Optional[Dict]): Build parameters, see `DEFAULT_INDEX_PARAMS`.
+
+    Returns:
+        faiss.Index: The populated index.
+    """
+    params = resolve_index_params(index_params)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dim = vectors.shape
+    index_type = params["index_type"]
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["hnsw_m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+    else:
+        nlist = params["nlist"] or _default_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            if dim % params["pq_m"] != 0:
+                raise ValueError(f"pq_m={params['pq_m']} must divide the embedding dimension {dim}")
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, params["pq_m"], params["pq_nbits"])
+        sample_size = min(num_vectors, params["train_sample_size"])
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(num_vectors, size=sample_size, replace=False)]
+        start = time.perf_counter()
+        index.train(sample)
+        logger.info(f"Trained {index_type} index with nlist={nlist} on {sample_size} vectors in {time.perf_counter() - start:.2f}s")
+
+    index.add(vectors)
+    logger.info(f"Built {index_type} FAISS index over {num_vectors} vectors")
+    return index
+
+def configure_search(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """
+    Apply query-time parameters to an index: `nprobe` for IVF indexes, `efSearch` for HNSW.
+    Parameters that do not apply to the index type are ignored.
+
+    Args:
+        index (faiss.Index): The index to configure.
+        nprobe (Optional[int]): Number of IVF cells visited per query.
+        ef_search (Optional[int]): HNSW search queue size.
+    """
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+def evaluate_index_configs(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    configs: List[Dict],
+    top_k: int = 5
+) -> List[Dict]:
+    """
+    Measure recall and latency of candidate index configurations against the exact flat baseline.
+
+    Each config holds build parameters (see `DEFAULT_INDEX_PARAMS`) plus optional `nprobe` and
+    `ef_search` query parameters. Recall@k is the fraction of the exact top-k neighbours retrieved.
+
+    Args:
+        vectors (np.ndarray): (N, dim) catalog embeddings.
+        queries (np.ndarray): (Q, dim) query embeddings.
+        configs (List[Dict]): Index configurations to evaluate.
+        top_k (int): Number of neighbours retrieved per query.
+
+    Returns:
+        List[Dict]: One report row per config, starting with the flat baseline.
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    baseline = build_faiss_index(vectors, {"index_type": "flat"})
+    _, expected = baseline.search(queries, top_k)
+
+    report = []
+    for config in [{"index_type": "flat"}] + list(configs):
+        build_params = {key: value for key, value in config.items() if key not in ("nprobe", "ef_search")}
+        start = time.perf_counter()
+        index = build_faiss_index(vectors, build_params)
+        build_seconds = time.perf_counter() - start
+        configure_search(index, config.get("nprobe"), config.get("ef_search"))
+
+        latencies = []
+        found = np.empty_like(expected)
+        for i in range(len(queries)):
+            start = time.perf_counter()
+            _, found[i:i + 1] = index.search(queries[i:i + 1], top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        hits = sum(len(set(found[i]) & set(expected[i])) for i in range(len(queries)))
+        report.append({
+            "config": config,
+            "recallAtK": hits / (len(queries) * top_k) if len(queries) else 0.0,
+            "meanLatencyMs": float(np.mean(latencies)) if latencies else 0.0,
+            "p95LatencyMs": float(np.percentile(latencies, 95)) if latencies else 0.0,
+            "buildSeconds": build_seconds
+        })
+        logger.info(
+            f"{config}: recall@{top_k}={report[-1]['recallAtK']:.4f} "
+            f"mean={report[-1]['meanLatencyMs']:.3f}ms p95={report[-1]['p95LatencyMs']:.3f}ms"
+        )
+    return report
@@ -0,0 +1,425 @@
+from .vectorstore_utils import vectorstore_from_index, DEFAULT_EMBEDDING_MODEL
+from .ann_utils import build_faiss_index, configure_search, resolve_index_params
+from .embedding_utils import create_embeddings
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from collections import defaultdict, deque
+from typing import Dict, Optional, Tuple
+import faiss
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+import pandas as pd
+import time
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+EMBEDDINGS_FILE = "embeddings.npy"
+ID_TO_ROW_FILE = "id_to_row.npy"
+PRODUCT_NAMES_FILE = "product_names.json"
+MANIFEST_FILE = "manifest.json"
+
+def compute_catalog_hash(csv_path: str, embedding_model_name: str = DEFAULT_EMBEDDING_MODEL) -> str:
+    """
+    Hash the LCA master data CSV contents together with the embedding model name.
+
+    Args:
+        csv_path (str): Path to the Database CSV file.
+        embedding_model_name (str): HuggingFace embedding model name.
+
+    Returns:
+        str: A SHA-256 hex digest identifying the artifact contents.
+    """
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(embedding_model_name.encode("utf-8"))
+    return digest.hexdigest()
+
+def artifact_version(artifact_dir: str) -> Optional[int]:
+    """
+    Modification time (ns) of the artifact manifest, which is written last by every build and
+    update, or None if there is no artifact. Processes sharing the artifact compare it to notice
+    updates made by another process.
+    """
+    try:
+        return os.stat(os.path.join(artifact_dir, MANIFEST_FILE)).st_mtime_ns
+    except OSError:
+        return None
+
+def _atomic_write(path: str, write_fn) -> None:
+    """
+    Write a file through a temporary sibling and rename it into place, so readers never see partial files.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write_fn(tmp_path)
+    os.replace(tmp_path, path)
+
+def _save_npy(path: str, array: np.ndarray) -> None:
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+def _write_json(path: str, data: Dict) -> None:
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+def _read_manifest(artifact_dir: str) -> Optional[Dict]:
+    """
+    Read the artifact manifest, or return None if it is missing or unreadable.
+    """
+    try:
+        with open(os.path.join(artifact_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def build_vectorstore_artifact(
+    db_df: pd.DataFrame,
+    artifact_dir: str,
+    catalog_hash: str,
+    embeddings: Embeddings,
+    embedding_model_name: str = DEFAULT_EMBEDDING_MODEL,
+    index_params: Optional[Dict] = None
+) -> None:
+    """
+    Embed the catalog and write the FAISS index, embeddings and id->row mapping to disk.
+
+    The manifest is written last, so a partially written artifact is never considered valid.
+
+    Args:
+        db_df (pd.DataFrame): Database DataFrame with product names.
+        artifact_dir (str): Directory the artifact is written to.
+        catalog_hash (str): Value of `compute_catalog_hash` for the source CSV.
+        embeddings (Embeddings): Embedding model.
+        embedding_model_name (str): Embedding model id recorded in the manifest.
+        index_params (Optional[Dict]): FAISS index build parameters (see `ann_utils.DEFAULT_INDEX_PARAMS`).
+    """
+    index_params = resolve_index_params(index_params)
+    start = time.perf_counter()
+    texts = db_df["product_name"].tolist()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    id_to_row = np.arange(len(texts), dtype=np.int64)
+
+    index = build_faiss_index(vectors, index_params)
+
+    _write_artifact(artifact_dir, index, vectors, id_to_row, texts, catalog_hash, embedding_model_name, index_params)
+    logger.info(f"Vector store artifact with {len(texts)} items written to '{artifact_dir}' in {time.perf_counter() - start:.2f}s")
+
+def _write_artifact(
+    artifact_dir: str,
+    index,
+    vectors: np.ndarray,
+    id_to_row: np.ndarray,
+    texts,
+    catalog_hash: str,
+    embedding_model_name: str,
+    index_params: Dict
+) -> None:
+    """
+    Write every artifact file; the manifest goes last, so a partially written artifact is never considered valid.
+    `texts` are the product names in index order, used to diff the next catalog version.
+    """
+    os.makedirs(artifact_dir, exist_ok=True)
+    _atomic_write(os.path.join(artifact_dir, INDEX_FILE), lambda path: faiss.write_index(index, path))
+    _atomic_write(os.path.join(artifact_dir, EMBEDDINGS_FILE), lambda path: _save_npy(path, vectors))
+    _atomic_write(os.path.join(artifact_dir, ID_TO_ROW_FILE), lambda path: _save_npy(path, id_to_row))
+    _atomic_write(os.path.join(artifact_dir, PRODUCT_NAMES_FILE), lambda path: _write_json(path, list(texts)))
+    manifest = {
+        "catalog_hash": catalog_hash,
+        "embedding_model": embedding_model_name,
+        "index_params": index_params,
+        "count": len(id_to_row),
+        "dimension": int(vectors.shape[1]),
+        "created_at": time.time()
+    }
+    _atomic_write(
+        os.path.join(artifact_dir, MANIFEST_FILE),
+        lambda path: _write_json(path, manifest)
+    )
+
+def update_vectorstore_artifact(
+    db_df: pd.DataFrame,
+    artifact_dir: str,
+    catalog_hash: str,
+    embeddings: Embeddings,
+    embedding_model_name: str = DEFAULT_EMBEDDING_MODEL,
+    index_params: Optional[Dict] = None
+) -> Optional[Dict]:
+    """
+    Bring an existing artifact up to date with a changed catalog, embedding only new product names.
+
+    Rows of the new catalog are paired with the stored vectors by product name (duplicated names
+    pair up in order). Vectors of removed rows are dropped, vectors of added rows are reused when the
+    name is already indexed and embedded otherwise. A flat index is updated in place with
+    `remove_ids`/`add`; IVF indexes keep their trained quantizer and are refilled; HNSW, which cannot
+    delete vectors, is rebuilt from the stored vectors.
+
+    Args:
+        db_df (pd.DataFrame): The new Database DataFrame.
+        artifact_dir (str): Artifact directory.
+        catalog_hash (str): Value of `compute_catalog_hash` for the new CSV.
+        embeddings (Embeddings): Embedding model.
+        embedding_model_name (str): Embedding model id; must match the artifact's.
+        index_params (Optional[Dict]): FAISS index build parameters; must match the artifact's.
+
+    Returns:
+        Optional[Dict]: Counts of added, removed and embedded rows, or None if the artifact cannot be
+        updated incrementally (missing, built with another model or index parameters, or without
+        stored product names) and must be rebuilt.
+    """
+    index_params = resolve_index_params(index_params)
+    manifest = _read_manifest(artifact_dir)
+    if manifest is None or manifest.get("embedding_model") != embedding_model_name or manifest.get("index_params") != index_params:
+        return None
+    try:
+        with open(os.path.join(artifact_dir, PRODUCT_NAMES_FILE)) as f:
+            old_names = json.load(f)
+        old_vectors = np.load(os.path.join(artifact_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        # Regular read: the index is modified, so it must not be memory-mapped read-only
+        index = faiss.read_index(os.path.join(artifact_dir, INDEX_FILE))
+    except Exception as e:
+        logger.info(f"Vector store artifact in '{artifact_dir}' cannot be updated incrementally: {str(e)}")
+        return None
+    if index.ntotal != len(old_names) or len(old_vectors) != len(old_names):
+        return None
+
+    start = time.perf_counter()
+    new_names = db_df["product_name"].tolist()
+    old_positions = defaultdict(deque)
+    first_position = {}
+    for position, name in enumerate(old_names):
+        old_positions[name].append(position)
+        first_position.setdefault(name, position)
+
+    kept, added_rows = [], []
+    for row, name in enumerate(new_names):
+        if old_positions.get(name):
+            kept.append((old_positions[name].popleft(), row))
+        else:
+            added_rows.append(row)
+    removed_positions = sorted(position for positions in old_positions.values() for position in positions)
+    # Kept vectors stay in index order, added ones are appended
+    kept.sort()
+
+    added_names = [new_names[row] for row in added_rows]
+    to_embed = list(dict.fromkeys(name for name in added_names if name not in first_position))
+    embedded = {}
+    if to_embed:
+        embedded = dict(zip(to_embed, np.asarray(embeddings.embed_documents(to_embed), dtype=np.float32)))
+    dimension = old_vectors.shape[1]
+    added_vectors = np.asarray(
+        [embedded[name] if name in embedded else old_vectors[first_position[name]] for name in added_names],
+        dtype=np.float32
+    ).reshape(-1, dimension)
+    vectors = np.concatenate([np.asarray(old_vectors[[position for position, _ in kept]], dtype=np.float32), added_vectors])
+    id_to_row = np.asarray([row for _, row in kept] + added_rows, dtype=np.int64)
+
+    if isinstance(index, faiss.IndexFlat):
+        if removed_positions:
+            index.remove_ids(np.asarray(removed_positions, dtype=np.int64))
+        index.add(added_vectors)
+        index_update = "in_place"
+    elif index_params["index_type"] in ("ivf_flat", "ivf_pq"):
+        index.reset()
+        index.add(vectors)
+        index_update = "refilled"
+    else:
+        index = build_faiss_index(vectors, index_params)
+        index_update = "rebuilt"
+
+    texts = [new_names[row] for row in id_to_row]
+    _write_artifact(artifact_dir, index, vectors, id_to_row, texts, catalog_hash, embedding_model_name, index_params)
+    summary = {
+        "added": len(added_rows),
+        "removed": len(removed_positions),
+        "embedded": len(to_embed),
+        "count": len(id_to_row),
+        "indexUpdate": index_update,
+        "seconds": time.perf_counter() - start
+    }
+    logger.info(f"Vector store artifact in '{artifact_dir}' updated incrementally: {summary}")
+    return summary
+
+def _resident_memory_mb() -> Optional[float]:
+    """
+    Resident set size of this process in MB, or None where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _read_index(path: str):
+    """
+    Read a FAISS index, memory-mapping what the installed faiss supports, and log the resident memory it added.
+
+    `IO_FLAG_MMAP` only maps the inverted lists of IVF indexes, so their vectors are shared by the
+    workers on one host through the page cache. Flat and HNSW indexes are copied into every
+    worker's memory, unless faiss provides `IO_FLAG_MMAP_IFC` (flat codes mapped from the file).
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    rss_before = _resident_memory_mb()
+    try:
+        index = faiss.read_index(path, flags)
+    except Exception as e:
+        logger.warning(f"Memory-mapped read of '{path}' failed, loading it into memory: {str(e)}")
+        index = faiss.read_index(path)
+    rss_after = _resident_memory_mb()
+    if rss_before is not None and rss_after is not None:
+        logger.info(f"FAISS index '{path}' ({type(index).__name__}) loaded, RSS +{rss_after - rss_before:.1f} MB in this worker")
+    return index
+
+def load_vectorstore_artifact(
+    db_df: pd.DataFrame,
+    artifact_dir: str,
+    catalog_hash: str,
+    embeddings: Embeddings,
+    index_params: Optional[Dict] = None
+) -> Optional[FAISS]:
+    """
+    Load a previously built artifact if it matches the current catalog hash and index build parameters.
+
+    Args:
+        db_df (pd.DataFrame): Database DataFrame the artifact was built from.
+        artifact_dir (str): Artifact directory.
+        catalog_hash (str): Expected value of `compute_catalog_hash`.
+        embeddings (Embeddings): Embedding model used to encode queries.
+        index_params (Optional[Dict]): Expected FAISS index build parameters.
+
+    Returns:
+        Optional[FAISS]: The vector store, or None if the artifact is missing or stale.
+    """
+    manifest = _read_manifest(artifact_dir)
+    if manifest is None or manifest.get("catalog_hash") != catalog_hash:
+        return None
+    if manifest.get("index_params") != resolve_index_params(index_params):
+        logger.info(f"Vector store artifact in '{artifact_dir}' was built with different index parameters")
+        return None
+    try:
+        index = _read_index(os.path.join(artifact_dir, INDEX_FILE))
+        id_to_row = np.load(os.path.join(artifact_dir, ID_TO_ROW_FILE), mmap_mode="r")
+    except Exception as e:
+        logger.warning(f"Could not load vector store artifact from '{artifact_dir}': {str(e)}")
+        return None
+    if index.ntotal != len(id_to_row):
+        logger.warning(f"Vector store artifact in '{artifact_dir}' is inconsistent, ignoring it")
+        return None
+
+    product_names = db_df["product_name"].tolist()
+    if len(id_to_row) and int(np.max(id_to_row)) >= len(product_names):
+        logger.warning(f"Vector store artifact in '{artifact_dir}' does not match the catalog, ignoring it")
+        return None
+    texts = [product_names[row] for row in id_to_row]
+    logger.info(f"Vector store loaded from artifact '{artifact_dir}' with {len(texts)} items")
+    return vectorstore_from_index(texts, index, embeddings)
+
+def load_embeddings_artifact(artifact_dir: str) -> np.ndarray:
+    """
+    Memory-map the catalog embeddings stored alongside the index.
+
+    Args:
+        artifact_dir (str): Artifact directory.
+
+    Returns:
+        np.ndarray: Read-only (N, dim) float32 array.
+    """
+    return np.load(os.path.join(artifact_dir, EMBEDDINGS_FILE), mmap_mode="r")
+
+def sync_vectorstore_artifact(
+    db_df: pd.DataFrame,
+    csv_path: str,
+    artifact_dir: str,
+    embeddings: Embeddings,
+    force_rebuild: bool = False,
+    index_params: Optional[Dict] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    read_only: bool = False
+) -> Tuple[Optional[FAISS], Dict]:
+    """
+    Load the vector store for `db_df`, updating its artifact incrementally when the catalog CSV
+    changed and rebuilding it only when that is not possible.
+
+    Args:
+        db_df (pd.DataFrame): Database DataFrame with product names.
+        csv_path (str): Path to the Database CSV file `db_df` was loaded from.
+        artifact_dir (str): Artifact directory.
+        embeddings (Embeddings): Embedding model (a `CachedEmbeddings`, whose `model_id` tags the artifact).
+        force_rebuild (bool): Rebuild the artifact even if it is up to date.
+        index_params (Optional[Dict]): FAISS index build parameters (see `ann_utils.DEFAULT_INDEX_PARAMS`).
+        nprobe (Optional[int]): IVF cells visited per query.
+        ef_search (Optional[int]): HNSW search queue size.
+        read_only (bool): Only load the artifact, for processes following updates made by another
+            process; returns (None, {"action": "stale"}) if it does not match the catalog yet.
+
+    Returns:
+        Tuple[Optional[FAISS], Dict]: The vector store and what was done ("loaded", "updated",
+        "built" or, read-only, "stale").
+    """
+    model_id = getattr(embeddings, "model_id", DEFAULT_EMBEDDING_MODEL)
+    catalog_hash = compute_catalog_hash(csv_path, model_id)
+
+    summary = {"action": "loaded"}
+    vectorstore = None
+    if not force_rebuild:
+        vectorstore = load_vectorstore_artifact(db_df, artifact_dir, catalog_hash, embeddings, index_params)
+        if vectorstore is None and read_only:
+            return None, {"action": "stale"}
+        if vectorstore is None:
+            update = update_vectorstore_artifact(db_df, artifact_dir, catalog_hash, embeddings, model_id, index_params)
+            if update is not None:
+                summary = {"action": "updated", **update}
+                vectorstore = load_vectorstore_artifact(db_df, artifact_dir, catalog_hash, embeddings, index_params)
+
+    if vectorstore is None:
+        logger.info(f"Building vector store artifact in '{artifact_dir}'")
+        build_vectorstore_artifact(db_df, artifact_dir, catalog_hash, embeddings, model_id, index_params)
+        summary = {"action": "built", "count": len(db_df)}
+        vectorstore = load_vectorstore_artifact(db_df, artifact_dir, catalog_hash, embeddings, index_params)
+        if vectorstore is None:
+            raise RuntimeError(f"Vector store artifact in '{artifact_dir}' could not be loaded after building it")
+
+    configure_search(vectorstore.index, nprobe=nprobe, ef_search=ef_search)
+    return vectorstore, summary
+
+def load_or_build_vectorstore(
+    db_df: pd.DataFrame,
+    csv_path: str,
+    artifact_dir: str,
+    embedding_model_name: str = DEFAULT_EMBEDDING_MODEL,
+    force_rebuild: bool = False,
+    index_params: Optional[Dict] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    embedding_options: Optional[Dict] = None
+) -> Tuple[FAISS, Embeddings]:
+    """
+    Create the embedding model and load the vector store from its on-disk artifact, updating the
+    artifact when the catalog CSV changed and rebuilding it when the embedding model or the index
+    build parameters changed.
+
+    Args:
+        db_df (pd.DataFrame): Database DataFrame with product names.
+        csv_path (str): Path to the Database CSV file `db_df` was loaded from.
+        artifact_dir (str): Artifact directory.
+        embedding_model_name (str): HuggingFace embedding model name.
+        force_rebuild (bool): Rebuild the artifact even if it is up to date.
+        index_params (Optional[Dict]): FAISS index build parameters (see `ann_utils.DEFAULT_INDEX_PARAMS`).
+        nprobe (Optional[int]): IVF cells visited per query.
+        ef_search (Optional[int]): HNSW search queue size.
+        embedding_options (Optional[Dict]): Keyword arguments of `embedding_utils.create_embeddings`
+            (backend, ONNX file, batch size, threads, cache path).
+
+    Returns:
+        Tuple[FAISS, Embeddings]: The vector store and embedding model.
+    """
+    embeddings = create_embeddings(embedding_model_name, **(embedding_options or {}))
+    vectorstore, _ = sync_vectorstore_artifact(
+        db_df, csv_path, artifact_dir, embeddings, force_rebuild, index_params, nprobe, ef_search
+    )
+    return vectorstore, embeddings
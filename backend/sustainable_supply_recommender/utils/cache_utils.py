@@ -0,0 +1,201 @@
+from .text_utils import normalize_text
+from typing import Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 100_000
+# Seconds between commits of buffered last-access updates; losing them only makes eviction less precise
+DEFAULT_TOUCH_FLUSH_INTERVAL = 30.0
+# Keys per SELECT, below SQLite's bound parameter limit
+_LOOKUP_CHUNK = 500
+
+class RerankCache:
+    """
+    Persistent SQLite cache for LLM re-rank results.
+
+    Entries are keyed on the normalized BOM item text, the candidate set, the model name and the
+    prompt version, expire after `ttl_seconds` and are evicted least-recently-used once the cache
+    holds more than `max_entries` rows.
+
+    Lookups and writes take whole batches (`get_many`, `set_many`) so each costs one transaction;
+    the last-access updates of hits are buffered and committed at most every
+    `touch_flush_interval` seconds or with the next write. The methods block on SQLite, so
+    call them from a worker thread when running on an event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        touch_flush_interval: float = DEFAULT_TOUCH_FLUSH_INTERVAL
+    ):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path (str): SQLite database file path.
+            ttl_seconds (float): Time-to-live of an entry in seconds.
+            max_entries (int): Maximum number of entries kept on disk.
+            touch_flush_interval (float): Maximum seconds last-access updates stay buffered.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.touch_flush_interval = touch_flush_interval
+        self._pending_touches: Dict[str, float] = {}
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rerank_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_rerank_cache_last_access ON rerank_cache (last_access)")
+        self._conn.commit()
+        logger.info(f"Re-rank cache opened at '{path}'")
+
+    @staticmethod
+    def make_key(bom_item: str, candidates: List[str], model_name: str, prompt_version: str) -> str:
+        """
+        Build the cache key for a BOM item and its candidate set.
+
+        Args:
+            bom_item (str): BOM item text.
+            candidates (List[str]): Candidate product names (order does not matter).
+            model_name (str): Name of the LLM used for re-ranking.
+            prompt_version (str): Version of the re-rank prompt.
+
+        Returns:
+            str: A SHA-256 hex digest.
+        """
+        payload = json.dumps({
+            "bom_item": normalize_text(bom_item),
+            "candidates": sorted(candidates),
+            "model": model_name,
+            "prompt_version": prompt_version
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _flush_touches(self) -> None:
+        # Caller holds the lock and commits
+        if self._pending_touches:
+            self._conn.executemany(
+                "UPDATE rerank_cache SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in self._pending_touches.items()]
+            )
+            self._pending_touches.clear()
+        self._last_flush = time.time()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict]:
+        """
+        Return the cached results of `keys` that are present and not expired, by key.
+        """
+        now = time.time()
+        rows = []
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                rows.extend(self._conn.execute(
+                    f"SELECT key, value, created_at FROM rerank_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+            found = {key: value for key, value, created_at in rows if now - created_at <= self.ttl_seconds}
+            expired = [(key,) for key, _, created_at in rows if now - created_at > self.ttl_seconds]
+            for key in found:
+                self._pending_touches[key] = now
+            if expired:
+                self._conn.executemany("DELETE FROM rerank_cache WHERE key = ?", expired)
+            if expired or now - self._last_flush >= self.touch_flush_interval:
+                self._flush_touches()
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return {key: json.loads(value) for key, value in found.items()}
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Return the cached result for `key`, or None on a miss or an expired entry.
+        """
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: Dict[str, Dict]) -> None:
+        """
+        Store results in one transaction and evict the least recently used entries beyond `max_entries`.
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rerank_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value), now, now) for key, value in items.items()]
+            )
+            for key in items:
+                self._pending_touches.pop(key, None)
+            self._flush_touches()
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM rerank_cache").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM rerank_cache WHERE key IN "
+                    "(SELECT key FROM rerank_cache ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def set(self, key: str, value: Dict) -> None:
+        """
+        Store a result and evict the least recently used entries beyond `max_entries`.
+        """
+        self.set_many({key: value})
+
+    def invalidate(self, key: str) -> None:
+        """
+        Remove a single entry from the cache.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM rerank_cache WHERE key = ?", (key,))
+            self._conn.commit()
+            self._pending_touches.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove every entry from the cache and reset the hit/miss counters.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM rerank_cache")
+            self._conn.commit()
+            self._pending_touches.clear()
+            self.hits = 0
+            self.misses = 0
+        logger.info("Re-rank cache cleared")
+
+    def stats(self) -> Dict:
+        """
+        Return hit/miss counters and the number of stored entries.
+        """
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM rerank_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl_seconds
+        }
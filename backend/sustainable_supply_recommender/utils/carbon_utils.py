@@ -1,15 +1,121 @@
-import pandas as pd
+from typing import Dict, Iterable, List, Optional
 import logging
+import numpy as np
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
 # Ensure this constant remains consistent with data_loader.py
 CARBON_FOOTPRINT_COLUMN = "Global warming potential per functional unit"
 
+class FootprintIndex:
+    """
+    Precomputed product name -> impact lookup built once from the Database DataFrame.
+
+    Carbon footprints and every numeric impact column of the LCA master data are stored in arrays
+    addressed through a dict of product names, so lookups avoid scanning the DataFrame. For
+    duplicated product names the first row wins, matching `get_carbon_footprint`.
+    """
+
+    def __init__(self, db_df: pd.DataFrame):
+        """
+        Build the index.
+
+        Args:
+            db_df (pd.DataFrame): Database DataFrame with product names and impact columns.
+        """
+        self._positions: Dict[str, int] = {}
+        for position, name in enumerate(db_df["product_name"].tolist()):
+            self._positions.setdefault(name, position)
+
+        footprints = pd.to_numeric(db_df[CARBON_FOOTPRINT_COLUMN], errors="coerce").fillna(0.0)
+        self._footprints = footprints.to_numpy(dtype=float)
+
+        # Impact columns are the numeric ones; unit, text and metadata columns coerce to all-NaN
+        numeric_df = db_df.drop(columns=["product_name"]).apply(pd.to_numeric, errors="coerce")
+        impact_columns = [
+            column for column in numeric_df.columns
+            if not str(column).startswith("Unit for") and numeric_df[column].notna().any()
+        ]
+        # Column headers in the master data contain line breaks; expose them on a single line
+        self.impact_columns: List[str] = [" ".join(str(column).split()) for column in impact_columns]
+        self._impacts = numeric_df[impact_columns].to_numpy(dtype=float)
+        logger.info(f"Footprint index built with {len(self._positions)} products and {len(self.impact_columns)} impact columns")
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, product_name: str) -> bool:
+        return product_name in self._positions
+
+    def get_carbon_footprint(self, product_name: str) -> float:
+        """
+        Look up the carbon footprint for a product.
+
+        Args:
+            product_name (str): Product name to look up.
+
+        Returns:
+            float: Carbon footprint value; 0.0 if not found or invalid.
+        """
+        if not product_name:
+            return 0.0
+        position = self._positions.get(product_name)
+        if position is None:
+            logger.warning(f"Product '{product_name}' not found in database")
+            return 0.0
+        return float(self._footprints[position])
+
+    def get_carbon_footprints(self, product_names: Iterable[str]) -> List[float]:
+        """
+        Look up carbon footprints for many products at once.
+
+        Args:
+            product_names (Iterable[str]): Product names to look up.
+
+        Returns:
+            List[float]: Carbon footprint per name, in input order; 0.0 for unknown names.
+        """
+        return [self.get_carbon_footprint(name) for name in product_names]
+
+    def get_impacts(self, product_name: str) -> Optional[Dict[str, Optional[float]]]:
+        """
+        Return every numeric impact value recorded for a product.
+
+        Args:
+            product_name (str): Product name to look up.
+
+        Returns:
+            Optional[Dict[str, Optional[float]]]: Impact column -> value (None where not reported),
+            or None if the product is unknown.
+        """
+        position = self._positions.get(product_name)
+        if position is None:
+            return None
+        values = self._impacts[position]
+        return {
+            column: (None if np.isnan(value) else float(value))
+            for column, value in zip(self.impact_columns, values)
+        }
+
+def build_footprint_index(db_df: pd.DataFrame) -> FootprintIndex:
+    """
+    Build a `FootprintIndex` from the Database DataFrame.
+
+    Args:
+        db_df (pd.DataFrame): Database DataFrame.
+
+    Returns:
+        FootprintIndex: The lookup index.
+    """
+    return FootprintIndex(db_df)
+
 def get_carbon_footprint(db_df: pd.DataFrame, product_name: str) -> float:
     """
     Retrieve the carbon footprint for a given product from the Database DataFrame.
 
+    This scans the DataFrame; prefer `FootprintIndex.get_carbon_footprint` on hot paths.
+
     Args:
         db_df (pd.DataFrame): Database DataFrame.
         product_name (str): Product name to look up.
@@ -0,0 +1,244 @@
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+from typing import Dict, List, Optional
+import hashlib
+import logging
+import numpy as np
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+DEFAULT_ENCODE_BATCH_SIZE = 32
+DEFAULT_MEMORY_ENTRIES = 10_000
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed SQLite cache of text embeddings.
+
+    Keys hash the exact text together with the embedding model id, so vectors never need to expire:
+    a different model or backend simply produces different keys.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path (str): SQLite database file path.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embedding_cache (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+        logger.info(f"Embedding cache opened at '{path}'")
+
+    @staticmethod
+    def make_key(text: str, model_id: str) -> str:
+        """
+        Build the cache key of a text for an embedding model.
+        """
+        return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Return the cached vectors of the keys that are present.
+        """
+        found = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, np.ndarray]) -> None:
+        """
+        Store vectors by key.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """
+        Remove every entry from the cache and reset the hit/miss counters.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM embedding_cache")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+        logger.info("Embedding cache cleared")
+
+    def stats(self) -> Dict:
+        """
+        Return hit/miss counters and the number of stored vectors.
+        """
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain embeddings that only encode texts not seen before.
+
+    Lookups go through a small in-process LRU, then the persistent `EmbeddingCache`; the remaining
+    texts are encoded by the wrapped model in a single batched call and written back to both.
+    """
+
+    def __init__(
+        self,
+        encoder: Embeddings,
+        model_id: str,
+        cache: Optional[EmbeddingCache] = None,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES
+    ):
+        """
+        Args:
+            encoder (Embeddings): The embedding model.
+            model_id (str): Identifies the model and backend, part of every cache key.
+            cache (Optional[EmbeddingCache]): Persistent cache; in-process only if None.
+            memory_entries (int): Size of the in-process LRU.
+        """
+        self.encoder = encoder
+        self.model_id = model_id
+        self.cache = cache
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(text, self.model_id) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    vectors[key] = self._memory[key]
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing and self.cache is not None:
+            vectors.update(self.cache.get_many(missing))
+            missing = [key for key in missing if key not in vectors]
+
+        if missing:
+            missing_set = set(missing)
+            to_encode = {}
+            for key, text in zip(keys, texts):
+                if key in missing_set and key not in to_encode:
+                    to_encode[key] = text
+            encoded = self.encoder.embed_documents(list(to_encode.values()))
+            fresh = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(to_encode, encoded)}
+            vectors.update(fresh)
+            if self.cache is not None:
+                self.cache.set_many(fresh)
+            logger.info(f"Encoded {len(fresh)} of {len(texts)} texts, the rest came from the embedding cache")
+
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                self._remember(key, vectors[key])
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+def configure_torch_threads(threads: Optional[int]) -> None:
+    """
+    Set the intra-op CPU thread count of torch, which the torch embedding backend runs on.
+
+    The setting is process-wide: it also applies to every other torch model of the process, such as
+    the waste classifier when both apps run in `server.py`. Call it once at startup; nothing is
+    changed when `threads` is None.
+    """
+    if not threads:
+        return
+    import torch
+
+    torch.set_num_threads(threads)
+    logger.info(f"torch intra-op threads set to {threads} for the whole process")
+
+def create_embeddings(
+    model_name: str,
+    backend: str = "torch",
+    onnx_file: Optional[str] = None,
+    batch_size: int = DEFAULT_ENCODE_BATCH_SIZE,
+    threads: Optional[int] = None,
+    cache_path: Optional[str] = None
+) -> CachedEmbeddings:
+    """
+    Create the sentence-transformers embedding model behind a content-addressed embedding cache.
+
+    Args:
+        model_name (str): HuggingFace embedding model name.
+        backend (str): "torch", or "onnx" to run the model with ONNX Runtime on the CPU.
+        onnx_file (Optional[str]): ONNX file inside the model repository, e.g. a quantized
+            "onnx/model_qint8_avx512_vnni.onnx"; the default fp32 export if None.
+        batch_size (int): Encoder batch size.
+        threads (Optional[int]): Intra-op CPU threads of the ONNX Runtime session. The torch backend
+            uses the process-wide torch setting instead (see `configure_torch_threads`).
+        cache_path (Optional[str]): SQLite file of the persistent cache; in-process only if None.
+
+    Returns:
+        CachedEmbeddings: The cached embedding model.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBEDDING_BACKENDS}")
+
+    model_kwargs = {"device": "cpu"} if backend == "onnx" else {}
+    if backend == "onnx":
+        onnx_kwargs = {"provider": "CPUExecutionProvider"}
+        if onnx_file:
+            onnx_kwargs["file_name"] = onnx_file
+        if threads:
+            import onnxruntime as ort
+
+            session_options = ort.SessionOptions()
+            session_options.intra_op_num_threads = threads
+            onnx_kwargs["session_options"] = session_options
+        model_kwargs.update({"backend": "onnx", "model_kwargs": onnx_kwargs})
+
+    encoder = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={"batch_size": batch_size}
+    )
+    # Quantized or ONNX vectors differ slightly from the torch ones, so they get their own keys
+    model_id = model_name if backend == "torch" else f"{model_name}|{backend}|{onnx_file or 'model.onnx'}"
+    cache = EmbeddingCache(cache_path) if cache_path else None
+    logger.info(f"Embedding model '{model_id}' ready (batch size {batch_size}, cache {'on' if cache else 'off'})")
+    return CachedEmbeddings(encoder, model_id, cache)
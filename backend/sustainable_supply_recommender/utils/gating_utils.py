@@ -0,0 +1,154 @@
+from .metrics_utils import RETRIEVAL_GATE_DECISIONS
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import numpy as np
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_MARGIN = 0.05
+# Grids searched by `calibrate_gate`; scores are cosine similarities of unit-length embeddings
+DEFAULT_SCORE_GRID = tuple(round(0.5 + 0.01 * i, 2) for i in range(50))
+DEFAULT_MARGIN_GRID = tuple(round(0.01 * i, 2) for i in range(31))
+DEFAULT_TARGET_ACCURACY = 0.95
+
+def _top_and_margin(scored_candidates: Sequence[Tuple[str, float]]) -> Tuple[float, float]:
+    """
+    Score of the top candidate and its margin over the runner-up (the full score without one).
+
+    The runner-up is the best candidate with a different product name, so catalog rows repeating
+    the top product's name (and vector) do not make it look ambiguous.
+    """
+    top_name, top = scored_candidates[0]
+    runner_up = next((score for name, score in scored_candidates[1:] if name != top_name), 0.0)
+    return top, top - runner_up
+
+class ConfidenceGate:
+    """
+    Decides from the retrieval scores alone whether a BOM item's top vector candidate is its match.
+
+    An item is accepted when the top candidate's similarity is at least `min_score` and beats the
+    runner-up by at least `min_margin`; accepted items skip LLM re-ranking, the others are escalated.
+    Pick the thresholds with `calibrate_gate` (`--mode calibrate-gate`).
+    """
+
+    def __init__(self, min_score: float, min_margin: float = DEFAULT_MIN_MARGIN):
+        """
+        Args:
+            min_score (float): Minimum similarity (-1 to 1) of the top candidate.
+            min_margin (float): Minimum similarity gap between the top candidate and the runner-up.
+        """
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self._lock = threading.Lock()
+        self.decisions = 0
+        self.accepted = 0
+
+    def decide(self, scored_candidates: Sequence[Tuple[str, float]]) -> Optional[str]:
+        """
+        Return the top candidate if retrieval is decisive, or None to escalate the item to the LLM.
+
+        Args:
+            scored_candidates (Sequence[Tuple[str, float]]): (product name, similarity) pairs, best first.
+        """
+        accepted = None
+        if scored_candidates:
+            top, margin = _top_and_margin(scored_candidates)
+            if top >= self.min_score and margin >= self.min_margin:
+                accepted = scored_candidates[0][0]
+
+        with self._lock:
+            self.decisions += 1
+            if accepted is not None:
+                self.accepted += 1
+        RETRIEVAL_GATE_DECISIONS.labels("accept" if accepted is not None else "escalate").inc()
+        return accepted
+
+    def stats(self) -> Dict:
+        """
+        Return decision counters. Every accepted item is a distinct BOM item that skipped the LLM.
+        """
+        with self._lock:
+            return {
+                "minScore": self.min_score,
+                "minMargin": self.min_margin,
+                "decisions": self.decisions,
+                "accepted": self.accepted,
+                "escalated": self.decisions - self.accepted,
+                "acceptRate": self.accepted / self.decisions if self.decisions else 0.0
+            }
+
+def calibrate_gate(
+    scored_candidates: List[List[Tuple[str, float]]],
+    expected: List[str],
+    score_grid: Sequence[float] = DEFAULT_SCORE_GRID,
+    margin_grid: Sequence[float] = DEFAULT_MARGIN_GRID,
+    target_accuracy: float = DEFAULT_TARGET_ACCURACY
+) -> Dict:
+    """
+    Choose gate thresholds from a labeled set of BOM item to catalog product matches.
+
+    Every (min_score, min_margin) pair of the grids is evaluated by the share of items it accepts,
+    i.e. the LLM calls saved, and the accuracy of the accepted matches. The recommendation is the
+    pair saving the most LLM calls whose accepted matches are at least `target_accuracy` accurate.
+    Escalated items are not scored: their accuracy is the LLM's, bounded by the retrieval recall.
+
+    Args:
+        scored_candidates (List[List[Tuple[str, float]]]): Retrieval results per labeled item, best first.
+        expected (List[str]): The correct catalog product name of every item.
+        score_grid (Sequence[float]): Candidate `min_score` values.
+        margin_grid (Sequence[float]): Candidate `min_margin` values.
+        target_accuracy (float): Minimum accuracy of the accepted matches.
+
+    Returns:
+        Dict: The number of items, the retrieval top-1 accuracy and recall@k, one row per threshold
+        pair ("grid") and the "recommended" row, or None if no pair reaches the target accuracy.
+    """
+    tops, margins, correct, recalled = [], [], [], []
+    for candidates, name in zip(scored_candidates, expected):
+        top, margin = _top_and_margin(candidates) if candidates else (-np.inf, 0.0)
+        tops.append(top)
+        margins.append(margin)
+        correct.append(bool(candidates) and candidates[0][0] == name)
+        recalled.append(any(candidate == name for candidate, _ in candidates))
+    tops, margins, correct = np.array(tops), np.array(margins), np.array(correct, dtype=bool)
+    total = len(correct)
+
+    grid = []
+    for min_score in score_grid:
+        for min_margin in margin_grid:
+            accepted = (tops >= min_score) & (margins >= min_margin)
+            num_accepted = int(accepted.sum())
+            grid.append({
+                "minScore": min_score,
+                "minMargin": min_margin,
+                "accepted": num_accepted,
+                "llmCallSavings": num_accepted / total if total else 0.0,
+                "acceptedAccuracy": float(correct[accepted].mean()) if num_accepted else None
+            })
+
+    eligible = [
+        row for row in grid
+        if row["accepted"] and row["acceptedAccuracy"] >= target_accuracy
+    ]
+    # Most savings first, then the most accurate, then the strictest thresholds
+    recommended = max(
+        eligible,
+        key=lambda row: (row["accepted"], row["acceptedAccuracy"], row["minScore"], row["minMargin"]),
+        default=None
+    )
+    if recommended is None:
+        logger.warning(f"No gate thresholds reach {target_accuracy:.0%} accuracy on {total} labeled items")
+    else:
+        logger.info(
+            f"Recommended gate: min_score={recommended['minScore']} min_margin={recommended['minMargin']} "
+            f"saves {recommended['llmCallSavings']:.1%} of LLM calls at {recommended['acceptedAccuracy']:.1%} accuracy"
+        )
+    return {
+        "items": total,
+        "targetAccuracy": target_accuracy,
+        "retrievalTop1Accuracy": float(correct.mean()) if total else 0.0,
+        "retrievalRecallAtK": sum(recalled) / total if total else 0.0,
+        "recommended": recommended,
+        "grid": grid
+    }
@@ -0,0 +1,200 @@
+from .metrics_utils import LEXICAL_LOOKUPS
+from .text_utils import normalize_text
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import math
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FUZZY_THRESHOLD = 0.9
+# Reciprocal rank fusion constant; larger values flatten the contribution of top ranks
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text)
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class LexicalIndex:
+    """
+    Lexical index over the catalog product names: normalized exact lookup, character-trigram
+    similarity and BM25 over word tokens.
+
+    `match` finds high-confidence hits (a normalized exact match, or a trigram similarity of at
+    least `fuzzy_threshold`) that can skip embedding and vector search, and for exact hits the LLM;
+    `search_bm25` and `search_trigrams` rank candidates to fuse with the vector search results.
+    """
+
+    def __init__(self, product_names: Iterable[str], fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD, k1: float = 1.5, b: float = 0.75):
+        """
+        Build the index.
+
+        Args:
+            product_names (Iterable[str]): Catalog product names; duplicates are indexed once.
+            fuzzy_threshold (float): Minimum trigram Dice similarity (0-1) of a fuzzy match; above 1 disables fuzzy matches.
+            k1 (float): BM25 term frequency saturation.
+            b (float): BM25 length normalization.
+        """
+        self.names: List[str] = list(dict.fromkeys(name for name in product_names if isinstance(name, str)))
+        self.fuzzy_threshold = fuzzy_threshold
+        self.k1 = k1
+        self.b = b
+
+        self._exact: Dict[str, int] = {}
+        self._trigram_sets: List[set] = []
+        self._trigram_postings: Dict[str, List[int]] = defaultdict(list)
+        self._token_postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._doc_lengths: List[int] = []
+        for doc_id, name in enumerate(self.names):
+            normalized = normalize_text(name)
+            self._exact.setdefault(normalized, doc_id)
+            trigrams = _trigrams(normalized)
+            self._trigram_sets.append(trigrams)
+            for trigram in trigrams:
+                self._trigram_postings[trigram].append(doc_id)
+            tokens = _tokens(normalized)
+            self._doc_lengths.append(len(tokens))
+            for token, tf in Counter(tokens).items():
+                self._token_postings[token].append((doc_id, tf))
+
+        num_docs = len(self.names)
+        self._avg_doc_length = sum(self._doc_lengths) / num_docs if num_docs else 0.0
+        self._idf = {
+            token: math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for token, postings in self._token_postings.items()
+        }
+
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        logger.info(f"Lexical index built with {num_docs} product names")
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search_trigrams(self, text: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Rank product names by trigram Dice similarity to `text`.
+
+        Returns:
+            List[Tuple[str, float]]: Up to `top_k` (product name, similarity) pairs, best first.
+        """
+        query = _trigrams(normalize_text(text))
+        shared: Counter = Counter()
+        for trigram in query:
+            shared.update(self._trigram_postings.get(trigram, ()))
+        scored = [
+            (2 * count / (len(query) + len(self._trigram_sets[doc_id])), doc_id)
+            for doc_id, count in shared.items()
+        ]
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [(self.names[doc_id], score) for score, doc_id in scored[:top_k]]
+
+    def search_bm25(self, text: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Rank product names by BM25 score of the words of `text`.
+
+        Returns:
+            List[Tuple[str, float]]: Up to `top_k` (product name, score) pairs, best first.
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(_tokens(normalize_text(text))):
+            idf = self._idf.get(token)
+            if idf is None:
+                continue
+            for doc_id, tf in self._token_postings[token]:
+                length_norm = 1 - self.b + self.b * self._doc_lengths[doc_id] / self._avg_doc_length
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+        return [(self.names[doc_id], score) for doc_id, score in ranked[:top_k]]
+
+    def match(self, text: str) -> Optional[Tuple[str, str]]:
+        """
+        Look up a high-confidence match for a BOM item.
+
+        Returns:
+            Optional[Tuple[str, str]]: (product name, "exact" or "fuzzy"), or None.
+        """
+        result = None
+        doc_id = self._exact.get(normalize_text(text))
+        if doc_id is not None:
+            result = (self.names[doc_id], "exact")
+        elif self.fuzzy_threshold <= 1:
+            best = self.search_trigrams(text, top_k=1)
+            if best and best[0][1] >= self.fuzzy_threshold:
+                result = (best[0][0], "fuzzy")
+
+        with self._lock:
+            self.lookups += 1
+            if result is not None:
+                if result[1] == "exact":
+                    self.exact_hits += 1
+                else:
+                    self.fuzzy_hits += 1
+        LEXICAL_LOOKUPS.labels(result[1] if result else "miss").inc()
+        return result
+
+    def stats(self) -> Dict:
+        """
+        Return lookup counters. Every hit is a distinct BOM item that skipped embedding and vector search.
+        """
+        with self._lock:
+            hits = self.exact_hits + self.fuzzy_hits
+            return {
+                "products": len(self.names),
+                "lookups": self.lookups,
+                "exactHits": self.exact_hits,
+                "fuzzyHits": self.fuzzy_hits,
+                "hitRate": hits / self.lookups if self.lookups else 0.0,
+                "embeddingsAvoided": hits
+            }
+
+def build_lexical_index(db_df, fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD) -> LexicalIndex:
+    """
+    Build a `LexicalIndex` over the product names of the Database DataFrame.
+    """
+    return LexicalIndex(db_df["product_name"].tolist(), fuzzy_threshold)
+
+def fuse_candidates(rankings: List[List[str]], top_k: int = 5) -> List[str]:
+    """
+    Merge ranked candidate lists with reciprocal rank fusion.
+
+    Args:
+        rankings (List[List[str]]): Candidate lists, best first.
+        top_k (int): Number of candidates to keep.
+
+    Returns:
+        List[str]: The `top_k` candidates with the highest fused score.
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, name in enumerate(ranking):
+            scores[name] += 1.0 / (RRF_K + rank + 1)
+    # Ties keep the order of first appearance, which favors the first ranking
+    return sorted(scores, key=lambda name: -scores[name])[:top_k]
+
+def hybrid_candidates(lexical_index: LexicalIndex, bom_item: str, vector_candidates: List[str], top_k: int = 5) -> List[str]:
+    """
+    Fuse vector search candidates with the BM25 and trigram candidates of a BOM item.
+    """
+    return fuse_candidates([
+        vector_candidates,
+        [name for name, _ in lexical_index.search_bm25(bom_item, top_k)],
+        [name for name, _ in lexical_index.search_trigrams(bom_item, top_k)]
+    ], top_k)
+
+def lexical_candidates(lexical_index: LexicalIndex, bom_item: str, matched: str, top_k: int = 5) -> List[str]:
+    """
+    Candidates of a BOM item with a lexical match, without a vector search: the match first,
+    then the fused BM25 and trigram candidates.
+    """
+    others = hybrid_candidates(lexical_index, bom_item, [matched], top_k + 1)
+    return [matched] + [name for name in others if name != matched][:top_k - 1]
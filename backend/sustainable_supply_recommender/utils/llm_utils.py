@@ -1,23 +1,49 @@
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
+from .metrics_utils import LLM_CALLS, LLM_CALL_SECONDS, record_llm_usage, record_stage
+import asyncio
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-def rerank_with_llm(bom_item: str, candidates: List[str], llm: ChatGoogleGenerativeAI) -> Dict[str, Optional[str]]:
+# Defaults for the concurrent re-ranking pipeline
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+DEFAULT_BATCH_SIZE = 10
+
+# Bump whenever the re-rank prompts change so cached results are not reused
+PROMPT_VERSION = "1"
+
+def get_llm_model_name(llm) -> str:
     """
-    Use an LLM to re-rank candidates for a BOM item and select the best match and equivalent items.
+    Return the model name of an LLM instance, used to key cached re-rank results.
+    """
+    return str(getattr(llm, "model", None) or getattr(llm, "model_name", None) or type(llm).__name__)
 
-    Args:
-        bom_item (str): BOM item to match.
-        candidates (List[str]): List of candidate product names.
-        llm (ChatGoogleGenerativeAI): Initialized LLM instance.
+def _empty_result() -> Dict[str, Optional[str]]:
+    """
+    Result returned when the LLM could not produce a usable match.
+    """
+    return {"matched_item": None, "equivalent_items": []}
 
-    Returns:
-        Dict[str, Optional[str]]: A dictionary with keys "matched_item" and "equivalent_items".
+def _record_llm_call(kind: str, outcome: str, start: float) -> None:
     """
-    prompt = f"""
+    Count an LLM call attempt and record its latency (also as the "llm" stage of the request).
+    """
+    elapsed = time.perf_counter() - start
+    LLM_CALLS.labels(kind, outcome).inc()
+    LLM_CALL_SECONDS.labels(kind).observe(elapsed)
+    record_stage("llm", elapsed)
+
+def _build_rerank_prompt(bom_item: str, candidates: List[str]) -> str:
+    """
+    Build the single-item re-ranking prompt for a BOM item and its candidates.
+    """
+    return f"""
 You are provided with a list of candidate product names.
 For the BOM item: "{bom_item}", identify the best matching candidate and any equivalent items.
 Instructions:
@@ -32,20 +58,333 @@ Return your answer in JSON format:
 Candidates:
 {json.dumps(candidates, indent=2)}
 """
+
+def _validate_result(bom_item: str, candidates: List[str], result) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Check a parsed re-rank result against the item's candidates.
+
+    Returns:
+        Optional[Dict[str, Optional[str]]]: The result with equivalent items outside the candidates
+        dropped, or None if it is malformed or its matched item is not one of the candidates.
+    """
+    if not isinstance(result, dict):
+        return None
+    matched_item = result.get("matched_item")
+    equivalent_items = result.get("equivalent_items") or []
+    if matched_item is not None and matched_item not in candidates:
+        logger.warning(f"LLM matched '{bom_item}' to '{matched_item}', which is not one of its candidates")
+        return None
+    if not isinstance(equivalent_items, list):
+        return None
+    return {
+        "matched_item": matched_item,
+        "equivalent_items": [item for item in equivalent_items if item in candidates]
+    }
+
+def _parse_rerank_response(bom_item: str, candidates: List[str], response_text: str) -> Dict[str, Optional[str]]:
+    """
+    Extract the JSON object from an LLM response. A result whose matched item is not one of the
+    candidates is rejected (empty result).
+
+    Raises:
+        json.JSONDecodeError: If the response does not contain valid JSON.
+    """
+    response_text = response_text.strip()
+    # Remove potential markdown formatting
+    response_text = response_text.replace('```json', '').replace('```', '')
+    start = response_text.find('{')
+    end = response_text.rfind('}') + 1
+    cleaned_response = response_text[start:end]
+    result = _validate_result(bom_item, candidates, json.loads(cleaned_response))
+    if result is None:
+        return _empty_result()
+    logger.info(f"LLM result for '{bom_item}': {result}")
+    return result
+
+def rerank_with_llm(bom_item: str, candidates: List[str], llm: ChatGoogleGenerativeAI) -> Dict[str, Optional[str]]:
+    """
+    Use an LLM to re-rank candidates for a BOM item and select the best match and equivalent items.
+
+    Args:
+        bom_item (str): BOM item to match.
+        candidates (List[str]): List of candidate product names.
+        llm (ChatGoogleGenerativeAI): Initialized LLM instance.
+
+    Returns:
+        Dict[str, Optional[str]]: A dictionary with keys "matched_item" and "equivalent_items".
+    """
+    prompt = _build_rerank_prompt(bom_item, candidates)
+    response_text = ""
+    # Recorded once, after the response has been parsed and validated
+    outcome = "error"
+    start = time.perf_counter()
     try:
         response = llm.invoke(prompt)
-        response_text = response.content.strip()
-        # Remove potential markdown formatting
-        response_text = response_text.replace('```json', '').replace('```', '')
-        start = response_text.find('{')
-        end = response_text.rfind('}') + 1
-        cleaned_response = response_text[start:end]
-        result = json.loads(cleaned_response)
-        logger.info(f"LLM result for '{bom_item}': {result}")
+        record_llm_usage(response)
+        response_text = response.content
+        result = _parse_rerank_response(bom_item, candidates, response_text)
+        outcome = "success"
         return result
-    except json.JSONDecodeError as e:
+    except json.JSONDecodeError:
         logger.error(f"Invalid JSON from LLM for '{bom_item}': {response_text}", exc_info=True)
-        return {"matched_item": None, "equivalent_items": []}
+        return _empty_result()
     except Exception as e:
         logger.error(f"LLM processing error for '{bom_item}': {str(e)}", exc_info=True)
-        return {"matched_item": None, "equivalent_items": []}
+        return _empty_result()
+    finally:
+        _record_llm_call("single", outcome, start)
+
+async def _ainvoke(llm, prompt: str):
+    """
+    Invoke the LLM asynchronously, falling back to a worker thread for LLMs without `ainvoke`.
+    """
+    if hasattr(llm, "ainvoke"):
+        return await llm.ainvoke(prompt)
+    return await asyncio.to_thread(llm.invoke, prompt)
+
+async def _ainvoke_with_retry(
+    llm,
+    prompt: str,
+    label: str,
+    timeout: float,
+    max_retries: int,
+    backoff: float,
+    kind: str = "single"
+) -> Optional[str]:
+    """
+    Invoke the LLM with a per-call timeout, retrying timeouts and errors with exponential backoff.
+    Every attempt is counted in the LLM metrics under `kind` ("single" or "batch").
+
+    Returns:
+        Optional[str]: The response text, or None if every attempt failed.
+    """
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(_ainvoke(llm, prompt), timeout=timeout)
+            _record_llm_call(kind, "success", start)
+            record_llm_usage(response)
+            return response.content
+        except asyncio.TimeoutError:
+            _record_llm_call(kind, "timeout", start)
+            logger.warning(f"LLM call timed out for {label} (attempt {attempt + 1}/{max_retries + 1})")
+        except Exception as e:
+            _record_llm_call(kind, "error", start)
+            logger.warning(f"LLM call failed for {label} (attempt {attempt + 1}/{max_retries + 1}): {str(e)}")
+        if attempt < max_retries:
+            await asyncio.sleep(backoff * (2 ** attempt))
+
+    logger.error(f"LLM processing failed for {label} after {max_retries + 1} attempts")
+    return None
+
+async def arerank_with_llm(
+    bom_item: str,
+    candidates: List[str],
+    llm: ChatGoogleGenerativeAI,
+    timeout: float = DEFAULT_TIMEOUT,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff: float = DEFAULT_BACKOFF
+) -> Dict[str, Optional[str]]:
+    """
+    Async variant of `rerank_with_llm` with a per-call timeout and retry with exponential backoff.
+
+    Timeouts and LLM errors are retried up to `max_retries` times, waiting `backoff * 2**attempt`
+    seconds between attempts. Invalid JSON is not retried.
+
+    Args:
+        bom_item (str): BOM item to match.
+        candidates (List[str]): List of candidate product names.
+        llm (ChatGoogleGenerativeAI): Initialized LLM instance (anything exposing `ainvoke` or `invoke`).
+        timeout (float): Seconds to wait for a single LLM call.
+        max_retries (int): Number of retries after the first failed attempt.
+        backoff (float): Base delay in seconds for the exponential backoff.
+
+    Returns:
+        Dict[str, Optional[str]]: A dictionary with keys "matched_item" and "equivalent_items".
+    """
+    prompt = _build_rerank_prompt(bom_item, candidates)
+    response_text = await _ainvoke_with_retry(llm, prompt, f"'{bom_item}'", timeout, max_retries, backoff)
+    if response_text is None:
+        return _empty_result()
+    try:
+        return _parse_rerank_response(bom_item, candidates, response_text)
+    except json.JSONDecodeError:
+        logger.error(f"Invalid JSON from LLM for '{bom_item}': {response_text}", exc_info=True)
+        return _empty_result()
+
+def _build_batch_rerank_prompt(items: List[Tuple[str, List[str]]]) -> str:
+    """
+    Build a single prompt asking the LLM to re-rank several BOM items, each with its own candidates.
+    """
+    payload = [
+        {"id": idx, "bom_item": bom_item, "candidates": candidates}
+        for idx, (bom_item, candidates) in enumerate(items)
+    ]
+    return """
+You are provided with several BOM items, each with its own list of candidate product names.
+For every BOM item, identify the best matching candidate and any equivalent items among that item's candidates.
+Instructions:
+1. If no candidate is a valid match, set "matched_item" to null.
+2. If there are no equivalent items, set "equivalent_items" to an empty list.
+3. Return exactly one entry per BOM item and copy its "id" unchanged.
+Return your answer as a JSON array:
+[
+  {"id": 0, "matched_item": "<best match or null>", "equivalent_items": ["item1", "item2", ...]},
+  ...
+]
+
+BOM items:
+""" + json.dumps(payload, indent=2) + "\n"
+
+def _parse_batch_rerank_response(
+    items: List[Tuple[str, List[str]]],
+    response_text: str
+) -> List[Optional[Dict[str, Optional[str]]]]:
+    """
+    Parse a batched LLM response into per-item results.
+
+    Returns:
+        List[Optional[Dict[str, Optional[str]]]]: One entry per item in `items`; None where the
+        response had no well-formed entry for that item or matched it outside its candidates.
+    """
+    results: List[Optional[Dict[str, Optional[str]]]] = [None] * len(items)
+    response_text = response_text.strip()
+    # Remove potential markdown formatting
+    response_text = response_text.replace('```json', '').replace('```', '')
+    start = response_text.find('[')
+    end = response_text.rfind(']') + 1
+    try:
+        entries = json.loads(response_text[start:end])
+    except json.JSONDecodeError:
+        logger.error(f"Invalid JSON array from LLM for batch of {len(items)} items: {response_text}")
+        return results
+    if not isinstance(entries, list):
+        return results
+
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        idx = entry.get("id")
+        if not isinstance(idx, int) or not 0 <= idx < len(items) or results[idx] is not None:
+            continue
+        bom_item, candidates = items[idx]
+        result = _validate_result(bom_item, candidates, entry)
+        if result is None:
+            continue
+        logger.info(f"LLM result for '{items[idx][0]}': {result}")
+        results[idx] = result
+    return results
+
+async def arerank_batch_with_llm(
+    items: List[Tuple[str, List[str]]],
+    llm: ChatGoogleGenerativeAI,
+    timeout: float = DEFAULT_TIMEOUT,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff: float = DEFAULT_BACKOFF
+) -> List[Optional[Dict[str, Optional[str]]]]:
+    """
+    Re-rank several BOM items with a single structured LLM prompt.
+
+    Args:
+        items (List[Tuple[str, List[str]]]): (BOM item, candidates) pairs.
+        llm (ChatGoogleGenerativeAI): Initialized LLM instance.
+        timeout (float): Seconds to wait for the LLM call.
+        max_retries (int): Number of retries after the first failed attempt.
+        backoff (float): Base delay in seconds for the exponential backoff.
+
+    Returns:
+        List[Optional[Dict[str, Optional[str]]]]: Results in the same order as `items`; None for
+        items the response did not cover or that were malformed. If the call fails after its
+        retries every item gets an empty result, since single-item calls would retry it again.
+    """
+    prompt = _build_batch_rerank_prompt(items)
+    response_text = await _ainvoke_with_retry(
+        llm, prompt, f"batch of {len(items)} items", timeout, max_retries, backoff, kind="batch"
+    )
+    if response_text is None:
+        return [_empty_result() for _ in items]
+    return _parse_batch_rerank_response(items, response_text)
+
+async def iter_reranked_items(
+    items: List[Tuple[str, List[str]]],
+    llm: ChatGoogleGenerativeAI,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> AsyncIterator[Tuple[int, Dict[str, Optional[str]]]]:
+    """
+    Re-rank many BOM items concurrently, yielding each result as soon as its LLM call completes.
+
+    At most `max_concurrency` LLM calls are in flight. Items are grouped into prompts of
+    `batch_size` items; items missing or malformed in a batch response, or matched outside their
+    candidates, fall back to individual `arerank_with_llm` calls while the rest of the batch is
+    kept. A batch whose call fails after its retries is not retried item by item. A `batch_size` of 1 sends one
+    prompt per item. Closing the iterator early cancels the outstanding LLM calls.
+
+    Args:
+        items (List[Tuple[str, List[str]]]): (BOM item, candidates) pairs.
+        llm (ChatGoogleGenerativeAI): Initialized LLM instance.
+        max_concurrency (int): Maximum number of concurrent LLM calls.
+        timeout (float): Seconds to wait for a single LLM call.
+        max_retries (int): Number of retries per LLM call.
+        backoff (float): Base delay in seconds for the exponential backoff.
+        batch_size (int): Number of BOM items per LLM prompt.
+
+    Yields:
+        Tuple[int, Dict[str, Optional[str]]]: (position in `items`, re-rank result) in completion order.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    batch_size = max(1, batch_size)
+
+    async def _rerank(bom_item: str, candidates: List[str]) -> Dict[str, Optional[str]]:
+        async with semaphore:
+            return await arerank_with_llm(bom_item, candidates, llm, timeout, max_retries, backoff)
+
+    async def _rerank_batch(offset: int, batch: List[Tuple[str, List[str]]]) -> Tuple[int, List[Dict[str, Optional[str]]]]:
+        if len(batch) == 1:
+            return offset, [await _rerank(*batch[0])]
+        async with semaphore:
+            results = await arerank_batch_with_llm(batch, llm, timeout, max_retries, backoff)
+        failed = [idx for idx, result in enumerate(results) if result is None]
+        if failed:
+            logger.warning(f"Falling back to single-item re-ranking for {len(failed)} of {len(batch)} batch items")
+            fallbacks = await asyncio.gather(*(_rerank(*batch[idx]) for idx in failed))
+            for idx, result in zip(failed, fallbacks):
+                results[idx] = result
+        return offset, results
+
+    tasks = [
+        asyncio.ensure_future(_rerank_batch(offset, items[offset:offset + batch_size]))
+        for offset in range(0, len(items), batch_size)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            offset, results = await next_done
+            for idx, result in enumerate(results):
+                yield offset + idx, result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def rerank_items_concurrently(
+    items: List[Tuple[str, List[str]]],
+    llm: ChatGoogleGenerativeAI,
+    **rerank_options
+) -> List[Dict[str, Optional[str]]]:
+    """
+    Re-rank many BOM items concurrently and return the results in input order.
+
+    Args:
+        items (List[Tuple[str, List[str]]]): (BOM item, candidates) pairs.
+        llm (ChatGoogleGenerativeAI): Initialized LLM instance.
+        **rerank_options: Concurrency, timeout, retry and batching options of `iter_reranked_items`.
+
+    Returns:
+        List[Dict[str, Optional[str]]]: Re-rank results in the same order as `items`.
+    """
+    results: List[Optional[Dict[str, Optional[str]]]] = [None] * len(items)
+    async for idx, result in iter_reranked_items(items, llm, **rerank_options):
+        results[idx] = result
+    return results
@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Counter, Histogram
+from typing import Dict, Iterator, Optional
+import time
+
+# Stage durations range from sub-millisecond lookups to multi-second LLM calls
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "ecomedai_supply_stage_seconds",
+    "Time spent in each stage of BOM processing.",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+BOM_ITEMS = Counter(
+    "ecomedai_supply_bom_items_total",
+    "Processed BOM items by outcome (matched, unmatched, failed).",
+    ["outcome"]
+)
+RERANK_CACHE_LOOKUPS = Counter(
+    "ecomedai_supply_rerank_cache_lookups_total",
+    "Re-rank cache lookups by result (hit, miss).",
+    ["result"]
+)
+LEXICAL_LOOKUPS = Counter(
+    "ecomedai_supply_lexical_lookups_total",
+    "Lexical fast-path lookups by result (exact, fuzzy, miss); hits skip embedding, vector search and the LLM.",
+    ["result"]
+)
+RETRIEVAL_GATE_DECISIONS = Counter(
+    "ecomedai_supply_retrieval_gate_decisions_total",
+    "Confidence gate decisions by outcome (accept, escalate); accepted items skip the LLM.",
+    ["decision"]
+)
+LLM_CALLS = Counter(
+    "ecomedai_llm_calls_total",
+    "LLM call attempts by prompt kind (single, batch) and outcome (success, timeout, error).",
+    ["kind", "outcome"]
+)
+LLM_CALL_SECONDS = Histogram(
+    "ecomedai_llm_call_seconds",
+    "Latency of LLM call attempts.",
+    ["kind"],
+    buckets=STAGE_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "ecomedai_llm_tokens_total",
+    "LLM tokens reported by the model, by direction (input, output).",
+    ["direction"]
+)
+
+# Per-request stage totals, set by `collect_timings`; shared with worker threads and tasks of the request
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+def record_stage(stage: str, seconds: float) -> None:
+    """
+    Record the duration of a stage in the histogram and in the current request's breakdown.
+    """
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Time the enclosed block as `stage` (see `record_stage`).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """
+    Collect the stage durations recorded while the block runs, including in threads started with
+    `asyncio.to_thread` and tasks created inside it. Stages that run concurrently (LLM calls) are summed.
+    """
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+def record_llm_usage(response) -> None:
+    """
+    Count the tokens of an LLM response, when the model reports them.
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    for direction in ("input", "output"):
+        tokens = usage.get(f"{direction}_tokens")
+        if tokens:
+            LLM_TOKENS.labels(direction).inc(tokens)
\ No newline at end of file
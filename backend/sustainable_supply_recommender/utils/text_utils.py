@@ -0,0 +1,19 @@
+import re
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a product name for comparisons and cache keys.
+
+    Lowercases the text, trims it and collapses runs of whitespace into a single space.
+
+    Args:
+        text (str): Raw product name.
+
+    Returns:
+        str: The normalized product name ("" for missing values).
+    """
+    if not isinstance(text, str):
+        return ""
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
@@ -1,30 +1,101 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+from .embedding_utils import create_embeddings
+from .lexical_utils import LexicalIndex, hybrid_candidates
+from .metrics_utils import stage_timer
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import FAISS
-from typing import List, Tuple
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+from typing import List, Optional, Tuple, Union
+import faiss
 import logging
+import numpy as np
 import pandas as pd
 
 
 logger = logging.getLogger(__name__)
 
-def create_vectorstore(db_df: pd.DataFrame, embedding_model_name: str = "all-MiniLM-L6-v2") -> Tuple[FAISS, HuggingFaceEmbeddings]:
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+def vectorstore_from_index(texts: List[str], index, embeddings: Embeddings) -> FAISS:
+    """
+    Wrap a FAISS index whose i-th vector embeds `texts[i]` into a LangChain vector store.
+
+    Args:
+        texts (List[str]): Product names in index order.
+        index: FAISS index holding one vector per text.
+        embeddings (Embeddings): Embedding model used to encode queries.
+
+    Returns:
+        FAISS: The vector store.
+    """
+    docstore = InMemoryDocstore({str(i): Document(page_content=text) for i, text in enumerate(texts)})
+    index_to_docstore_id = {i: str(i) for i in range(len(texts))}
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id
+    )
+
+def create_vectorstore(
+    db_df: pd.DataFrame,
+    embedding_model_name: str = DEFAULT_EMBEDDING_MODEL,
+    **embedding_options
+) -> Tuple[FAISS, Embeddings]:
     """
     Create a FAISS vector store from the Database DataFrame using HuggingFace embeddings.
 
     Args:
         db_df (pd.DataFrame): Database DataFrame with product names.
         embedding_model_name (str): HuggingFace embedding model name.
+        **embedding_options: Keyword arguments of `embedding_utils.create_embeddings`.
 
     Returns:
-        Tuple[FAISS, HuggingFaceEmbeddings]: The vector store and embedding model.
+        Tuple[FAISS, Embeddings]: The vector store and embedding model.
     """
-    embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
+    embeddings = create_embeddings(embedding_model_name, **embedding_options)
     texts = db_df["product_name"].tolist()
     vectorstore = FAISS.from_texts(texts, embeddings)
     logger.info(f"Vector store created with {len(texts)} items")
     return vectorstore, embeddings
 
-def query_similar_items(vectorstore: FAISS, bom_item: str, top_k: int = 5) -> List[str]:
+def distances_to_scores(index, distances: np.ndarray) -> np.ndarray:
+    """
+    Convert FAISS distances into similarity scores, higher is closer.
+
+    Inner-product distances are returned as is. Squared L2 distances are mapped to the cosine
+    similarity 1 - d / 2, which is exact for the unit-length vectors of the sentence-transformers
+    models used here.
+    """
+    distances = np.asarray(distances, dtype=np.float32)
+    if getattr(index, "metric_type", faiss.METRIC_L2) == faiss.METRIC_INNER_PRODUCT:
+        return distances
+    return 1.0 - distances / 2.0
+
+def _unique_names(scored: List[Tuple[str, float]], top_k: int) -> List[Tuple[str, float]]:
+    """
+    Keep the best-scoring occurrence of every product name, up to `top_k` names.
+
+    The catalog repeats some product names on several rows (one per source dataset), and their
+    identical vectors would otherwise fill the candidate list with copies of one product.
+    """
+    seen = set()
+    unique = []
+    for name, score in scored:
+        if name not in seen:
+            seen.add(name)
+            unique.append((name, score))
+            if len(unique) == top_k:
+                break
+    return unique
+
+def query_similar_items(
+    vectorstore: FAISS,
+    bom_item: str,
+    top_k: int = 5,
+    lexical_index: Optional[LexicalIndex] = None,
+    with_scores: bool = False
+) -> Union[List[str], List[Tuple[str, Optional[float]]]]:
     """
     Query the vector store to find top-k similar product names for a given BOM item.
 
@@ -32,11 +103,91 @@ def query_similar_items(vectorstore: FAISS, bom_item: str, top_k: int = 5) -> Li
         vectorstore (FAISS): Pre-built FAISS vector store.
         bom_item (str): BOM item to search.
         top_k (int): Number of similar items to retrieve.
+        lexical_index (Optional[LexicalIndex]): If given, the vector candidates are fused with its
+            BM25 and trigram candidates.
+        with_scores (bool): Return (product name, similarity) pairs instead of bare names. Candidates
+            found by the lexical index only have a None score.
 
     Returns:
-        List[str]: List of candidate product names.
+        Union[List[str], List[Tuple[str, Optional[float]]]]: Candidate product names, best first,
+        with their similarity scores if `with_scores` is set.
     """
-    similar_docs = vectorstore.similarity_search(bom_item, k=top_k)
-    candidates = [doc.page_content for doc in similar_docs]
+    fetch_k = top_k
+    with stage_timer("vector_search"):
+        while True:
+            similar_docs = vectorstore.similarity_search_with_score(bom_item, k=fetch_k)
+            scores = distances_to_scores(vectorstore.index, [distance for _, distance in similar_docs])
+            scored = _unique_names(
+                [(doc.page_content, float(score)) for (doc, _), score in zip(similar_docs, scores)], top_k
+            )
+            # Repeated names took some of the slots: search deeper until top_k distinct names are found
+            if len(scored) == top_k or len(similar_docs) < fetch_k:
+                break
+            fetch_k *= 2
+    vector_scores = dict(scored)
+    candidates = [name for name, _ in scored]
+    if lexical_index is not None:
+        candidates = hybrid_candidates(lexical_index, bom_item, candidates, top_k)
     logger.info(f"Found {len(candidates)} similar items for '{bom_item}'")
+    if with_scores:
+        return [(name, vector_scores.get(name)) for name in candidates]
     return candidates
+
+def _embed_texts(vectorstore: FAISS, texts: List[str]) -> np.ndarray:
+    """
+    Embed many texts with the vector store's embedding model in a single encoder call.
+    """
+    embedding_function = vectorstore.embedding_function
+    with stage_timer("embedding"):
+        if hasattr(embedding_function, "embed_documents"):
+            vectors = embedding_function.embed_documents(texts)
+        else:
+            vectors = [embedding_function(text) for text in texts]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if getattr(vectorstore, "_normalize_L2", False):
+        faiss.normalize_L2(vectors)
+    return vectors
+
+def query_similar_items_batch(vectorstore: FAISS, bom_items: List[str], top_k: int = 5) -> List[List[Tuple[str, float]]]:
+    """
+    Query the vector store for many BOM items at once.
+
+    All BOM items are embedded in one encoder call and searched with a single FAISS `search`
+    over the resulting matrix. Product names repeated in the catalog are returned once; items
+    whose top-k held repeats are searched again, deeper, until they have top-k distinct names.
+
+    Args:
+        vectorstore (FAISS): Pre-built FAISS vector store.
+        bom_items (List[str]): BOM items to search.
+        top_k (int): Number of similar items to retrieve per BOM item.
+
+    Returns:
+        List[List[Tuple[str, float]]]: For each BOM item, in input order, the top-k distinct
+        (product name, similarity) pairs, best first (see `distances_to_scores`).
+    """
+    if not bom_items:
+        return []
+    vectors = _embed_texts(vectorstore, bom_items)
+    results: List[List[Tuple[str, float]]] = [[] for _ in bom_items]
+    pending = list(range(len(bom_items)))
+    fetch_k = top_k
+    while pending:
+        with stage_timer("faiss_search"):
+            distances, indices = vectorstore.index.search(vectors[pending], fetch_k)
+        scores = distances_to_scores(vectorstore.index, distances)
+        short = []
+        for position, row_scores, row_indices in zip(pending, scores, indices):
+            scored = []
+            for score, idx in zip(row_scores, row_indices):
+                if idx == -1:
+                    # FAISS pads with -1 when fewer than fetch_k vectors exist
+                    continue
+                doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[idx])
+                scored.append((doc.page_content, float(score)))
+            results[position] = _unique_names(scored, top_k)
+            if len(results[position]) < top_k and len(scored) == fetch_k:
+                short.append(position)
+        pending = short
+        fetch_k *= 2
+    logger.info(f"Batch search found candidates for {len(results)} BOM items")
+    return results
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The apps are imported as top-level packages from the backend directory, as server.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,46 @@
+import io
+import pytest
+import zipfile
+
+pytest.importorskip("torch")
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+from medical_trash_classifier import app as classifier_app
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+@pytest.fixture
+def no_extraction(monkeypatch):
+    def read(self, member):
+        raise AssertionError(f"{member} was extracted before the limits were checked")
+    monkeypatch.setattr(zipfile.ZipFile, "read", read)
+
+def test_archive_with_too_many_images_is_rejected_before_extraction(monkeypatch, no_extraction):
+    monkeypatch.setattr(classifier_app, "MAX_BATCH_FILES", 3)
+    archive = _zip([(f"image_{i}.png", b"x") for i in range(4)])
+    with pytest.raises(HTTPException) as error:
+        classifier_app._expand_uploads([("images.zip", archive)])
+    assert error.value.status_code == 400
+
+def test_zip_bomb_is_rejected_before_extraction(monkeypatch, no_extraction):
+    monkeypatch.setattr(classifier_app, "MAX_BATCH_BYTES", 1024 * 1024)
+    # 8 MB of zeros compress to a few kilobytes
+    archive = _zip([("bomb.png", bytes(8 * 1024 * 1024))])
+    assert len(archive) < 64 * 1024
+    with pytest.raises(HTTPException) as error:
+        classifier_app._expand_uploads([("bomb.zip", archive)])
+    assert error.value.status_code == 413
+
+def test_archive_within_limits_is_expanded():
+    archive = _zip([("a.png", b"first"), ("notes.txt", b"text")])
+    assert classifier_app._expand_uploads([("images.zip", archive), ("b.jpg", b"second")]) == [
+        ("images.zip/a.png", b"first"),
+        ("images.zip/notes.txt", "Invalid file format. Please upload an image."),
+        ("b.jpg", b"second")
+    ]
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("prometheus_client")
+
+from sustainable_supply_recommender.utils.gating_utils import ConfidenceGate, calibrate_gate
+
+# Catalog names repeat across source datasets, with identical vectors and scores
+DUPLICATED = [
+    ("Spain health system", 0.91),
+    ("Spain health system", 0.91),
+    ("Spain health system", 0.91),
+    ("Portugal health system", 0.72),
+    ("Spain health system", 0.91)
+]
+
+def test_gate_accepts_top_candidate_repeated_in_catalog():
+    gate = ConfidenceGate(min_score=0.8, min_margin=0.1)
+    assert gate.decide(DUPLICATED) == "Spain health system"
+
+def test_gate_escalates_close_distinct_candidates():
+    gate = ConfidenceGate(min_score=0.8, min_margin=0.1)
+    assert gate.decide([("Nitrile gloves", 0.9), ("Latex gloves", 0.88)]) is None
+    assert gate.stats()["escalated"] == 1
+
+def test_calibration_measures_margin_against_a_different_name():
+    report = calibrate_gate(
+        [DUPLICATED],
+        ["Spain health system"],
+        score_grid=[0.9],
+        margin_grid=[0.0, 0.15],
+        target_accuracy=1.0
+    )
+    assert report["recommended"] == {
+        "minScore": 0.9,
+        "minMargin": 0.15,
+        "accepted": 1,
+        "llmCallSavings": 1.0,
+        "acceptedAccuracy": 1.0
+    }
@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+pytest.importorskip("langchain_huggingface")
+
+from sustainable_supply_recommender.utils.vectorstore_utils import _unique_names
+
+def test_repeated_catalog_names_are_returned_once():
+    scored = [
+        ("Spain health system", 0.91),
+        ("Spain health system", 0.91),
+        ("Portugal health system", 0.72),
+        ("Spain health system", 0.91),
+        ("France health system", 0.70),
+        ("Italy health system", 0.65)
+    ]
+    assert _unique_names(scored, top_k=3) == [
+        ("Spain health system", 0.91),
+        ("Portugal health system", 0.72),
+        ("France health system", 0.70)
+    ]